@@ -0,0 +1,45 @@
+-- ============================================
+-- Enable Change Tracking for Inventory Watch Mode
+-- ============================================
+-- Purpose: Lets "woo_inventory_sync.py watch" read which items changed
+--          (CHANGETABLE on IM_INV / IM_ITEM) instead of re-aggregating the view.
+-- Change Tracking records primary keys only (no column values, no triggers);
+-- overhead on POS writes is one small internal-table insert per change.
+-- If the watcher is down for longer than CHANGE_RETENTION it runs a catch-up
+-- inventory sync and resumes.
+--
+-- Rollback:
+--   ALTER TABLE dbo.IM_ITEM DISABLE CHANGE_TRACKING;
+--   ALTER TABLE dbo.IM_INV DISABLE CHANGE_TRACKING;
+--   ALTER DATABASE WOODYS_CP SET CHANGE_TRACKING = OFF;
+
+USE WOODYS_CP;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.change_tracking_databases WHERE database_id = DB_ID())
+BEGIN
+    ALTER DATABASE WOODYS_CP
+        SET CHANGE_TRACKING = ON (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON);
+    PRINT 'Enabled Change Tracking on WOODYS_CP';
+END
+ELSE
+    PRINT 'Change Tracking already enabled on WOODYS_CP';
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.change_tracking_tables WHERE object_id = OBJECT_ID('dbo.IM_INV'))
+BEGIN
+    ALTER TABLE dbo.IM_INV ENABLE CHANGE_TRACKING WITH (TRACK_COLUMNS_UPDATED = OFF);
+    PRINT 'Enabled Change Tracking on IM_INV';
+END
+ELSE
+    PRINT 'IM_INV already tracked';
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.change_tracking_tables WHERE object_id = OBJECT_ID('dbo.IM_ITEM'))
+BEGIN
+    ALTER TABLE dbo.IM_ITEM ENABLE CHANGE_TRACKING WITH (TRACK_COLUMNS_UPDATED = OFF);
+    PRINT 'Enabled Change Tracking on IM_ITEM';
+END
+ELSE
+    PRINT 'IM_ITEM already tracked';
+GO
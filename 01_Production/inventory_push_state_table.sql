@@ -0,0 +1,31 @@
+-- ============================================
+-- Inventory Push State Table
+-- ============================================
+-- Purpose: Last stock quantity/status woo_inventory_sync.py pushed (or confirmed)
+--          for each SKU, so unchanged SKUs are skipped without any HTTP call
+-- Written by: woo_inventory_sync.py sync --apply (bulk MERGE after each run)
+-- Reconciled against live WooCommerce by: woo_inventory_sync.py sync --apply --verify
+--
+-- Rollback:
+--   DROP TABLE dbo.USER_INVENTORY_PUSH_STATE;
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'USER_INVENTORY_PUSH_STATE')
+BEGIN
+    CREATE TABLE dbo.USER_INVENTORY_PUSH_STATE (
+        SKU                 VARCHAR(50) NOT NULL PRIMARY KEY,  -- CP SKU (IM_ITEM.ITEM_NO)
+        WOO_PRODUCT_ID      BIGINT NOT NULL,                   -- WooCommerce product ID pushed to
+
+        -- Last state known to be in WooCommerce
+        LAST_QTY            INT NOT NULL,                      -- stock_quantity as sent
+        LAST_STATUS         VARCHAR(20) NOT NULL,              -- instock / outofstock / onbackorder
+        LAST_HASH           CHAR(40) NOT NULL,                 -- SHA-1 of WOO_PRODUCT_ID|qty|status
+
+        PUSHED_DT           DATETIME2 NOT NULL DEFAULT SYSDATETIME(),  -- last push or confirmation
+        VERIFIED_DT         DATETIME2 NULL                     -- last --verify reconciliation
+    );
+
+    PRINT 'Created USER_INVENTORY_PUSH_STATE table';
+END
+ELSE
+    PRINT 'USER_INVENTORY_PUSH_STATE already exists';
+GO
@@ -0,0 +1,25 @@
+-- ============================================
+-- Product Payload Field Digests (USER_PRODUCT_MAP)
+-- ============================================
+-- Purpose: woo_products.py stores a short digest of each top-level field of the
+--          last payload it successfully pushed for a SKU (JSON object,
+--          field -> 16 hex chars). Changed products are then updated with only
+--          id + sku + the fields whose digest differs, instead of the full
+--          payload (long HTML descriptions, image arrays).
+-- Requires: product_payload_hash.sql (PAYLOAD_HASH / PAYLOAD_HASH_DT)
+-- Clearing PAYLOAD_FIELDS (or running with --force) makes the next sync send
+-- full payloads.
+--
+-- Rollback:
+--   ALTER TABLE dbo.USER_PRODUCT_MAP DROP COLUMN PAYLOAD_FIELDS;
+
+IF COL_LENGTH('dbo.USER_PRODUCT_MAP', 'PAYLOAD_FIELDS') IS NULL
+BEGIN
+    ALTER TABLE dbo.USER_PRODUCT_MAP ADD
+        PAYLOAD_FIELDS      NVARCHAR(2000) NULL;        -- {"name":"3f2a...","images":"91c0...",...}
+
+    PRINT 'Added PAYLOAD_FIELDS to USER_PRODUCT_MAP';
+END
+ELSE
+    PRINT 'USER_PRODUCT_MAP.PAYLOAD_FIELDS already exists';
+GO
@@ -0,0 +1,23 @@
+-- ============================================
+-- Product Payload Hash (USER_PRODUCT_MAP)
+-- ============================================
+-- Purpose: woo_products.py stores a SHA-256 of the last WooCommerce payload it
+--          successfully pushed for each SKU; products whose new payload hashes
+--          the same are skipped (reported as RECORDS_SKIPPED in USER_SYNC_LOG).
+-- Clearing PAYLOAD_HASH (or running with --force) makes the next sync re-send.
+--
+-- Rollback:
+--   ALTER TABLE dbo.USER_PRODUCT_MAP DROP COLUMN PAYLOAD_HASH_DT;
+--   ALTER TABLE dbo.USER_PRODUCT_MAP DROP COLUMN PAYLOAD_HASH;
+
+IF COL_LENGTH('dbo.USER_PRODUCT_MAP', 'PAYLOAD_HASH') IS NULL
+BEGIN
+    ALTER TABLE dbo.USER_PRODUCT_MAP ADD
+        PAYLOAD_HASH        CHAR(64) NULL,              -- SHA-256 hex of id + canonical payload JSON
+        PAYLOAD_HASH_DT     DATETIME2 NULL;             -- when that payload was pushed
+
+    PRINT 'Added PAYLOAD_HASH to USER_PRODUCT_MAP';
+END
+ELSE
+    PRINT 'USER_PRODUCT_MAP.PAYLOAD_HASH already exists';
+GO
@@ -0,0 +1,30 @@
+-- ============================================
+-- Product Sync Checkpoint Table
+-- ============================================
+-- Purpose: SKUs WooCommerce applied during a product sync, keyed by the sync
+--          batch ID (USER_SYNC_LOG.SYNC_ID). woo_products.py writes one bulk
+--          MERGE per /products/batch chunk as it lands; after a mid-run outage,
+--          `woo_products.py sync --apply --resume <batch-id>` sends only the
+--          SKUs not recorded here (failed chunks are retried).
+-- A run that applies every SKU deletes its own rows; rows of batches that were
+-- never resumed can be purged at will, e.g.
+--   DELETE FROM dbo.USER_PRODUCT_SYNC_CHECKPOINT WHERE CHECKPOINT_DT < DATEADD(DAY, -30, SYSDATETIME());
+--
+-- Rollback:
+--   DROP TABLE dbo.USER_PRODUCT_SYNC_CHECKPOINT;
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'USER_PRODUCT_SYNC_CHECKPOINT')
+BEGIN
+    CREATE TABLE dbo.USER_PRODUCT_SYNC_CHECKPOINT (
+        SYNC_ID             VARCHAR(50) NOT NULL,          -- product sync batch ID
+        SKU                 VARCHAR(50) NOT NULL,          -- CP SKU (IM_ITEM.ITEM_NO)
+        WOO_PRODUCT_ID      BIGINT NOT NULL,               -- ID WooCommerce returned for it
+        CHECKPOINT_DT       DATETIME2 NOT NULL DEFAULT SYSDATETIME(),
+        CONSTRAINT PK_USER_PRODUCT_SYNC_CHECKPOINT PRIMARY KEY (SYNC_ID, SKU)
+    );
+
+    PRINT 'Created USER_PRODUCT_SYNC_CHECKPOINT table';
+END
+ELSE
+    PRINT 'USER_PRODUCT_SYNC_CHECKPOINT already exists';
+GO
@@ -0,0 +1,65 @@
+-- ============================================
+-- SQL Performance Log Table
+-- ============================================
+-- Purpose: Slow statements recorded by database.py's instrumented cursors
+-- Enabled with CP_SQL_PERF_LOG_TABLE=true (threshold: CP_SQL_SLOW_MS)
+-- Only parameter types are stored, never parameter values
+--
+-- Rollback:
+--   DROP VIEW dbo.VI_SQL_PERF_SUMMARY;
+--   DROP TABLE dbo.USER_SQL_PERF_LOG;
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'USER_SQL_PERF_LOG')
+BEGIN
+    CREATE TABLE dbo.USER_SQL_PERF_LOG (
+        LOG_ID              BIGINT IDENTITY(1,1) PRIMARY KEY,
+        LOGGED_DT           DATETIME2 DEFAULT SYSDATETIME(),
+
+        -- Statement details (whitespace-normalized, truncated to 200 chars)
+        STATEMENT           NVARCHAR(200) NOT NULL,
+        PARAM_SHAPE         VARCHAR(200) NULL,           -- e.g. "(str, int)" or "500 x (str, int)"
+        IS_EXECUTEMANY      BIT DEFAULT 0,
+
+        -- Performance metrics
+        ELAPSED_MS          INT NOT NULL,
+        ROW_COUNT           INT NULL,                    -- cursor.rowcount (-1 for SELECT)
+
+        -- Error handling
+        ERROR_MSG           NVARCHAR(500) NULL,
+
+        CREATED_BY          NVARCHAR(128) DEFAULT SYSTEM_USER,
+
+        INDEX IX_SQL_PERF_LOG_DT (LOGGED_DT),
+        INDEX IX_SQL_PERF_LOG_ELAPSED (ELAPSED_MS)
+    );
+
+    PRINT 'Created USER_SQL_PERF_LOG table';
+END
+ELSE
+    PRINT 'USER_SQL_PERF_LOG already exists';
+GO
+
+-- ============================================
+-- View: Slowest statements (last 7 days)
+-- ============================================
+
+IF EXISTS (SELECT * FROM sys.views WHERE name = 'VI_SQL_PERF_SUMMARY')
+    DROP VIEW dbo.VI_SQL_PERF_SUMMARY;
+GO
+
+CREATE VIEW dbo.VI_SQL_PERF_SUMMARY
+AS
+SELECT
+    STATEMENT,
+    COUNT(*) AS SLOW_EXECUTIONS,
+    AVG(ELAPSED_MS) AS AVG_ELAPSED_MS,
+    MAX(ELAPSED_MS) AS MAX_ELAPSED_MS,
+    SUM(CASE WHEN ERROR_MSG IS NOT NULL THEN 1 ELSE 0 END) AS ERROR_COUNT,
+    MAX(LOGGED_DT) AS LAST_SEEN
+FROM dbo.USER_SQL_PERF_LOG
+WHERE LOGGED_DT >= DATEADD(DAY, -7, GETDATE())  -- Last 7 days
+GROUP BY STATEMENT
+GO
+
+PRINT 'Created VI_SQL_PERF_SUMMARY view';
+GO
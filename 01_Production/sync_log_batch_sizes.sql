@@ -0,0 +1,22 @@
+-- ============================================
+-- Sync Log Batch Sizes (USER_SYNC_LOG)
+-- ============================================
+-- Purpose: WooClient sizes each /products/batch request adaptively (latency,
+--          body bytes, failures; 1..100 items). woo_products.py records the
+--          sizes it chose for a run here, e.g.
+--          '12 batches (min 25, avg 71, max 100): 50,62,78,97,100,...'
+-- Useful for tuning SYNC_BATCH_TARGET_SECONDS / SYNC_BATCH_MAX_BYTES.
+--
+-- Rollback:
+--   ALTER TABLE dbo.USER_SYNC_LOG DROP COLUMN BATCH_SIZES;
+
+IF COL_LENGTH('dbo.USER_SYNC_LOG', 'BATCH_SIZES') IS NULL
+BEGIN
+    ALTER TABLE dbo.USER_SYNC_LOG ADD
+        BATCH_SIZES         VARCHAR(400) NULL;          -- summary + sequence of batch sizes
+
+    PRINT 'Added BATCH_SIZES to USER_SYNC_LOG';
+END
+ELSE
+    PRINT 'USER_SYNC_LOG.BATCH_SIZES already exists';
+GO
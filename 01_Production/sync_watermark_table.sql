@@ -0,0 +1,27 @@
+-- ============================================
+-- Sync Watermark Table
+-- ============================================
+-- Purpose: High-water marks for incremental syncs, one row per sync name
+--          (e.g. 'inventory_sync'). Read/written by database.get_sync_watermark()
+--          and database.set_sync_watermark().
+-- HIGH_WATER_MARK is a source-side timestamp (CounterPoint LST_MAINT_DT or
+-- WooCommerce date_modified_gmt), never the local clock of the sync host.
+--
+-- Rollback:
+--   DROP TABLE dbo.USER_SYNC_WATERMARK;
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'USER_SYNC_WATERMARK')
+BEGIN
+    CREATE TABLE dbo.USER_SYNC_WATERMARK (
+        SYNC_NAME           VARCHAR(50) NOT NULL PRIMARY KEY,
+        HIGH_WATER_MARK     DATETIME2 NULL,                -- newest change already synced
+        LAST_FULL_RUN_DT    DATETIME2 NULL,                -- last run that ignored the mark
+        UPDATED_DT          DATETIME2 NOT NULL DEFAULT SYSDATETIME(),
+        UPDATED_BY          VARCHAR(50) DEFAULT SYSTEM_USER
+    );
+
+    PRINT 'Created USER_SYNC_WATERMARK table';
+END
+ELSE
+    PRINT 'USER_SYNC_WATERMARK already exists';
+GO
@@ -11,7 +11,7 @@ import sys
 from datetime import datetime, timedelta
 from typing import List, Dict
 
-from woo_client import WooClient
+from woo_client import WooClient, WooRequest
 from data_utils import is_valid_email, DISPOSABLE_DOMAINS
 from woo_customers import get_existing_woo_customers_full
 
@@ -166,21 +166,7 @@ def is_spam_customer(customer: Dict, orders: List[Dict] = None) -> tuple[bool, L
 def get_customer_orders(client: WooClient, customer_id: int) -> List[Dict]:
     """Get all orders for a customer."""
     try:
-        url = client._url("/orders")
-        orders = []
-        page = 1
-        while True:
-            resp = client.session.get(url, params={"customer": customer_id, "per_page": 100, "page": page}, timeout=30)
-            if not resp.ok:
-                break
-            data = resp.json()
-            if not data:
-                break
-            orders.extend(data)
-            if len(data) < 100:
-                break
-            page += 1
-        return orders
+        return list(client.paginate("/orders", {"customer": customer_id}))
     except:
         return []
 
@@ -207,13 +193,13 @@ def list_spam_customers(dry_run: bool = True) -> List[Dict]:
     
     spam_customers = []
     
-    for i, customer in enumerate(customers, 1):
-        if i % 10 == 0 or i == 1:
-            print(f"  Checking customer {i}/{len(customers)}...", end='\r')
-        
-        # Get customer orders
-        orders = get_customer_orders(client, customer['id'])
-        
+    # Fetch each customer's orders in parallel (results keep customer order)
+    print(f"  Checking {len(customers)} customers...", end='\r')
+    customer_orders = client.map_concurrent(
+        lambda customer: get_customer_orders(client, customer['id']), customers
+    )
+    
+    for customer, orders in zip(customers, customer_orders):
         # Check if spam
         is_spam, reasons = is_spam_customer(customer, orders)
         
@@ -289,42 +275,45 @@ def delete_spam_customers(spam_customers: List[Dict], apply: bool = False) -> tu
     
     deleted = 0
     errors = 0
+    to_delete = []
     
-    for i, item in enumerate(spam_customers, 1):
+    for item in spam_customers:
         customer = item['customer']
+        # Skip negative IDs (guest checkout pseudo-customers, not real users)
+        if customer['id'] < 0:
+            print(f"  SKIP: Customer {customer['id']} ({customer.get('email', 'N/A')}) is guest checkout pseudo-user (not a real account)")
+            errors += 1
+        else:
+            to_delete.append(customer)
+    
+    # Delete customers via WooCommerce API, several in flight at once
+    print(f"  Deleting {len(to_delete)} customers...")
+    responses = client.execute_many(
+        WooRequest('DELETE', f"/customers/{customer['id']}", params={"force": True})
+        for customer in to_delete
+    )
+    
+    for customer, resp in zip(to_delete, responses):
         customer_id = customer['id']
         email = customer.get('email', 'N/A')
         
-        if i % 10 == 0:
-            print(f"  Deleting customer {i}/{len(spam_customers)}...")
-        
-        try:
-            # Skip negative IDs (guest checkout pseudo-customers, not real users)
-            if customer_id < 0:
-                print(f"  SKIP: Customer {customer_id} ({email}) is guest checkout pseudo-user (not a real account)")
-                errors += 1
-                continue
-            
-            # Delete customer via WooCommerce API
-            url = client._url(f"/customers/{customer_id}")
-            resp = client.session.delete(url, params={"force": True}, timeout=30)
-            if resp.ok:
-                deleted += 1
-            else:
-                errors += 1
-                error_msg = resp.text[:100] if resp.text else "Unknown error"
-                # Check if it's a role permission error
-                if resp.status_code == 403 and "role" in error_msg.lower():
-                    print(f"  ERROR (Role Permission): Customer {customer_id} ({email}) - Cannot delete via API (has tier role). Delete via WordPress Admin.")
-                else:
-                    print(f"  ERROR deleting customer {customer_id} ({email}): {resp.status_code} {error_msg}")
-        except Exception as e:
+        if isinstance(resp, Exception):
             errors += 1
-            error_str = str(e)
+            error_str = str(resp)
             if "timeout" in error_str.lower():
                 print(f"  ERROR (Timeout): Customer {customer_id} ({email}) - Network timeout. Retry or delete via WordPress Admin.")
             else:
-                print(f"  ERROR deleting customer {customer_id} ({email}): {e}")
+                print(f"  ERROR deleting customer {customer_id} ({email}): {resp}")
+        elif resp.ok:
+            deleted += 1
+        else:
+            errors += 1
+            error_msg = resp.text[:100] if resp.text else "Unknown error"
+            # Check if it's a role permission error
+            if resp.status_code == 403 and "role" in error_msg.lower():
+                print(f"  ERROR (Role Permission): Customer {customer_id} ({email}) - Cannot delete via API (has tier role). Delete via WordPress Admin.")
+            else:
+                print(f"  ERROR deleting customer {customer_id} ({email}): {resp.status_code} {error_msg}")
     
     print(f"\n{'='*60}")
     print(f"DELETION COMPLETE")
@@ -9,10 +9,18 @@ Environment variables (preferred via a .env file):
     CP_SQL_USERNAME        - Optional SQL auth username
     CP_SQL_PASSWORD        - Optional SQL auth password
     CP_SQL_TIMEOUT         - Connection timeout in seconds (defaults 30)
+    CP_SQL_POOL_SIZE       - Max pooled connections per process (defaults 5)
+    CP_SQL_POOL_TIMEOUT    - Seconds to wait for a free pooled connection (defaults 30)
+    CP_SQL_POOL_MAX_IDLE   - Seconds an idle pooled connection is kept (defaults 300)
+    CP_SQL_SLOW_MS         - Statements slower than this many ms are logged as slow (defaults 1000)
+    CP_SQL_SLOW_LOG        - Optional path of a rotating slow-query log file
+    CP_SQL_PERF_LOG_TABLE  - "true" to also record slow statements in USER_SQL_PERF_LOG (defaults false)
 
     WOO_BASE_URL           - WooCommerce site base URL (https://example.com)
     WOO_CONSUMER_KEY       - WooCommerce consumer key
     WOO_CONSUMER_SECRET    - WooCommerce consumer secret
+    WOO_MAX_CONCURRENCY    - Max in-flight WooCommerce requests per client (defaults 4)
+    WOO_MAX_RETRIES        - Transport-level retries per WooCommerce request (defaults 4)
 
     IMAGE_BASE_URL         - Base URL for product images (optional)
     DEFAULT_LOC_ID         - Location filter for inventory (defaults to "01")
@@ -21,6 +29,7 @@ Environment variables (preferred via a .env file):
 from __future__ import annotations
 
 import os
+import threading
 from dataclasses import dataclass
 from typing import Optional
 
@@ -28,6 +37,8 @@ from dotenv import load_dotenv
 
 
 _DOTENV_LOADED = False
+_CONFIG_CACHE: Optional["IntegrationConfig"] = None
+_CONFIG_LOCK = threading.Lock()
 
 
 def _ensure_dotenv_loaded() -> None:
@@ -48,6 +59,12 @@ class DatabaseConfig:
     username: Optional[str]
     password: Optional[str]
     timeout: int
+    pool_size: int = 5
+    pool_timeout: int = 30
+    pool_max_idle: int = 300
+    slow_query_ms: int = 1000
+    slow_query_log: Optional[str] = None
+    perf_log_table: bool = False
 
 
 @dataclass(slots=True)
@@ -57,6 +74,8 @@ class WooCommerceConfig:
     base_url: str
     consumer_key: str
     consumer_secret: str
+    max_concurrency: int = 4
+    max_retries: int = 4
 
 
 @dataclass(slots=True)
@@ -75,6 +94,17 @@ def _get_env(key: str, default: Optional[str] = None) -> Optional[str]:
     return value
 
 
+def get_setting(key: str, default: str) -> str:
+    """
+    Read a tuning knob from the environment, loading .env first.
+
+    Module-level os.getenv runs before .env is loaded and silently falls back
+    to the default; sync code reads its knobs through this at run time.
+    """
+
+    return _get_env(key, default) or default
+
+
 def load_integration_config() -> IntegrationConfig:
     """
     Load configuration values from environment variables.
@@ -90,6 +120,12 @@ def load_integration_config() -> IntegrationConfig:
     username = _get_env("CP_SQL_USERNAME")
     password = _get_env("CP_SQL_PASSWORD")
     timeout = int(_get_env("CP_SQL_TIMEOUT", "30"))
+    pool_size = max(1, int(_get_env("CP_SQL_POOL_SIZE", "5")))
+    pool_timeout = int(_get_env("CP_SQL_POOL_TIMEOUT", "30"))
+    pool_max_idle = int(_get_env("CP_SQL_POOL_MAX_IDLE", "300"))
+    slow_query_ms = int(_get_env("CP_SQL_SLOW_MS", "1000"))
+    slow_query_log = _get_env("CP_SQL_SLOW_LOG") or None
+    perf_log_table = _get_env("CP_SQL_PERF_LOG_TABLE", "false").lower() in {"1", "true", "yes"}
 
     if not server or not database:
         raise ValueError("CP_SQL_SERVER and CP_SQL_DATABASE must be set.")
@@ -105,11 +141,19 @@ def load_integration_config() -> IntegrationConfig:
         username=username,
         password=password,
         timeout=timeout,
+        pool_size=pool_size,
+        pool_timeout=pool_timeout,
+        pool_max_idle=pool_max_idle,
+        slow_query_ms=slow_query_ms,
+        slow_query_log=slow_query_log,
+        perf_log_table=perf_log_table,
     )
 
     woo_base_url = _get_env("WOO_BASE_URL")
     woo_key = _get_env("WOO_CONSUMER_KEY")
     woo_secret = _get_env("WOO_CONSUMER_SECRET")
+    woo_max_concurrency = max(1, int(_get_env("WOO_MAX_CONCURRENCY", "4")))
+    woo_max_retries = max(0, int(_get_env("WOO_MAX_RETRIES", "4")))
 
     if not woo_base_url or not woo_key or not woo_secret:
         raise ValueError("WooCommerce configuration is incomplete (WOO_BASE_URL/KEY/SECRET).")
@@ -118,6 +162,8 @@ def load_integration_config() -> IntegrationConfig:
         base_url=woo_base_url.rstrip("/"),
         consumer_key=woo_key,
         consumer_secret=woo_secret,
+        max_concurrency=woo_max_concurrency,
+        max_retries=woo_max_retries,
     )
 
     image_base_url = _get_env("IMAGE_BASE_URL")
@@ -131,10 +177,41 @@ def load_integration_config() -> IntegrationConfig:
     )
 
 
+def get_integration_config(reload: bool = False) -> IntegrationConfig:
+    """
+    Return the process-wide configuration, loading it on first use.
+
+    load_integration_config() re-reads and re-validates the environment on
+    every call; hot paths (connection checkout, WooClient construction) use
+    this memoized accessor instead.
+
+    Args:
+        reload: Re-read the environment and replace the cached config.
+    """
+
+    global _CONFIG_CACHE
+    if _CONFIG_CACHE is None or reload:
+        with _CONFIG_LOCK:
+            if _CONFIG_CACHE is None or reload:
+                _CONFIG_CACHE = load_integration_config()
+    return _CONFIG_CACHE
+
+
+def clear_integration_config_cache() -> None:
+    """Forget the cached configuration; the next access reloads it."""
+
+    global _CONFIG_CACHE
+    with _CONFIG_LOCK:
+        _CONFIG_CACHE = None
+
+
 __all__ = [
     "DatabaseConfig",
     "WooCommerceConfig",
     "IntegrationConfig",
     "load_integration_config",
+    "get_integration_config",
+    "clear_integration_config_cache",
+    "get_setting",
 ]
 
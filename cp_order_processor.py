@@ -19,7 +19,7 @@ from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 
 from database import get_connection, run_query
-from woo_client import WooClient
+from woo_client import get_client
 
 logging.basicConfig(
     level=logging.INFO,
@@ -361,7 +361,7 @@ def sync_order_status_to_woocommerce(woo_order_id: int, doc_id: int, tkt_no: str
         True if successful, False otherwise
     """
     try:
-        client = WooClient()
+        client = get_client()
         
         # Update status to 'processing' (order is now in CounterPoint)
         note = f"Order created in CounterPoint. DOC_ID: {doc_id}, TKT_NO: {tkt_no}"
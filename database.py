@@ -5,22 +5,66 @@ Safety Notes:
     - Default usage is READ-ONLY. Avoid writing to production without an explicit
       flag and staged process.
     - Connection details come from environment variables handled in config.py.
+
+Connection pooling:
+    get_connection(), connection_ctx() and run_query() all check connections out
+    of a process-wide, thread-safe pool instead of opening a new ODBC connection
+    per call. Calling close() on a pooled connection hands it back to the pool.
+    Pool size/timeouts come from CP_SQL_POOL_* (see config.py); counters are
+    available from get_pool_stats().
+
+Query instrumentation:
+    Every cursor handed out by a pooled connection is an InstrumentedCursor that
+    times execute()/executemany(), counts rows and records parameter *types*
+    (never values). Per-statement totals come from get_query_stats(); statements
+    slower than CP_SQL_SLOW_MS are logged to the "database.slow" logger, an
+    optional rotating file (CP_SQL_SLOW_LOG) and optionally USER_SQL_PERF_LOG.
+    Extra consumers can subscribe with add_query_hook().
+
+Streaming reads:
+    iter_query() yields rows as each fetchmany() batch arrives; read_ahead()
+    runs any such iterator on a background thread behind a bounded queue so
+    the next rows are fetched while the caller is still processing.
+
+Bulk writes:
+    bulk_insert() and bulk_merge() send rows with pyodbc fast_executemany and
+    commit once per batch, replacing per-row INSERT/MERGE round trips. A failed
+    bulk_insert raises BulkInsertError with the number of rows committed first.
+
+Sync watermarks:
+    get_sync_watermark() / set_sync_watermark() keep one high-water mark per
+    incremental sync in USER_SYNC_WATERMARK.
 """
 
 from __future__ import annotations
 
+import atexit
 import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque, namedtuple
 from contextlib import contextmanager
-from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Deque, Dict, Generator, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import pyodbc
 
-from config import DatabaseConfig, load_integration_config
+from config import DatabaseConfig, get_integration_config
 
 logger = logging.getLogger(__name__)
 
 _CONNECTION_STRING_CACHE: Optional[str] = None
 
+# Idle connections are re-validated with SELECT 1 before reuse once they have
+# been parked longer than this; connections older than the max lifetime are
+# closed instead of reused so server-side resets never surface mid-run.
+_VALIDATE_AFTER_IDLE_SECONDS = 5.0
+_MAX_CONNECTION_LIFETIME_SECONDS = 1800.0
+
 
 def _build_connection_string(cfg: DatabaseConfig) -> str:
     global _CONNECTION_STRING_CACHE
@@ -46,28 +90,592 @@ def _build_connection_string(cfg: DatabaseConfig) -> str:
     return _CONNECTION_STRING_CACHE
 
 
-def get_connection() -> pyodbc.Connection:
+# ---------- Query instrumentation ----------
+
+@dataclass(slots=True)
+class QueryEvent:
+    """One timed execute()/executemany() call, passed to query hooks."""
+
+    sql: str
+    elapsed_ms: float
+    rowcount: int
+    param_shape: str
+    executemany: bool = False
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class _QueryStat:
+    calls: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows_fetched: int = 0
+    rows_affected: int = 0
+    param_shape: str = ""
+
+
+_QUERY_STATS: Dict[str, _QueryStat] = {}
+_QUERY_STATS_LOCK = threading.Lock()
+_QUERY_HOOKS: List[Callable[[QueryEvent], None]] = []
+_SLOW_QUERY_MS = 1000.0
+_PERF_LOG_TABLE = False
+_PERF_LOG_BUFFER: Deque[Dict[str, Any]] = deque(maxlen=1000)
+_STATEMENT_KEY_LENGTH = 200
+
+slow_logger = logging.getLogger(__name__ + ".slow")
+
+
+def _statement_key(sql: str) -> str:
+    """Collapse whitespace so the same statement always aggregates under one key."""
+
+    return " ".join(str(sql).split())[:_STATEMENT_KEY_LENGTH]
+
+
+def _param_shape(params: Any) -> str:
+    """Describe parameters by type only - values are never recorded (PII)."""
+
+    if params is None:
+        return "()"
+    if not isinstance(params, (list, tuple)):
+        params = (params,)
+    return "(" + ", ".join(type(p).__name__ for p in params) + ")"
+
+
+def _configure_instrumentation(cfg: DatabaseConfig) -> None:
+    """Apply CP_SQL_SLOW_MS / CP_SQL_SLOW_LOG / CP_SQL_PERF_LOG_TABLE."""
+
+    global _SLOW_QUERY_MS, _PERF_LOG_TABLE
+    _SLOW_QUERY_MS = float(cfg.slow_query_ms)
+    _PERF_LOG_TABLE = cfg.perf_log_table
+    if cfg.slow_query_log and not any(
+        isinstance(h, RotatingFileHandler) and h.baseFilename == os.path.abspath(cfg.slow_query_log)
+        for h in slow_logger.handlers
+    ):
+        log_dir = os.path.dirname(os.path.abspath(cfg.slow_query_log))
+        os.makedirs(log_dir, exist_ok=True)
+        handler = RotatingFileHandler(cfg.slow_query_log, maxBytes=5 * 1024 * 1024, backupCount=5)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        slow_logger.addHandler(handler)
+
+
+def add_query_hook(hook: Callable[[QueryEvent], None]) -> None:
+    """Register a callable invoked with a QueryEvent after every statement."""
+
+    _QUERY_HOOKS.append(hook)
+
+
+def remove_query_hook(hook: Callable[[QueryEvent], None]) -> None:
+    if hook in _QUERY_HOOKS:
+        _QUERY_HOOKS.remove(hook)
+
+
+def get_query_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return per-statement timings keyed by normalized SQL.
+
+    Each entry has calls, errors, total_ms, avg_ms, max_ms, rows_fetched,
+    rows_affected and the last parameter shape seen.
+    """
+
+    with _QUERY_STATS_LOCK:
+        return {
+            key: {
+                "calls": st.calls,
+                "errors": st.errors,
+                "total_ms": round(st.total_ms, 2),
+                "avg_ms": round(st.total_ms / st.calls, 2) if st.calls else 0.0,
+                "max_ms": round(st.max_ms, 2),
+                "rows_fetched": st.rows_fetched,
+                "rows_affected": st.rows_affected,
+                "param_shape": st.param_shape,
+            }
+            for key, st in _QUERY_STATS.items()
+        }
+
+
+def reset_query_stats() -> None:
+    with _QUERY_STATS_LOCK:
+        _QUERY_STATS.clear()
+
+
+def log_query_stats(top: int = 10) -> None:
+    """Log the statements with the highest total time (e.g. at the end of a sync run)."""
+
+    stats = sorted(get_query_stats().items(), key=lambda kv: kv[1]["total_ms"], reverse=True)
+    for key, st in stats[:top]:
+        logger.info(
+            "SQL %8.1f ms total | %5d calls | avg %.1f ms | max %.1f ms | %d rows | %s",
+            st["total_ms"], st["calls"], st["avg_ms"], st["max_ms"],
+            st["rows_fetched"] + st["rows_affected"], key,
+        )
+
+
+def _record_query(event: QueryEvent) -> None:
+    key = _statement_key(event.sql)
+    with _QUERY_STATS_LOCK:
+        st = _QUERY_STATS.setdefault(key, _QueryStat())
+        st.calls += 1
+        st.total_ms += event.elapsed_ms
+        st.max_ms = max(st.max_ms, event.elapsed_ms)
+        st.param_shape = event.param_shape
+        if event.error:
+            st.errors += 1
+        elif event.rowcount > 0:
+            st.rows_affected += event.rowcount
+
+    if event.elapsed_ms >= _SLOW_QUERY_MS:
+        slow_logger.warning(
+            "Slow SQL (%.1f ms, rowcount=%d, params=%s): %s",
+            event.elapsed_ms, event.rowcount, event.param_shape, key,
+        )
+        if _PERF_LOG_TABLE and "USER_SQL_PERF_LOG" not in key:
+            _PERF_LOG_BUFFER.append({
+                "STATEMENT": key,
+                "ELAPSED_MS": int(event.elapsed_ms),
+                "ROW_COUNT": event.rowcount,
+                "PARAM_SHAPE": event.param_shape[:200],
+                "IS_EXECUTEMANY": 1 if event.executemany else 0,
+                "ERROR_MSG": event.error,
+            })
+
+    for hook in list(_QUERY_HOOKS):
+        try:
+            hook(event)
+        except Exception:
+            logger.exception("Query hook %r failed", hook)
+
+
+def _record_fetch(sql: Optional[str], rows: int) -> None:
+    if sql is None or rows <= 0:
+        return
+    key = _statement_key(sql)
+    with _QUERY_STATS_LOCK:
+        st = _QUERY_STATS.get(key)
+        if st is not None:
+            st.rows_fetched += rows
+
+
+class InstrumentedCursor:
+    """
+    Wrapper around a pyodbc cursor that times execute()/executemany() and
+    counts fetched rows. Everything else is delegated to the real cursor.
+    """
+
+    __slots__ = ("_cursor", "_last_sql")
+
+    def __init__(self, cursor: Any) -> None:
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_last_sql", None)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in InstrumentedCursor.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def _timed(self, method: Callable[..., Any], sql: str, params: Any, shape: str, many: bool) -> Any:
+        object.__setattr__(self, "_last_sql", sql)
+        start = time.perf_counter()
+        error = None
+        try:
+            return method(sql, *params) if not many else method(sql, params)
+        except Exception as exc:
+            error = str(exc)[:500]
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000.0
+            rowcount = getattr(self._cursor, "rowcount", -1)
+            _record_query(QueryEvent(
+                sql=sql,
+                elapsed_ms=elapsed,
+                rowcount=rowcount if isinstance(rowcount, int) else -1,
+                param_shape=shape,
+                executemany=many,
+                error=error,
+            ))
+
+    def execute(self, sql: str, *params: Any) -> "InstrumentedCursor":
+        shape_source = params[0] if len(params) == 1 and isinstance(params[0], (list, tuple)) else params
+        self._timed(self._cursor.execute, sql, params, _param_shape(shape_source), False)
+        return self
+
+    def executemany(self, sql: str, seq_of_params: Sequence[Any]) -> None:
+        seq = seq_of_params if isinstance(seq_of_params, (list, tuple)) else list(seq_of_params)
+        shape = f"{len(seq)} x {_param_shape(seq[0]) if seq else '()'}"
+        self._timed(self._cursor.executemany, sql, seq, shape, True)
+
+    def fetchone(self) -> Any:
+        row = self._cursor.fetchone()
+        if row is not None:
+            _record_fetch(self._last_sql, 1)
+        return row
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Any]:
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        _record_fetch(self._last_sql, len(rows) if isinstance(rows, list) else 0)
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        rows = self._cursor.fetchall()
+        _record_fetch(self._last_sql, len(rows) if isinstance(rows, list) else 0)
+        return rows
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in self._cursor:
+            _record_fetch(self._last_sql, 1)
+            yield row
+
+    def __enter__(self) -> "InstrumentedCursor":
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> Any:
+        return self._cursor.__exit__(exc_type, exc, tb)
+
+
+# ---------- Connection pool ----------
+
+class PoolTimeoutError(pyodbc.Error):
+    """Raised when no pooled connection frees up within CP_SQL_POOL_TIMEOUT."""
+
+
+class BulkInsertError(pyodbc.Error):
+    """bulk_insert failed part-way; the first `inserted` rows were committed."""
+
+    def __init__(self, inserted: int, cause: BaseException) -> None:
+        super().__init__(f"{cause} ({inserted} row(s) committed before the failure)")
+        self.inserted = inserted
+        self.cause = cause
+
+
+def _is_disconnect(exc: BaseException) -> bool:
+    """True if a pyodbc error means the underlying connection is unusable."""
+
+    if isinstance(exc, (pyodbc.OperationalError, pyodbc.InterfaceError)):
+        return True
+    sqlstate = exc.args[0] if getattr(exc, "args", None) else None
+    # SQLSTATE class 08 = connection exception (08S01 link failure, etc.)
+    return isinstance(sqlstate, str) and sqlstate.startswith("08")
+
+
+@dataclass(slots=True)
+class _PoolEntry:
+    raw: Any
+    created: float
+    last_used: float
+    # Session settings as opened; restored before the connection is re-pooled
+    autocommit: bool = False
+    timeout: int = 0
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled pyodbc connection.
+
+    Behaves like pyodbc.Connection (attributes and methods are delegated), but
+    close() returns the connection to the pool instead of closing the socket.
     """
-    Create and return a live pyodbc connection to WOODYS_CP.
+
+    __slots__ = ("_pool", "_entry", "_closed", "_broken")
+
+    def __init__(self, pool: "ConnectionPool", entry: _PoolEntry) -> None:
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_entry", entry)
+        object.__setattr__(self, "_closed", False)
+        object.__setattr__(self, "_broken", False)
+
+    def _raw(self) -> Any:
+        if self._closed:
+            raise pyodbc.ProgrammingError("Attempt to use a closed connection.")
+        return self._entry.raw
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._raw(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in PooledConnection.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw(), name, value)
+
+    def cursor(self) -> InstrumentedCursor:
+        return InstrumentedCursor(self._raw().cursor())
+
+    def invalidate(self) -> None:
+        """Mark the connection broken so close() discards it instead of pooling it."""
+
+        object.__setattr__(self, "_broken", True)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        object.__setattr__(self, "_closed", True)
+        self._pool._release(self._entry, broken=self._broken)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # Same transaction semantics as pyodbc.Connection: commit on success.
+        if exc_type is None:
+            self._raw().commit()
+        else:
+            self._raw().rollback()
+
+    def __del__(self) -> None:
+        try:
+            if not self._closed:
+                self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe, size-capped pool of pyodbc connections for one connection string."""
+
+    def __init__(
+        self,
+        conn_str: str,
+        max_size: int = 5,
+        timeout: float = 30,
+        max_idle: float = 300,
+    ) -> None:
+        self._conn_str = conn_str
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: Deque[_PoolEntry] = deque()
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "hits": 0,        # checkouts served by an idle connection
+            "opens": 0,       # new ODBC connections opened
+            "waits": 0,       # checkouts that had to wait for a free slot
+            "timeouts": 0,    # waits that gave up (PoolTimeoutError)
+            "failures": 0,    # pyodbc.connect() failures
+            "evictions": 0,   # stale/broken connections closed by the pool
+        }
+
+    def _pop_idle_locked(self, now: float) -> Tuple[Optional[_PoolEntry], List[_PoolEntry]]:
+        """Pop the most recently used idle entry, collecting expired ones to close."""
+
+        expired: List[_PoolEntry] = []
+        while self._idle:
+            entry = self._idle.pop()
+            if (now - entry.last_used > self.max_idle
+                    or now - entry.created > _MAX_CONNECTION_LIFETIME_SECONDS):
+                expired.append(entry)
+                continue
+            return entry, expired
+        return None, expired
+
+    @staticmethod
+    def _close_quietly(entry: _PoolEntry) -> None:
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(entry: _PoolEntry) -> bool:
+        try:
+            cur = entry.raw.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def acquire(self) -> PooledConnection:
+        """Check out a connection, waiting up to `timeout` seconds for a free slot."""
+
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                entry, expired = self._pop_idle_locked(now)
+                self._stats["evictions"] += len(expired)
+                for stale in expired:
+                    self._close_quietly(stale)
+                if entry is not None or self._in_use < self.max_size:
+                    self._in_use += 1
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available within {self.timeout}s "
+                        f"(pool size {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+        if entry is not None:
+            idle_for = time.monotonic() - entry.last_used
+            if idle_for > _VALIDATE_AFTER_IDLE_SECONDS and not self._is_alive(entry):
+                self._close_quietly(entry)
+                with self._cond:
+                    self._stats["evictions"] += 1
+                entry = None
+            else:
+                with self._cond:
+                    self._stats["hits"] += 1
+
+        if entry is None:
+            try:
+                raw = pyodbc.connect(self._conn_str)
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._stats["failures"] += 1
+                    self._cond.notify()
+                raise
+            now = time.monotonic()
+            entry = _PoolEntry(
+                raw=raw,
+                created=now,
+                last_used=now,
+                autocommit=getattr(raw, "autocommit", False),
+                timeout=getattr(raw, "timeout", 0),
+            )
+            with self._cond:
+                self._stats["opens"] += 1
+
+        return PooledConnection(self, entry)
+
+    def _release(self, entry: _PoolEntry, broken: bool = False) -> None:
+        if not broken:
+            try:
+                # Discard any uncommitted work, matching pyodbc's close() semantics.
+                entry.raw.rollback()
+                # Undo per-caller session changes (autocommit, query timeout) so
+                # the next borrower gets a connection as pyodbc.connect() made it.
+                if entry.raw.autocommit != entry.autocommit:
+                    entry.raw.autocommit = entry.autocommit
+                if entry.raw.timeout != entry.timeout:
+                    entry.raw.timeout = entry.timeout
+            except pyodbc.Error:
+                broken = True
+
+        discard = broken
+        with self._cond:
+            self._in_use -= 1
+            if self._closed:
+                discard = True
+            elif not broken:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            if broken:
+                self._stats["evictions"] += 1
+            self._cond.notify()
+        if discard:
+            self._close_quietly(entry)
+
+    def close_all(self) -> None:
+        """Close idle connections and stop pooling; in-use ones close on release."""
+
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                **self._stats,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+            }
+
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                cfg = get_integration_config().database
+                _configure_instrumentation(cfg)
+                conn_str = _build_connection_string(cfg)
+                logger.debug("Creating connection pool for %s / %s (size=%d)",
+                             cfg.server, cfg.database, cfg.pool_size)
+                logger.debug("Connection string (password hidden): %s",
+                             conn_str.replace(cfg.password or "", "***") if cfg.password else conn_str)
+                _POOL = ConnectionPool(
+                    conn_str,
+                    max_size=cfg.pool_size,
+                    timeout=cfg.pool_timeout,
+                    max_idle=cfg.pool_max_idle,
+                )
+    return _POOL
+
+
+def close_pool() -> None:
+    """Close all pooled connections and forget cached connection settings."""
+
+    global _POOL, _CONNECTION_STRING_CACHE
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+        _CONNECTION_STRING_CACHE = None
+    if pool is not None:
+        pool.close_all()
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """Return pool counters (hits, waits, opens, failures, evictions, in_use, idle)."""
+
+    if _POOL is None:
+        return {}
+    return _POOL.stats()
+
+
+atexit.register(close_pool)
+
+
+def get_connection() -> PooledConnection:
+    """
+    Check out a live connection to WOODYS_CP from the connection pool.
+
+    Callers must close() it when done; closing returns it to the pool.
 
     Returns:
-        pyodbc.Connection
+        PooledConnection (drop-in for pyodbc.Connection)
     """
 
-    cfg = load_integration_config().database
-    conn_str = _build_connection_string(cfg)
-    logger.debug("Connecting to SQL Server %s / %s", cfg.server, cfg.database)
-    logger.debug("Connection string (password hidden): %s", conn_str.replace(cfg.password or "", "***"))
-    return pyodbc.connect(conn_str)
+    return _get_pool().acquire()
 
 
 @contextmanager
-def connection_ctx() -> Generator[pyodbc.Connection, None, None]:
+def connection_ctx() -> Generator[PooledConnection, None, None]:
     """Context manager wrapper so callers can use `with connection_ctx() as conn`."""
 
     conn = get_connection()
     try:
         yield conn
+    except pyodbc.Error as exc:
+        if _is_disconnect(exc):
+            conn.invalidate()
+        raise
     finally:
         conn.close()
 
@@ -107,5 +715,452 @@ def run_query(
         return []
 
 
-__all__ = ["get_connection", "run_query", "connection_ctx"]
+def _row_factory(columns: Sequence[str], row_type: str) -> Callable[[Sequence[Any]], Any]:
+    if row_type == "dict":
+        return lambda row: dict(zip(columns, row))
+    if row_type == "tuple":
+        return tuple
+    if row_type == "namedtuple":
+        row_cls = namedtuple("Row", columns, rename=True)  # type: ignore[misc]
+        return lambda row: row_cls(*row)
+    raise ValueError(f"Unknown row_type: {row_type!r} (expected dict, tuple or namedtuple)")
+
+
+def iter_query(
+    sql: str,
+    params: Optional[Iterable[Any]] = None,
+    batch_size: int = 500,
+    row_type: str = "dict",
+    batches: bool = False,
+    conn: Optional[Any] = None,
+) -> Iterator[Any]:
+    """
+    Stream a query's results with cursor.fetchmany() instead of fetchall().
+
+    Rows are yielded as soon as each batch arrives, so callers can start
+    downstream work before the full result set has been transferred.
+
+    Args:
+        sql: Parameterized SQL statement.
+        params: Optional iterable of parameter values.
+        batch_size: Rows per fetchmany() round trip.
+        row_type: "dict" (like run_query), "tuple", or "namedtuple" (attribute access).
+        batches: If True, yield lists of up to batch_size rows instead of single rows.
+        conn: Optional open connection to stream on. By default a pooled connection
+            is held for the lifetime of the generator, leaving the caller's own
+            connection free for other statements (no MARS needed).
+
+    Unlike run_query(), database errors are raised rather than swallowed: a
+    half-streamed result must not be mistaken for a complete one.
+    """
+
+    params = tuple(params or [])
+    logger.debug("Streaming query: %s | params=%s", sql, params)
+
+    with (connection_ctx() if conn is None else _borrowed(conn)) as active:
+        cursor = active.cursor()
+        try:
+            cursor.execute(sql, params)
+            columns = [col[0] for col in cursor.description]
+            make_row = _row_factory(columns, row_type)
+            total = 0
+            while True:
+                chunk = cursor.fetchmany(batch_size)
+                if not chunk:
+                    break
+                total += len(chunk)
+                rows = [make_row(row) for row in chunk]
+                if batches:
+                    yield rows
+                else:
+                    yield from rows
+            logger.info("Streamed %d rows", total)
+        finally:
+            cursor.close()
+
+
+def read_ahead(iterable: Iterable[Any], maxsize: int = 500) -> Iterator[Any]:
+    """
+    Iterate `iterable` on a background thread, staying at most maxsize items ahead.
+
+    The reader blocks while the queue is full (back-pressure), exceptions it
+    hits are re-raised in the consumer, and closing this generator early stops
+    the reader and closes `iterable` (releasing e.g. an iter_query connection).
+    """
+
+    items: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(entry: Tuple[str, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader() -> None:
+        source = iter(iterable)
+        try:
+            for item in source:
+                if not put(("item", item)):
+                    return
+            put(("done", None))
+        except BaseException as exc:
+            put(("error", exc))
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=reader, name="read-ahead", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "item":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                return
+    finally:
+        stop.set()
+        thread.join(timeout=5)
+
+
+@contextmanager
+def _borrowed(conn: Any) -> Generator[Any, None, None]:
+    """Use a caller-owned connection without closing it afterwards."""
+
+    yield conn
+
+
+# ---------- Bulk writes ----------
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_BULK_STAGE_TABLE = "#bulk_merge_stage"
+
+
+def _quote_identifier(name: str) -> str:
+    """Validate a (optionally schema-qualified) identifier and bracket-quote it."""
+
+    parts = name.split(".")
+    if not 1 <= len(parts) <= 2 or not all(_IDENTIFIER_RE.match(p) for p in parts):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return ".".join(f"[{p}]" for p in parts)
+
+
+def _row_columns(rows: Sequence[Dict[str, Any]], columns: Optional[Sequence[str]]) -> List[str]:
+    cols = list(columns) if columns else list(rows[0].keys())
+    for col in cols:
+        _quote_identifier(col)
+    return cols
+
+
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    size = max(1, int(size))
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@contextmanager
+def _write_connection(conn: Optional[Any]) -> Generator[Any, None, None]:
+    """Yield the caller's connection, or a pooled one that is closed afterwards."""
+
+    if conn is not None:
+        yield conn
+        return
+    pooled = get_connection()
+    try:
+        yield pooled
+    except pyodbc.Error as exc:
+        if _is_disconnect(exc):
+            pooled.invalidate()
+        raise
+    finally:
+        pooled.close()
+
+
+def _fast_cursor(conn: Any) -> Any:
+    cursor = conn.cursor()
+    try:
+        cursor.fast_executemany = True
+    except AttributeError:
+        # Older pyodbc builds: plain executemany still batches on one cursor.
+        pass
+    return cursor
+
+
+def bulk_insert(
+    table: str,
+    rows: Sequence[Dict[str, Any]],
+    columns: Optional[Sequence[str]] = None,
+    conn: Optional[Any] = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Insert many rows with pyodbc fast_executemany, committing once per batch.
+
+    Args:
+        table: Target table, e.g. "dbo.USER_ORDER_STAGING".
+        rows: Dicts keyed by column name (every row must have every column).
+        columns: Column order; defaults to the keys of the first row.
+        conn: Optional open connection. By default a pooled connection is used.
+        batch_size: Rows sent (and committed) per executemany round trip.
+
+    Returns:
+        Number of rows inserted.
+
+    Raises:
+        BulkInsertError: a batch failed. Batches committed before it stay
+            committed; .inserted says how many leading rows that is.
+    """
+
+    if not rows:
+        return 0
+    target = _quote_identifier(table)
+    cols = _row_columns(rows, columns)
+    sql = (
+        f"INSERT INTO {target} ({', '.join(f'[{c}]' for c in cols)}) "
+        f"VALUES ({', '.join('?' for _ in cols)})"
+    )
+
+    inserted = 0
+    try:
+        with _write_connection(conn) as active:
+            cursor = _fast_cursor(active)
+            try:
+                for chunk in _chunks(rows, batch_size):
+                    cursor.executemany(sql, [tuple(row[c] for c in cols) for row in chunk])
+                    active.commit()
+                    inserted += len(chunk)
+            finally:
+                cursor.close()
+    except pyodbc.Error as exc:
+        raise BulkInsertError(inserted, exc) from exc
+    logger.info("Bulk inserted %d rows into %s", inserted, table)
+    return inserted
+
+
+def bulk_merge(
+    table: str,
+    key_cols: Sequence[str],
+    rows: Sequence[Dict[str, Any]],
+    columns: Optional[Sequence[str]] = None,
+    update_cols: Optional[Sequence[str]] = None,
+    insert_cols: Optional[Sequence[str]] = None,
+    update_extra: Optional[Dict[str, str]] = None,
+    insert_extra: Optional[Dict[str, str]] = None,
+    match_extra: Optional[str] = None,
+    conn: Optional[Any] = None,
+    batch_size: int = 1000,
+) -> Tuple[int, int]:
+    """
+    Upsert many rows: fast_executemany into a #temp table, then one MERGE per batch.
+
+    The temp table is created with SELECT TOP 0 ... INTO so it inherits the
+    target's column types. Rows with duplicate keys are collapsed (last wins),
+    because MERGE rejects a target row matched by more than one source row.
+
+    Args:
+        table: Target table, e.g. "dbo.USER_PRODUCT_MAP".
+        key_cols: Columns the MERGE matches on.
+        rows: Dicts keyed by column name.
+        columns: Columns loaded from rows; defaults to the keys of the first row.
+        update_cols: Columns copied from the source on match (default: non-key columns).
+        insert_cols: Columns copied from the source on insert (default: all columns).
+        update_extra / insert_extra: Extra column -> SQL expression assignments,
+            e.g. {"UPDATED_DT": "SYSDATETIME()"}. These are trusted SQL fragments
+            written in code, never user data.
+        match_extra: Extra trusted predicate ANDed to the ON clause (target alias t),
+            e.g. "t.IS_ACTIVE = 1".
+        conn: Optional open connection. By default a pooled connection is used.
+        batch_size: Rows staged and merged (and committed) per round trip.
+
+    Returns:
+        (inserted, updated) row counts from MERGE OUTPUT $action.
+    """
+
+    if not rows:
+        return 0, 0
+    target = _quote_identifier(table)
+    cols = _row_columns(rows, columns)
+    keys = list(key_cols)
+    if not keys or any(k not in cols for k in keys):
+        raise ValueError(f"key_cols {keys} must be a non-empty subset of {cols}")
+    updates = list(update_cols) if update_cols is not None else [c for c in cols if c not in keys]
+    inserts = list(insert_cols) if insert_cols is not None else cols
+    for col in list(updates) + list(inserts) + list(update_extra or {}) + list(insert_extra or {}):
+        _quote_identifier(col)
+
+    unique: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for row in rows:
+        unique[tuple(row[k] for k in keys)] = row
+    staged_rows = list(unique.values())
+
+    col_list = ", ".join(f"[{c}]" for c in cols)
+    on_clause = " AND ".join(f"t.[{k}] = s.[{k}]" for k in keys)
+    if match_extra:
+        on_clause += f" AND {match_extra}"
+    set_parts = [f"[{c}] = s.[{c}]" for c in updates]
+    set_parts += [f"[{c}] = {expr}" for c, expr in (update_extra or {}).items()]
+    ins_cols = [f"[{c}]" for c in inserts] + [f"[{c}]" for c in (insert_extra or {})]
+    ins_vals = [f"s.[{c}]" for c in inserts] + list((insert_extra or {}).values())
+
+    merge_sql = f"MERGE {target} AS t USING {_BULK_STAGE_TABLE} AS s ON {on_clause} "
+    if set_parts:
+        merge_sql += f"WHEN MATCHED THEN UPDATE SET {', '.join(set_parts)} "
+    merge_sql += (
+        f"WHEN NOT MATCHED BY TARGET THEN INSERT ({', '.join(ins_cols)}) "
+        f"VALUES ({', '.join(ins_vals)}) OUTPUT $action;"
+    )
+    load_sql = (
+        f"INSERT INTO {_BULK_STAGE_TABLE} ({col_list}) "
+        f"VALUES ({', '.join('?' for _ in cols)})"
+    )
+
+    inserted = updated = 0
+    with _write_connection(conn) as active:
+        cursor = _fast_cursor(active)
+        try:
+            cursor.execute(
+                f"IF OBJECT_ID('tempdb..{_BULK_STAGE_TABLE}') IS NOT NULL DROP TABLE {_BULK_STAGE_TABLE}; "
+                f"SELECT TOP 0 {col_list} INTO {_BULK_STAGE_TABLE} FROM {target};"
+            )
+            for chunk in _chunks(staged_rows, batch_size):
+                cursor.executemany(load_sql, [tuple(row[c] for c in cols) for row in chunk])
+                cursor.execute(merge_sql)
+                for (action,) in cursor.fetchall():
+                    if action == "INSERT":
+                        inserted += 1
+                    elif action == "UPDATE":
+                        updated += 1
+                cursor.execute(f"TRUNCATE TABLE {_BULK_STAGE_TABLE};")
+                active.commit()
+            cursor.execute(f"DROP TABLE {_BULK_STAGE_TABLE};")
+            active.commit()
+        finally:
+            cursor.close()
+    logger.info("Bulk merged into %s: %d inserted, %d updated", table, inserted, updated)
+    return inserted, updated
+
+
+@dataclass(frozen=True)
+class SyncWatermark:
+    """One USER_SYNC_WATERMARK row."""
+
+    high_water_mark: Optional[Any]
+    last_full_run: Optional[Any]
+
+
+def get_sync_watermark(name: str, conn: Optional[Any] = None) -> SyncWatermark:
+    """
+    Return the stored high-water mark for an incremental sync.
+
+    A missing row, or a missing table, reads as SyncWatermark(None, None), so
+    callers fall back to a full run.
+    """
+
+    try:
+        with _write_connection(conn) as active:
+            cursor = active.cursor()
+            try:
+                cursor.execute(
+                    "SELECT HIGH_WATER_MARK, LAST_FULL_RUN_DT FROM dbo.USER_SYNC_WATERMARK WHERE SYNC_NAME = ?;",
+                    (name,),
+                )
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+    except pyodbc.Error as exc:
+        logger.warning("Could not read sync watermark %r: %s", name, exc)
+        return SyncWatermark(None, None)
+    return SyncWatermark(row[0], row[1]) if row else SyncWatermark(None, None)
+
+
+_SET_WATERMARK_SQL = """
+MERGE dbo.USER_SYNC_WATERMARK AS t
+USING (SELECT ? AS SYNC_NAME, CAST(? AS DATETIME2) AS HIGH_WATER_MARK, ? AS FULL_RUN) AS s
+    ON t.SYNC_NAME = s.SYNC_NAME
+WHEN MATCHED THEN UPDATE SET
+    HIGH_WATER_MARK = CASE WHEN t.HIGH_WATER_MARK IS NULL OR s.HIGH_WATER_MARK > t.HIGH_WATER_MARK
+                           THEN s.HIGH_WATER_MARK ELSE t.HIGH_WATER_MARK END,
+    LAST_FULL_RUN_DT = CASE WHEN s.FULL_RUN = 1 THEN SYSDATETIME() ELSE t.LAST_FULL_RUN_DT END,
+    UPDATED_DT = SYSDATETIME(),
+    UPDATED_BY = SYSTEM_USER
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT (SYNC_NAME, HIGH_WATER_MARK, LAST_FULL_RUN_DT, UPDATED_DT)
+    VALUES (s.SYNC_NAME, s.HIGH_WATER_MARK, CASE WHEN s.FULL_RUN = 1 THEN SYSDATETIME() END, SYSDATETIME());
+"""
+
+
+def set_sync_watermark(name: str, high_water_mark: Any, full_run: bool = False,
+                       conn: Optional[Any] = None) -> None:
+    """
+    Store a new high-water mark; full_run=True also stamps LAST_FULL_RUN_DT.
+
+    The mark never moves backwards, and None keeps the stored one, so a run
+    that saw nothing new can still record that it was a full run.
+    """
+
+    with _write_connection(conn) as active:
+        cursor = active.cursor()
+        try:
+            cursor.execute(_SET_WATERMARK_SQL, (name, high_water_mark, 1 if full_run else 0))
+            active.commit()
+        finally:
+            cursor.close()
+
+
+def flush_perf_log() -> int:
+    """
+    Write buffered slow statements to USER_SQL_PERF_LOG (CP_SQL_PERF_LOG_TABLE=true).
+
+    Runs automatically at interpreter exit; long-lived processes may call it
+    periodically. Returns the number of rows written.
+    """
+
+    rows = []
+    while _PERF_LOG_BUFFER:
+        rows.append(_PERF_LOG_BUFFER.popleft())
+    if not rows:
+        return 0
+    try:
+        return bulk_insert("dbo.USER_SQL_PERF_LOG", rows)
+    except Exception as exc:
+        logger.warning("Could not write %d slow-query rows to USER_SQL_PERF_LOG: %s", len(rows), exc)
+        return 0
+
+
+# Runs before close_pool() (atexit is LIFO) so the flush can still borrow a connection.
+atexit.register(flush_perf_log)
+
+__all__ = [
+    "ConnectionPool",
+    "PooledConnection",
+    "PoolTimeoutError",
+    "BulkInsertError",
+    "get_connection",
+    "run_query",
+    "iter_query",
+    "read_ahead",
+    "bulk_insert",
+    "bulk_merge",
+    "connection_ctx",
+    "close_pool",
+    "get_pool_stats",
+    "InstrumentedCursor",
+    "QueryEvent",
+    "add_query_hook",
+    "remove_query_hook",
+    "get_query_stats",
+    "reset_query_stats",
+    "log_query_stats",
+    "flush_perf_log",
+    "SyncWatermark",
+    "get_sync_watermark",
+    "set_sync_watermark",
+]
 
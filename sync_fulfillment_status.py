@@ -4,7 +4,7 @@ Monitors PS_DOC_HDR.SHIP_DAT to detect when orders are shipped,
 then updates WooCommerce order status to 'completed'.
 """
 from database import run_query, get_connection
-from woo_client import WooClient
+from woo_client import ORDER_STATUS_FIELDS, get_client
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -54,9 +54,8 @@ def find_fulfilled_orders():
 def check_woocommerce_status(woo_order_id: int) -> str:
     """Check current WooCommerce order status"""
     try:
-        client = WooClient()
-        url = client._url(f"/orders/{woo_order_id}")
-        response = client.session.get(url, timeout=30)
+        client = get_client()
+        response = client.get(f"/orders/{woo_order_id}", fields=ORDER_STATUS_FIELDS)
         
         if response.ok:
             order = response.json()
@@ -87,19 +86,22 @@ def sync_fulfillment_to_woocommerce(dry_run: bool = True):
     
     print(f"\nFound {len(fulfilled_orders)} orders that are shipped in CounterPoint")
     
-    client = WooClient()
+    client = get_client()
     updated = 0
     skipped = 0
     
-    for order in fulfilled_orders:
+    # Look up current WooCommerce statuses in parallel (results keep CP order)
+    statuses = client.map_concurrent(
+        lambda o: check_woocommerce_status(o['WOO_ORDER_ID']), fulfilled_orders
+    )
+    pending_updates = []
+    
+    for order, current_status in zip(fulfilled_orders, statuses):
         woo_id = order['WOO_ORDER_ID']
         doc_id = order['CP_DOC_ID']
         tkt_no = order['TKT_NO']
         ship_date = order['SHIP_DAT']
         
-        # Check current WooCommerce status
-        current_status = check_woocommerce_status(woo_id)
-        
         # Get shipping info for validation display
         ship_name = order.get('SHIP_NAME', 'N/A')
         ship_address = order.get('SHIP_ADDRESS', 'N/A')
@@ -128,18 +130,8 @@ def sync_fulfillment_to_woocommerce(dry_run: bool = True):
                 print(f"  [DRY RUN] Would update status to 'completed'")
                 updated += 1
             else:
-                success, error_msg = client.update_order_status(
-                    order_id=woo_id,
-                    status='completed',
-                    note=note
-                )
-                
-                if success:
-                    print(f"  [OK] Status updated to 'completed'")
-                    updated += 1
-                else:
-                    print(f"  [ERROR] Failed to update: {error_msg}")
-                    skipped += 1
+                print(f"  Queued status update to 'completed'")
+                pending_updates.append((woo_id, note))
         elif current_status == 'completed':
             print(f"  [SKIP] Already completed in WooCommerce")
             skipped += 1
@@ -147,6 +139,20 @@ def sync_fulfillment_to_woocommerce(dry_run: bool = True):
             print(f"  [SKIP] Status is '{current_status}' (not processing/pending)")
             skipped += 1
     
+    if pending_updates:
+        print(f"\nUpdating {len(pending_updates)} order(s) to 'completed'...")
+        results = client.map_concurrent(
+            lambda u: client.update_order_status(order_id=u[0], status='completed', note=u[1]),
+            pending_updates,
+        )
+        for (woo_id, _), (success, error_msg) in zip(pending_updates, results):
+            if success:
+                print(f"  [OK] Order #{woo_id}: status updated to 'completed'")
+                updated += 1
+            else:
+                print(f"  [ERROR] Order #{woo_id}: failed to update: {error_msg}")
+                skipped += 1
+    
     print("\n" + "="*80)
     print(f"SYNC COMPLETE")
     print("="*80)
@@ -2,6 +2,8 @@
 
 import pytest
 
+import config
+
 
 @pytest.fixture(autouse=True)
 def clear_env(monkeypatch):
@@ -15,9 +17,17 @@ def clear_env(monkeypatch):
         "CP_SQL_TIMEOUT",
         "CP_SQL_USERNAME",
         "CP_SQL_PASSWORD",
+        "CP_SQL_POOL_SIZE",
+        "CP_SQL_POOL_TIMEOUT",
+        "CP_SQL_POOL_MAX_IDLE",
+        "CP_SQL_SLOW_MS",
+        "CP_SQL_SLOW_LOG",
+        "CP_SQL_PERF_LOG_TABLE",
         "WOO_BASE_URL",
         "WOO_CONSUMER_KEY",
         "WOO_CONSUMER_SECRET",
+        "WOO_MAX_CONCURRENCY",
+        "WOO_MAX_RETRIES",
         "IMAGE_BASE_URL",
         "DEFAULT_LOC_ID",
         "DRY_RUN",
@@ -26,4 +36,7 @@ def clear_env(monkeypatch):
     ]
     for key in keys:
         monkeypatch.delenv(key, raising=False)
+    config.clear_integration_config_cache()
+    yield
+    config.clear_integration_config_cache()
 
@@ -8,7 +8,7 @@ if project_root not in sys.path:
 
 import pytest
 
-from config import IntegrationConfig, load_integration_config
+from config import IntegrationConfig, get_integration_config, load_integration_config
 
 REQUIRED_ENV = {
     "CP_SQL_SERVER": "ADWPC-MAIN",
@@ -59,3 +59,21 @@ def test_load_config_sql_auth(monkeypatch):
     assert config.database.username == "cp_user"
     assert config.database.password == "secret"
 
+
+
+def test_get_integration_config_is_memoized(monkeypatch):
+    set_env(monkeypatch)
+    first = get_integration_config()
+    monkeypatch.setenv("CP_SQL_SERVER", "OTHER-HOST")
+    assert get_integration_config() is first
+    assert first.database.server == REQUIRED_ENV["CP_SQL_SERVER"]
+
+
+def test_get_integration_config_reload(monkeypatch):
+    set_env(monkeypatch)
+    first = get_integration_config()
+    monkeypatch.setenv("CP_SQL_SERVER", "OTHER-HOST")
+    reloaded = get_integration_config(reload=True)
+    assert reloaded is not first
+    assert reloaded.database.server == "OTHER-HOST"
+    assert get_integration_config() is reloaded
@@ -14,6 +14,13 @@ import pytest
 import database
 
 
+@pytest.fixture(autouse=True)
+def reset_pool():
+    database.close_pool()
+    yield
+    database.close_pool()
+
+
 def _set_min_env(monkeypatch):
     monkeypatch.setenv("CP_SQL_SERVER", "server")
     monkeypatch.setenv("CP_SQL_DATABASE", "db")
@@ -47,3 +54,319 @@ def test_run_query_handles_exception(mock_connect, monkeypatch):
     rows = database.run_query("SELECT 1")
     assert rows == []
 
+
+
+@patch("database.pyodbc.connect")
+def test_run_query_reuses_pooled_connection(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    cursor = MagicMock()
+    cursor.description = [("ITEM_NO",)]
+    cursor.fetchall.return_value = [("01",)]
+    mock_connect.return_value.cursor.return_value = cursor
+
+    database.run_query("SELECT 1")
+    database.run_query("SELECT 2")
+
+    assert mock_connect.call_count == 1
+    stats = database.get_pool_stats()
+    assert stats["opens"] == 1
+    assert stats["hits"] == 1
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+
+
+@patch("database.pyodbc.connect")
+def test_connection_close_returns_to_pool(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    conn = database.get_connection()
+    conn.close()
+    conn.close()  # idempotent
+
+    mock_connect.return_value.close.assert_not_called()
+    assert database.get_pool_stats()["idle"] == 1
+
+
+@patch("database.pyodbc.connect")
+def test_released_connection_resets_session_settings(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    mock_connect.return_value.autocommit = False
+    mock_connect.return_value.timeout = 0
+
+    conn = database.get_connection()
+    conn.autocommit = True
+    conn.timeout = 60
+    conn.close()
+
+    conn = database.get_connection()
+    assert mock_connect.call_count == 1
+    assert conn.autocommit is False
+    assert conn.timeout == 0
+    conn.close()
+
+
+@patch("database.pyodbc.connect")
+def test_disconnected_connection_is_evicted(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    with pytest.raises(pyodbc.OperationalError):
+        with database.connection_ctx():
+            raise pyodbc.OperationalError("08S01", "Communication link failure")
+
+    stats = database.get_pool_stats()
+    assert stats["idle"] == 0
+    assert stats["evictions"] == 1
+    mock_connect.return_value.close.assert_called_once()
+
+
+@patch("database.pyodbc.connect")
+def test_pool_times_out_when_exhausted(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    monkeypatch.setenv("CP_SQL_POOL_SIZE", "1")
+    monkeypatch.setenv("CP_SQL_POOL_TIMEOUT", "0")
+    held = database.get_connection()
+    with pytest.raises(database.PoolTimeoutError):
+        database.get_connection()
+    held.close()
+
+    stats = database.get_pool_stats()
+    assert stats["waits"] == 1
+    assert stats["timeouts"] == 1
+
+
+@patch("database.pyodbc.connect")
+def test_iter_query_streams_with_fetchmany(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    cursor = MagicMock()
+    cursor.description = [("SKU",), ("STOCK_QTY",)]
+    cursor.fetchmany.side_effect = [[("A", 1), ("B", 2)], [("C", 3)], []]
+    mock_connect.return_value.cursor.return_value = cursor
+
+    rows = list(database.iter_query("SELECT SKU, STOCK_QTY FROM t", batch_size=2))
+
+    assert rows == [
+        {"SKU": "A", "STOCK_QTY": 1},
+        {"SKU": "B", "STOCK_QTY": 2},
+        {"SKU": "C", "STOCK_QTY": 3},
+    ]
+    cursor.fetchmany.assert_called_with(2)
+    cursor.fetchall.assert_not_called()
+    assert database.get_pool_stats()["in_use"] == 0
+
+
+@patch("database.pyodbc.connect")
+def test_iter_query_namedtuple_batches(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    cursor = MagicMock()
+    cursor.description = [("SKU",), ("STOCK_QTY",)]
+    cursor.fetchmany.side_effect = [[("A", 1), ("B", 2)], []]
+    mock_connect.return_value.cursor.return_value = cursor
+
+    batches = list(database.iter_query("SELECT 1", row_type="namedtuple", batches=True))
+
+    assert len(batches) == 1
+    assert [row.SKU for row in batches[0]] == ["A", "B"]
+
+
+@patch("database.pyodbc.connect")
+def test_iter_query_releases_connection_when_abandoned(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    cursor = MagicMock()
+    cursor.description = [("SKU",)]
+    cursor.fetchmany.side_effect = [[("A",), ("B",)], [("C",)], []]
+    mock_connect.return_value.cursor.return_value = cursor
+
+    stream = database.iter_query("SELECT SKU FROM t")
+    assert next(stream) == {"SKU": "A"}
+    assert database.get_pool_stats()["in_use"] == 1
+    stream.close()
+
+    cursor.close.assert_called_once()
+    assert database.get_pool_stats()["in_use"] == 0
+
+
+@patch("database.pyodbc.connect")
+def test_bulk_insert_uses_fast_executemany_per_batch(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    conn = mock_connect.return_value
+    cursor = conn.cursor.return_value
+    rows = [{"SKU": f"S{i}", "QTY": i} for i in range(5)]
+
+    inserted = database.bulk_insert("dbo.USER_TEST", rows, batch_size=2)
+
+    assert inserted == 5
+    assert cursor.fast_executemany is True
+    assert cursor.executemany.call_count == 3
+    sql, params = cursor.executemany.call_args_list[0][0]
+    assert sql == "INSERT INTO [dbo].[USER_TEST] ([SKU], [QTY]) VALUES (?, ?)"
+    assert params == [("S0", 0), ("S1", 1)]
+    assert conn.commit.call_count == 3
+    assert database.get_pool_stats()["in_use"] == 0
+
+
+@patch("database.pyodbc.connect")
+def test_bulk_insert_reports_rows_committed_before_failure(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    cursor = mock_connect.return_value.cursor.return_value
+    cursor.executemany.side_effect = [None, pyodbc.Error("22001", "String data, right truncation")]
+    rows = [{"SKU": f"S{i}"} for i in range(5)]
+
+    with pytest.raises(database.BulkInsertError) as info:
+        database.bulk_insert("dbo.USER_TEST", rows, batch_size=2)
+
+    assert info.value.inserted == 2
+    assert isinstance(info.value, pyodbc.Error)
+
+
+def test_bulk_insert_rejects_bad_identifiers():
+    with pytest.raises(ValueError):
+        database.bulk_insert("dbo.USER_TEST; DROP TABLE x", [{"SKU": "A"}])
+    with pytest.raises(ValueError):
+        database.bulk_insert("dbo.USER_TEST", [{"SKU]": "A"}])
+
+
+def test_bulk_insert_empty_is_noop():
+    assert database.bulk_insert("dbo.USER_TEST", []) == 0
+
+
+@patch("database.pyodbc.connect")
+def test_bulk_merge_stages_and_merges(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    conn = mock_connect.return_value
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = [("INSERT",), ("UPDATE",)]
+    rows = [
+        {"SKU": "A", "WOO_PRODUCT_ID": 1},
+        {"SKU": "B", "WOO_PRODUCT_ID": 2},
+        {"SKU": "A", "WOO_PRODUCT_ID": 3},
+    ]
+
+    inserted, updated = database.bulk_merge(
+        "dbo.USER_PRODUCT_MAP",
+        key_cols=["SKU"],
+        rows=rows,
+        update_extra={"UPDATED_DT": "SYSDATETIME()"},
+        insert_extra={"IS_ACTIVE": "1"},
+        match_extra="t.IS_ACTIVE = 1",
+    )
+
+    assert (inserted, updated) == (1, 1)
+    # Duplicate keys collapse to the last row
+    assert cursor.executemany.call_args[0][1] == [("A", 3), ("B", 2)]
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert "SELECT TOP 0 [SKU], [WOO_PRODUCT_ID] INTO #bulk_merge_stage FROM [dbo].[USER_PRODUCT_MAP]" in statements[0]
+    merge = next(s for s in statements if s.startswith("MERGE"))
+    assert "ON t.[SKU] = s.[SKU] AND t.IS_ACTIVE = 1" in merge
+    assert "UPDATE SET [WOO_PRODUCT_ID] = s.[WOO_PRODUCT_ID], [UPDATED_DT] = SYSDATETIME()" in merge
+    assert "INSERT ([SKU], [WOO_PRODUCT_ID], [IS_ACTIVE]) VALUES (s.[SKU], s.[WOO_PRODUCT_ID], 1)" in merge
+    assert statements[-1] == "DROP TABLE #bulk_merge_stage;"
+    assert database.get_pool_stats()["in_use"] == 0
+
+
+def test_bulk_merge_requires_key_columns_in_rows():
+    with pytest.raises(ValueError):
+        database.bulk_merge("dbo.USER_PRODUCT_MAP", ["MISSING"], [{"SKU": "A"}])
+
+
+@patch("database.pyodbc.connect")
+def test_cursors_are_instrumented(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    cursor = MagicMock()
+    cursor.description = [("SKU",)]
+    cursor.fetchall.return_value = [("A",), ("B",)]
+    cursor.rowcount = -1
+    mock_connect.return_value.cursor.return_value = cursor
+    database.reset_query_stats()
+    events = []
+    database.add_query_hook(events.append)
+    try:
+        database.run_query("SELECT SKU\n  FROM dbo.VI_EXPORT_PRODUCTS WHERE SKU = ?", ("A",))
+    finally:
+        database.remove_query_hook(events.append)
+
+    key = "SELECT SKU FROM dbo.VI_EXPORT_PRODUCTS WHERE SKU = ?"
+    stats = database.get_query_stats()[key]
+    assert stats["calls"] == 1
+    assert stats["rows_fetched"] == 2
+    assert stats["param_shape"] == "(str)"
+    assert len(events) == 1 and events[0].error is None
+
+
+@patch("database.pyodbc.connect")
+def test_slow_queries_are_logged_and_buffered(mock_connect, monkeypatch, caplog):
+    _set_min_env(monkeypatch)
+    monkeypatch.setenv("CP_SQL_SLOW_MS", "0")
+    monkeypatch.setenv("CP_SQL_PERF_LOG_TABLE", "true")
+    # Restore module-level thresholds after the pool reconfigures them
+    monkeypatch.setattr(database, "_SLOW_QUERY_MS", database._SLOW_QUERY_MS)
+    monkeypatch.setattr(database, "_PERF_LOG_TABLE", database._PERF_LOG_TABLE)
+    cursor = MagicMock()
+    cursor.rowcount = 3
+    mock_connect.return_value.cursor.return_value = cursor
+    database._PERF_LOG_BUFFER.clear()
+
+    with caplog.at_level("WARNING", logger="database.slow"):
+        conn = database.get_connection()
+        conn.cursor().executemany("UPDATE t SET a = ? WHERE b = ?", [(1, "x"), (2, "y")])
+        conn.close()
+
+    assert "Slow SQL" in caplog.text
+    assert "2 x (int, str)" in caplog.text
+    assert database._PERF_LOG_BUFFER[-1]["IS_EXECUTEMANY"] == 1
+    database._PERF_LOG_BUFFER.clear()
+
+
+@patch("database.pyodbc.connect")
+def test_sync_watermark_round_trip(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    conn = mock_connect.return_value
+    cursor = conn.cursor.return_value
+    cursor.fetchone.return_value = ("2026-01-01 10:00", None)
+
+    mark = database.get_sync_watermark("inventory_sync")
+    assert mark == database.SyncWatermark("2026-01-01 10:00", None)
+
+    database.set_sync_watermark("inventory_sync", "2026-01-02 08:00", full_run=True)
+    sql, params = cursor.execute.call_args[0]
+    assert sql.strip().startswith("MERGE dbo.USER_SYNC_WATERMARK")
+    assert params == ("inventory_sync", "2026-01-02 08:00", 1)
+    conn.commit.assert_called()
+    assert database.get_pool_stats()["in_use"] == 0
+
+
+@patch("database.pyodbc.connect")
+def test_sync_watermark_missing_table_reads_as_empty(mock_connect, monkeypatch):
+    _set_min_env(monkeypatch)
+    mock_connect.return_value.cursor.return_value.execute.side_effect = pyodbc.Error("Invalid object name")
+
+    assert database.get_sync_watermark("inventory_sync") == database.SyncWatermark(None, None)
+
+
+def test_read_ahead_preserves_order_and_reraises():
+    import database
+
+    assert list(database.read_ahead(iter(range(50)), maxsize=3)) == list(range(50))
+
+    def failing():
+        yield 1
+        raise RuntimeError("fetch failed")
+
+    stream = database.read_ahead(failing(), maxsize=3)
+    assert next(stream) == 1
+    with pytest.raises(RuntimeError, match="fetch failed"):
+        next(stream)
+
+
+def test_read_ahead_closes_source_when_abandoned():
+    import database
+
+    closed = []
+
+    def source():
+        try:
+            yield from range(1000)
+        finally:
+            closed.append(True)
+
+    stream = database.read_ahead(source(), maxsize=2)
+    assert next(stream) == 0
+    stream.close()
+    assert closed == [True]
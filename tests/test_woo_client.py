@@ -6,13 +6,16 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+import io
 import json
 from unittest.mock import patch
 
 import pytest
 import requests
+from requests.adapters import HTTPAdapter
 
 from config import IntegrationConfig, DatabaseConfig, WooCommerceConfig
+import woo_client
 from woo_client import WooClient
 
 
@@ -69,3 +72,427 @@ def test_sync_products_posts_when_not_dry_run(mock_session_class, config):
     client.sync_products([{"sku": "01", "name": "test"}], dry_run=False)
     mock_session.post.assert_called_once()
 
+
+
+@patch("woo_client.requests.Session")
+def test_get_client_is_shared_until_reload(mock_session_class, config, monkeypatch):
+    monkeypatch.setattr(woo_client, "_SHARED_CLIENT", None)
+    monkeypatch.setattr(woo_client, "get_integration_config", lambda reload=False: config)
+
+    first = woo_client.get_client()
+    assert woo_client.get_client() is first
+    assert mock_session_class.call_count == 1
+
+    reloaded = woo_client.get_client(reload=True)
+    assert reloaded is not first
+    first.session.close.assert_called()
+
+
+@patch("woo_client.requests.Session")
+def test_map_concurrent_preserves_order(mock_session_class, config):
+    import time as _time
+
+    config.woo.max_concurrency = 4
+    client = WooClient(config=config)
+
+    def slow_square(n):
+        _time.sleep(0.01 * (5 - n))
+        return n * n
+
+    assert client.map_concurrent(slow_square, range(5)) == [0, 1, 4, 9, 16]
+    client.close()
+
+
+@patch("woo_client.requests.Session")
+def test_execute_many_returns_exceptions_in_place(mock_session_class, config):
+    mock_session = mock_session_class.return_value
+    ok = requests.Response()
+    ok.status_code = 200
+    mock_session.request.side_effect = lambda method, url, **kw: (
+        ok if url.endswith("/orders/1") else (_ for _ in ()).throw(requests.Timeout("slow"))
+    )
+
+    client = WooClient(config=config)
+    results = client.execute_many([
+        woo_client.WooRequest("GET", "/orders/1"),
+        woo_client.WooRequest("GET", "/orders/2"),
+    ])
+
+    assert results[0] is ok
+    assert isinstance(results[1], requests.Timeout)
+    client.close()
+
+
+@patch("woo_client.requests.Session")
+def test_http_adapter_sized_to_concurrency(mock_session_class, config):
+    config.woo.max_concurrency = 6
+    client = WooClient(config=config)
+    adapter = client.session.mount.call_args_list[0][0][1]
+    assert adapter._pool_maxsize == 6
+
+
+def _response(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    resp._content = b"[]"
+    resp.raw = io.BytesIO(b"")
+    return resp
+
+
+def _adapter(responses, **kwargs):
+    sleeps = []
+    adapter = woo_client.ResilientAdapter(
+        max_concurrency=4, sleep=sleeps.append, rand=lambda: 1.0, **kwargs
+    )
+    patcher = patch.object(HTTPAdapter, "send", side_effect=responses)
+    return adapter, sleeps, patcher
+
+
+def _prepared(method="GET"):
+    return requests.Request(method, "https://store.test/wp-json/wc/v3/products").prepare()
+
+
+def test_adapter_retries_with_backoff_and_retry_after():
+    adapter, sleeps, patcher = _adapter([
+        _response(503, {"Retry-After": "7"}),
+        _response(500),
+        _response(200),
+    ])
+    with patcher:
+        resp = adapter.send(_prepared())
+    assert resp.status_code == 200
+    # Retry-After honoured first, then full-jitter exponential (rand=1.0 -> 0.5 * 2**1)
+    assert sleeps == [7.0, 1.0]
+    assert adapter.stats["retries"] == 2
+    assert adapter.stats["throttled"] == 1
+
+
+def test_adapter_does_not_retry_post_on_ambiguous_500():
+    adapter, sleeps, patcher = _adapter([_response(500), _response(200)])
+    with patcher:
+        resp = adapter.send(_prepared("POST"))
+    assert resp.status_code == 500
+    assert sleeps == []
+
+
+def test_adapter_retries_post_on_429():
+    adapter, sleeps, patcher = _adapter([_response(429), _response(201)])
+    with patcher:
+        resp = adapter.send(_prepared("POST"))
+    assert resp.status_code == 201
+    assert len(sleeps) == 1
+
+
+def test_adapter_gives_up_after_max_retries():
+    adapter, sleeps, patcher = _adapter([_response(503)] * 3, max_retries=2)
+    with patcher:
+        resp = adapter.send(_prepared())
+    assert resp.status_code == 503
+    assert len(sleeps) == 2
+
+
+def test_aimd_limiter_halves_on_overload_and_ramps_up():
+    now = [0.0]
+    limiter = woo_client.AIMDLimiter(8, cooldown=1.0, clock=lambda: now[0])
+    limiter.acquire()
+    limiter.release(overloaded=True)
+    assert limiter.limit == 4
+    limiter.acquire()
+    limiter.release(overloaded=True)  # within cooldown: no second cut
+    assert limiter.limit == 4
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit > 4
+
+
+def test_circuit_breaker_opens_pauses_and_recovers():
+    now = [0.0]
+    breaker = woo_client.CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    now[0] = 11.0
+    breaker.before_request()  # reset elapsed: this caller becomes the probe
+    assert breaker.state == "half_open"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_raises_after_max_wait():
+    now = [0.0]
+    breaker = woo_client.CircuitBreaker(failure_threshold=1, reset_timeout=10, max_wait=0, clock=lambda: now[0])
+    breaker.record_failure()
+    with pytest.raises(woo_client.CircuitOpenError):
+        breaker.before_request()
+
+
+def test_parse_retry_after():
+    assert woo_client.parse_retry_after("5") == 5.0
+    assert woo_client.parse_retry_after(None) is None
+    assert woo_client.parse_retry_after("garbage") is None
+
+
+def _page_session(mock_session_class, pages, total_pages):
+    """Serve pages[n-1] for ?page=n, [] beyond, with X-WP-TotalPages on page 1."""
+
+    calls = []
+
+    def get(url, params=None, timeout=None):
+        page = params["page"]
+        calls.append(page)
+        resp = _response(200, {"X-WP-TotalPages": str(total_pages)})
+        resp._content = json.dumps(pages[page - 1] if page <= len(pages) else []).encode()
+        return resp
+
+    mock_session_class.return_value.get.side_effect = get
+    return calls
+
+
+@patch("woo_client.requests.Session")
+def test_paginate_fetches_advertised_pages_then_until_empty(mock_session_class, config):
+    pages = [[{"id": 1}, {"id": 2}], [{"id": 3}], [{"id": 4}], [{"id": 5}]]
+    # Header under-reports: invariant 6 says keep going until an empty page
+    calls = _page_session(mock_session_class, pages, total_pages=3)
+    client = WooClient(config=config)
+
+    ids = [item["id"] for item in client.paginate("/orders", {"status": "any"}, per_page=2)]
+
+    assert ids == [1, 2, 3, 4, 5]
+    assert sorted(calls) == [1, 2, 3, 4, 5]
+    client.close()
+
+
+@patch("woo_client.requests.Session")
+def test_paginate_honours_max_items(mock_session_class, config):
+    pages = [[{"id": 1}, {"id": 2}], [{"id": 3}, {"id": 4}], [{"id": 5}]]
+    _page_session(mock_session_class, pages, total_pages=3)
+    client = WooClient(config=config)
+
+    assert [i["id"] for i in client.paginate("/customers", max_items=3)] == [1, 2, 3]
+    client.close()
+
+
+@patch("woo_client.requests.Session")
+def test_paginate_unordered_yields_everything(mock_session_class, config):
+    pages = [[{"id": n}] for n in range(1, 8)]
+    _page_session(mock_session_class, pages, total_pages=7)
+    client = WooClient(config=config)
+
+    ids = sorted(i["id"] for i in client.paginate("/orders", ordered=False))
+    assert ids == list(range(1, 8))
+    client.close()
+
+
+@patch("woo_client.requests.Session")
+def test_paginate_raises_on_failed_page(mock_session_class, config):
+    mock_session_class.return_value.get.return_value = _response(500)
+    client = WooClient(config=config)
+    with pytest.raises(requests.HTTPError):
+        list(client.paginate("/orders"))
+
+
+@patch("woo_client.requests.Session")
+def test_fields_projection_on_get_paginate_and_requests(mock_session_class, config):
+    calls = _page_session(mock_session_class, [[{"id": 1, "sku": "A"}]], total_pages=1)
+    mock_session = mock_session_class.return_value
+    client = WooClient(config=config)
+
+    assert [p["sku"] for p in client.paginate("/products", fields=woo_client.PRODUCT_SKU_FIELDS)] == ["A"]
+    assert calls == [1, 2]
+    assert all(c.kwargs["params"]["_fields"] == "id,sku" for c in mock_session.get.call_args_list)
+
+    mock_session.get.side_effect = None
+    client.get("/orders/7", {"context": "view"}, fields=woo_client.ORDER_STATUS_FIELDS)
+    assert mock_session.get.call_args.kwargs["params"] == {"context": "view", "_fields": "id,status"}
+
+    client.request(woo_client.WooRequest("GET", "/products/3", fields=("id", "stock_quantity")))
+    assert mock_session.request.call_args.kwargs["params"] == {"_fields": "id,stock_quantity"}
+
+    assert woo_client.with_fields({"a": 1}, None) == {"a": 1}
+
+
+def test_session_requests_gzip(config):
+    client = WooClient(config=config)
+    assert "gzip" in client.session.headers["Accept-Encoding"]
+    client.close()
+
+
+def test_sku_index_seeds_once_and_persists_only_changes():
+    loads, saved = [], []
+    index = woo_client.SkuIndex(
+        loader=lambda: loads.append(1) or {"A": 1, "B": 2},
+        persist=saved.append,
+    )
+
+    assert index.get_many(["A", "C"]) == {"A": 1}
+    index.update({"A": 1, "B": 5, "C": 3})
+    index.discard("A")
+
+    assert loads == [1]
+    assert saved == [{"B": 5, "C": 3}]
+    assert index.get_many(["A", "B", "C"]) == {"B": 5, "C": 3}
+
+
+@patch("woo_client.requests.Session")
+def test_existing_products_only_looks_up_unknown_skus(mock_session_class, config):
+    mock_session = mock_session_class.return_value
+
+    def get(url, params=None, timeout=None):
+        resp = _response(200)
+        hits = [{"id": 20, "sku": s} for s in params["sku"].split(",") if s == "NEW"]
+        resp._content = json.dumps(hits if params["page"] == 1 else []).encode()
+        return resp
+
+    mock_session.get.side_effect = get
+    saved = []
+    client = WooClient(config=config, sku_index=woo_client.SkuIndex(lambda: {"OLD": 10}, saved.append))
+
+    assert client._get_existing_products(["OLD", "NEW", "GONE"]) == {"OLD": 10, "NEW": 20}
+    # One chunk, one request: no follow-up GET for an empty page 2
+    assert [c.kwargs["params"]["sku"] for c in mock_session.get.call_args_list] == ["NEW,GONE"]
+    assert saved == [{"NEW": 20}]
+
+    mock_session.get.reset_mock()
+    assert client._get_existing_products(["OLD", "NEW"]) == {"OLD": 10, "NEW": 20}
+    mock_session.get.assert_not_called()
+
+
+@patch("woo_client.requests.Session")
+def test_sync_products_learns_ids_from_batch_create(mock_session_class, config):
+    mock_session = mock_session_class.return_value
+    mock_session.get.return_value = _response(200)
+    mock_session.get.return_value._content = b"[]"
+    created = _response(200)
+    created._content = json.dumps({"create": [{"id": 55, "sku": "NEW"}]}).encode()
+    mock_session.post.return_value = created
+
+    client = WooClient(config=config)
+    client.sync_products([{"sku": "NEW", "name": "new"}], dry_run=False)
+
+    assert client.sku_index.get_many(["NEW"]) == {"NEW": 55}
+
+
+@patch("woo_client.requests.Session")
+def test_sync_products_reports_applied_skus(mock_session_class, config):
+    mock_session = mock_session_class.return_value
+    mock_session.get.return_value = _response(200)
+    mock_session.get.return_value._content = b"[]"
+    created = _response(200)
+    created._content = json.dumps({"create": [
+        {"id": 55, "sku": "OK"},
+        {"id": 0, "error": {"code": "product_invalid_sku", "message": "dup"}},
+    ]}).encode()
+    mock_session.post.return_value = created
+
+    applied = {}
+    client = WooClient(config=config)
+    client.sync_products([{"sku": "OK"}, {"sku": "DUP"}], dry_run=False, on_applied=applied.update)
+
+    assert applied == {"OK": 55}
+
+
+@patch("woo_client.requests.Session")
+def test_stream_forgets_deleted_product_and_recreates_it(mock_session_class, config):
+    mock_session = mock_session_class.return_value
+    mock_session.get.return_value = _response(200)
+    mock_session.get.return_value._content = b"[]"
+    posts = []
+
+    def post(url, **kwargs):
+        action, batch = next(iter(kwargs["json"].items()))
+        posts.append((action, batch))
+        resp = _response(200)
+        if action == "update":
+            resp._content = json.dumps({"update": [
+                {"id": 0, "error": {"code": "woocommerce_rest_product_invalid_id", "message": "Invalid ID."}}
+                for _ in batch
+            ]}).encode()
+        else:
+            resp._content = json.dumps({"create": [{"id": 77, "sku": item["sku"]} for item in batch]}).encode()
+        return resp
+
+    mock_session.post.side_effect = post
+    forgotten = []
+    client = WooClient(config=config, sku_index=woo_client.SkuIndex(lambda: {"OLD": 5}, forget=forgotten.extend))
+
+    full = {"OLD": {"sku": "OLD", "name": "Old", "regular_price": "2.00"}}
+    applied = {}
+    created, updated, errors = client.sync_products_stream(
+        [{"id": 5, "sku": "OLD", "regular_price": "2.00"}], on_applied=applied.update, full_payload=full.get,
+    )
+
+    # The dead ID is forgotten (and persisted), then the full payload is created
+    assert forgotten == ["OLD"]
+    assert posts[1] == ("create", [full["OLD"]])
+    assert applied == {"OLD": 77} and created == 1 and errors == []
+    assert client.sku_index.get_many(["OLD"]) == {"OLD": 77}
+
+
+def test_adaptive_batcher_grows_shrinks_and_caps():
+    batcher = woo_client.AdaptiveBatcher(initial=40, target_seconds=10, max_bytes=1000)
+
+    batcher.record(40, 2.0, ok=True)
+    assert batcher.size == 50
+    batcher.record(50, 20.0, ok=True)
+    assert batcher.size == 25
+    batcher.record(25, 1.0, ok=False)
+    assert batcher.size == 12
+
+    for _ in range(30):
+        batcher.record(batcher.size, 0.1, ok=True)
+    assert batcher.size == woo_client.BATCH_API_MAX_ITEMS
+
+    assert batcher.take([300] * 10) == 3
+    assert batcher.take([5000]) == 1
+    assert batcher.describe().startswith("33 batches (min 12")
+
+
+def test_adaptive_batcher_reads_knobs_at_construction(monkeypatch):
+    # Set after woo_client was imported, as a late-loaded .env would be
+    monkeypatch.setenv("SYNC_BATCH_TARGET_SECONDS", "3")
+    monkeypatch.setenv("SYNC_BATCH_MAX_BYTES", "500")
+
+    batcher = woo_client.AdaptiveBatcher(initial=10)
+
+    assert batcher.target_seconds == 3.0
+    assert batcher.max_bytes == 500
+
+
+@patch("woo_client.requests.Session")
+def test_sync_products_stream_posts_while_consuming(mock_session_class, config):
+    mock_session = mock_session_class.return_value
+    mock_session.get.return_value = _response(200)
+    mock_session.get.return_value._content = b"[]"
+
+    def post(url, **kwargs):
+        action, batch = next(iter(kwargs["json"].items()))
+        if batch[0]["sku"] == "C2":
+            resp = _response(503)
+            resp.reason = "Service Unavailable"
+            return resp
+        resp = _response(200)
+        resp._content = json.dumps({action: [
+            {"id": item.get("id", 100 + int(item["sku"][1:])), "sku": item["sku"]} for item in batch
+        ]}).encode()
+        return resp
+
+    mock_session.post.side_effect = post
+    client = WooClient(config=config, sku_index=woo_client.SkuIndex(lambda: {"U1": 1, "U2": 2}))
+    client.batcher = woo_client.AdaptiveBatcher(initial=2, min_size=2, max_size=2)
+
+    consumed = []
+
+    def products():
+        for sku in ["C0", "C1", "U1", "C2", "U2", "C3"]:
+            consumed.append(sku)
+            yield {"sku": sku, "name": sku}
+
+    applied = {}
+    created, updated, errors = client.sync_products_stream(products(), on_applied=applied.update, max_in_flight=1)
+
+    assert (created, updated) == (2, 2)
+    assert errors == ["Batch create failed: 503 Service Unavailable"]
+    assert applied == {"C0": 100, "C1": 101, "U1": 1, "U2": 2}
+    assert len(consumed) == 6
@@ -0,0 +1,302 @@
+import sys
+import os
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+import woo_client
+import woo_inventory_sync as inv
+from database import SyncWatermark
+from woo_client import AdaptiveBatcher
+
+
+class FakeChangeStream:
+    """Stand-in for InventoryChangeSource: ticks[n] is what changed before poll n."""
+
+    def __init__(self, ticks, expire_at=None, fail_at=None):
+        self.ticks = list(ticks)
+        self.version = 100
+        self.polls = 0
+        self.expire_at = expire_at
+        self.fail_at = fail_at
+
+    def current_version(self):
+        return self.version
+
+    def changes_since(self, version):
+        self.polls += 1
+        if self.expire_at == self.polls:
+            self.version += 1
+            raise inv.ChangeTrackingExpired("gap")
+        if self.fail_at == self.polls:
+            raise RuntimeError("connection reset")
+        changed = set(self.ticks.pop(0)) if self.ticks else set()
+        if changed:
+            self.version += 1
+        return self.version, changed
+
+
+class FakeResponse:
+    ok = True
+    status_code = 200
+    text = ""
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeClient:
+    """Woo stand-in: every product currently has 5 in stock; records batch updates."""
+
+    max_concurrency = 2
+
+    def __init__(self):
+        self.posts = []
+        self.reads = []
+        self.session = self
+        self.batcher = AdaptiveBatcher(initial=100)
+
+    def map_concurrent(self, fn, items):
+        return [fn(item) for item in items]
+
+    def _url(self, path):
+        return path
+
+    def get_items(self, path, params=None, **kwargs):
+        ids = [int(i) for i in params["include"].split(",")]
+        self.reads.append(ids)
+        return [{"id": i, "stock_quantity": 5, "stock_status": "instock"} for i in ids]
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append(json["update"])
+        return FakeResponse({"update": [{"id": u["id"]} for u in json["update"]]})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0.5)
+
+
+STOCK = {"A": 5.0, "B": 9.0, "C": 0.0}
+
+
+def _rows(skus):
+    return [
+        {"SKU": sku, "WOO_PRODUCT_ID": ord(sku), "STOCK_QTY": STOCK[sku], "LAST_MODIFIED": None}
+        for sku in sorted(skus)
+    ]
+
+
+@pytest.fixture
+def no_state(monkeypatch):
+    saved = []
+    monkeypatch.setattr(inv, "load_push_state", lambda: {})
+    monkeypatch.setattr(inv, "save_push_state", lambda items, verified=False: saved.append([i["SKU"] for i in items]))
+    return saved
+
+
+def _watch(stream, client, clock, polls, **kwargs):
+    fetched = []
+
+    def fetch_rows(skus):
+        fetched.append(set(skus))
+        return _rows(skus)
+
+    resyncs = []
+    counts = inv.watch_inventory(
+        dry_run=False,
+        source=stream,
+        client=client,
+        fetch_rows=fetch_rows,
+        poll_seconds=1.0,
+        debounce_seconds=2.0,
+        should_stop=lambda: stream.polls >= polls,
+        resync=lambda: resyncs.append(stream.version),
+        clock=clock,
+        sleep=clock.sleep,
+        **kwargs,
+    )
+    return counts, fetched, resyncs
+
+
+def test_watch_coalesces_changes_within_debounce_window(no_state):
+    stream = FakeChangeStream([["A"], ["B", "A"], [], [], ["C"], [], [], []])
+    client, clock = FakeClient(), FakeClock()
+
+    counts, fetched, resyncs = _watch(stream, client, clock, polls=8)
+
+    # A and B arrive within one window and go out as a single micro-batch
+    assert fetched == [{"A", "B"}, {"C"}]
+    assert counts["pushes"] == 2
+    assert resyncs == [100]
+    # A already matches Woo (5 in stock); B and C differ and are batch-updated
+    assert counts["skipped"] == 1 and counts["updated"] == 2
+    assert [[u["id"] for u in post] for post in client.posts] == [[ord("B")], [ord("C")]]
+    assert no_state == [["A", "B"], ["C"]]
+
+
+def test_watch_skips_repeat_changes_from_push_state(no_state):
+    stream = FakeChangeStream([["B"], [], [], ["B"], [], [], []])
+    client, clock = FakeClient(), FakeClock()
+
+    counts, fetched, _ = _watch(stream, client, clock, polls=7)
+
+    # Second change to B (e.g. a cost edit) leaves the pushed stock unchanged: no HTTP
+    assert fetched == [{"B"}, {"B"}]
+    assert len(client.posts) == 1 and len(client.reads) == 1
+    assert counts["updated"] == 1 and counts["skipped"] == 1
+
+
+def test_watch_resyncs_when_change_tracking_expires(no_state):
+    stream = FakeChangeStream([["A"], [], [], []], expire_at=2)
+    client, clock = FakeClient(), FakeClock()
+
+    counts, fetched, resyncs = _watch(stream, client, clock, polls=5)
+
+    assert counts["resyncs"] == 1
+    assert resyncs == [100, 102]
+    # The pending change from before the gap is covered by the catch-up run
+    assert fetched == []
+
+
+def test_inventory_state_hash_tracks_pushed_values():
+    assert inv.inventory_state_hash(1, 5, "instock") == inv.inventory_state_hash(1, 5.0, "instock")
+    assert inv.inventory_state_hash(1, 5, "instock") != inv.inventory_state_hash(1, 4, "instock")
+    assert inv.inventory_state_hash(1, 0, "outofstock") != inv.inventory_state_hash(2, 0, "outofstock")
+
+
+def test_unchanged_push_state_skips_without_http(no_state):
+    client = FakeClient()
+    rows = _rows("AB")
+    push_state = {}
+    for row in rows:
+        status, qty = inv.calculate_stock_status(row["STOCK_QTY"])
+        push_state[row["SKU"]] = inv.inventory_state_hash(row["WOO_PRODUCT_ID"], qty, status)
+    counts = {"updated": 0, "skipped": 0, "error": 0}
+
+    assert inv._sync_batches(client, [rows], False, push_state, counts) == []
+
+    # Same hash as last pushed: no stock read, no update, nothing re-saved
+    assert counts == {"updated": 0, "skipped": 2, "error": 0}
+    assert client.reads == [] and client.posts == [] and no_state == []
+
+    # A changed hash is pushed directly, without reading live stock first
+    push_state["B"] = "stale"
+    counts = {"updated": 0, "skipped": 0, "error": 0}
+    inv._sync_batches(client, [rows], False, push_state, counts)
+    assert client.reads == [] and [[u["id"] for u in post] for post in client.posts] == [[ord("B")]]
+    assert counts["updated"] == 1 and no_state == [["B"]]
+
+
+def test_watch_survives_failed_poll_and_read(no_state):
+    # Poll 2 fails after B changed; the version must not move past B's change
+    stream = FakeChangeStream([["A"], ["B"], [], [], [], [], []], fail_at=2)
+    client, clock = FakeClient(), FakeClock()
+    reads = {"failed": False}
+
+    def flaky_fetch(skus):
+        if not reads["failed"]:
+            reads["failed"] = True
+            raise RuntimeError("deadlock victim")
+        return _rows(skus)
+
+    counts = inv.watch_inventory(
+        dry_run=False, source=stream, client=client, fetch_rows=flaky_fetch,
+        poll_seconds=1.0, debounce_seconds=2.0, should_stop=lambda: stream.polls >= 7,
+        resync=lambda: None, clock=clock, sleep=clock.sleep,
+    )
+
+    # A's failed read is retried and B is still reported after the failed poll
+    assert no_state == [["A", "B"]]
+    assert counts["pushes"] == 1 and counts["updated"] == 1 and counts["skipped"] == 1
+
+
+def test_sync_holds_mark_before_oldest_failed_row(monkeypatch):
+    modified = {"A": datetime(2026, 1, 1, 9), "B": datetime(2026, 1, 1, 10), "C": datetime(2026, 1, 1, 11)}
+    rows = [dict(r, LAST_MODIFIED=modified[r["SKU"]]) for r in _rows("ABC")]
+    marks = []
+
+    def fake_sync_batches(client, batches, dry_run, push_state, counts, verify=False):
+        failed = [item["SKU"] for batch in batches for item in batch if item["SKU"] == "B"]
+        counts["error"] += len(failed)
+        counts["updated"] += sum(len(batch) for batch in batches) - len(failed)
+        return failed
+
+    monkeypatch.setattr(inv, "get_client", FakeClient)
+    monkeypatch.setattr(inv, "_incremental_start", lambda full: (None, True))
+    monkeypatch.setattr(inv, "load_push_state", lambda: {})
+    monkeypatch.setattr(inv, "iter_inventory", lambda *a, **k: iter([rows]))
+    monkeypatch.setattr(inv, "_sync_batches", fake_sync_batches)
+    monkeypatch.setattr(inv, "set_sync_watermark",
+                        lambda name, mark, full_run=False: marks.append((mark, full_run)))
+
+    assert inv.sync_inventory(dry_run=False) == (2, 0, 1)
+
+    # B failed: the mark stops just before it, and the full run still counts
+    assert marks == [(modified["B"] - timedelta(microseconds=1), True)]
+
+
+def test_incremental_start_reads_overlap_and_interval_at_run_time(monkeypatch):
+    mark = SyncWatermark(datetime(2026, 1, 1, 12), datetime.now() - timedelta(hours=3))
+    monkeypatch.setattr(inv, "get_sync_watermark", lambda name: mark)
+    monkeypatch.setenv("INVENTORY_WATERMARK_OVERLAP_MINUTES", "30")
+    monkeypatch.setenv("INVENTORY_FULL_SYNC_HOURS", "24")
+
+    assert inv._incremental_start(False) == (datetime(2026, 1, 1, 11, 30), False)
+
+    monkeypatch.setenv("INVENTORY_FULL_SYNC_HOURS", "2")
+    assert inv._incremental_start(False) == (None, True)
+
+
+def test_stock_read_diff_pushes_only_changed_rows():
+    client = FakeClient()
+
+    results = inv._push_inventory_batch(client, _rows("ABC"), dry_run=False)
+
+    # Woo has 5 of everything: A matches, B and C go out in one update
+    assert client.reads == [[ord("A"), ord("B"), ord("C")]]
+    assert [[(u["id"], u["stock_quantity"]) for u in post] for post in client.posts] == [[(ord("B"), 9), (ord("C"), 0)]]
+    assert [r[0] for r in results] == ["skipped", "updated", "updated"]
+
+
+def test_inventory_updates_are_sized_by_the_shared_batcher():
+    client = FakeClient()
+    client.batcher = AdaptiveBatcher(initial=2, min_size=2, max_size=2)
+    rows = [{"SKU": f"S{i}", "WOO_PRODUCT_ID": i, "STOCK_QTY": 9.0} for i in range(1, 6)]
+
+    results = inv._push_inventory_batch(client, rows, dry_run=False, compare=False)
+
+    assert [outcome for outcome, *_ in results] == ["updated"] * 5
+    assert [[u["id"] for u in post] for post in client.posts] == [[1, 2], [3, 4], [5]]
+    assert client.batcher.history == [2, 2, 1]
+
+
+def test_stock_read_is_a_single_request(monkeypatch):
+    session = MagicMock()
+    session.get.return_value.status_code = 200
+    session.get.return_value.json.return_value = [{"id": ord("A"), "stock_quantity": 5, "stock_status": "instock"}]
+    monkeypatch.setattr(woo_client.requests, "Session", lambda: session)
+    client = woo_client.WooClient(config=MagicMock(woo=MagicMock(max_concurrency=2, max_retries=0,
+                                                                 base_url="https://store.test")))
+
+    results = inv._push_inventory_batch(client, _rows("A"), dry_run=False)
+
+    assert results[0][0] == "skipped"
+    assert session.get.call_count == 1
+    assert session.get.call_args.kwargs["params"]["include"] == str(ord("A"))
@@ -0,0 +1,251 @@
+import sys
+import os
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+import pytest
+
+import woo_orders
+from database import SyncWatermark
+
+
+class FakeClient:
+    """Stand-in for WooClient: paginate() returns the given orders and records params."""
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.params = None
+        self.max_items = None
+
+    def paginate(self, path, params, per_page=100, max_items=None, timeout=None):
+        self.params = params
+        self.max_items = max_items
+        return iter(self.orders[:max_items])
+
+
+def _order(order_id, modified):
+    return {"id": order_id, "date_modified_gmt": modified, "billing": {}, "total": "1.00"}
+
+
+@pytest.fixture
+def pull_env(monkeypatch):
+    env = {"marks": [], "staged": set(), "lookups": []}
+
+    def fake_iter_query(sql, params, row_type="dict", conn=None):
+        env["lookups"].append(list(params))
+        return [(i,) for i in params if i in env["staged"]]
+
+    def use(orders, mark=None, staged=()):
+        client = FakeClient(orders)
+        env["client"] = client
+        env["staged"] = set(staged)
+        monkeypatch.setattr(woo_orders, "WooClient", lambda: client)
+        monkeypatch.setattr(woo_orders, "get_sync_watermark", lambda name: SyncWatermark(mark, None))
+        monkeypatch.setattr(woo_orders, "set_sync_watermark", lambda name, value: env["marks"].append(value))
+        monkeypatch.setattr(woo_orders, "connection_ctx", lambda: nullcontext(object()))
+        monkeypatch.setattr(woo_orders, "iter_query", fake_iter_query)
+        monkeypatch.setattr(woo_orders, "resolve_customers", lambda orders, remember=False: ["C1"] * len(orders))
+        monkeypatch.setattr(woo_orders, "woo_order_to_staging",
+                            lambda order: {k: None for k in ("WOO_ORDER_ID", "WOO_ORDER_NO", "CUST_EMAIL", "ORD_DAT",
+                                                             "ORD_STATUS", "PMT_METH", "SHIP_VIA", "SUBTOT", "SHIP_AMT",
+                                                             "TAX_AMT", "DISC_AMT", "TOT_AMT", "SHIP_NAM", "SHIP_ADRS_1",
+                                                             "SHIP_ADRS_2", "SHIP_CITY", "SHIP_STATE", "SHIP_ZIP_COD",
+                                                             "SHIP_CNTRY", "SHIP_PHONE", "LINE_ITEMS_JSON")})
+        monkeypatch.setattr(woo_orders, "bulk_insert", lambda table, rows: len(rows))
+        return env
+
+    return use
+
+
+def test_incremental_pull_uses_watermark_and_advances_it(pull_env):
+    env = pull_env(
+        [_order(1, "2026-01-02T09:00:00"), _order(2, "2026-01-02T10:30:00")],
+        mark=datetime(2026, 1, 2, 9, 0),
+        staged={1},
+    )
+
+    staged, skipped, errors = woo_orders.pull_orders(dry_run=False, incremental=True)
+
+    params = env["client"].params
+    assert params["modified_after"] == "2026-01-02T08:50:00"
+    assert (params["orderby"], params["order"], params["dates_are_gmt"]) == ("modified", "asc", "true")
+    assert "after" not in params
+    assert (staged, skipped, errors) == (1, 1, 0)
+    assert env["marks"] == [datetime(2026, 1, 2, 10, 30)]
+
+
+def test_incremental_pull_reads_overlap_at_run_time(pull_env, monkeypatch):
+    env = pull_env([], mark=datetime(2026, 1, 2, 9, 0))
+    monkeypatch.setenv("ORDER_PULL_OVERLAP_MINUTES", "45")
+
+    woo_orders.pull_orders(dry_run=True, incremental=True)
+
+    assert env["client"].params["modified_after"] == "2026-01-02T08:15:00"
+
+
+def test_incremental_pull_stops_mark_before_failed_order(pull_env, monkeypatch):
+    env = pull_env(
+        [_order(1, "2026-01-02T09:00:00"), _order(2, "2026-01-02T10:00:00"), _order(3, "2026-01-02T11:00:00")],
+        mark=datetime(2026, 1, 2, 8, 0),
+    )
+    convert = woo_orders.woo_order_to_staging
+
+    def flaky(order):
+        if order["id"] == 2:
+            raise ValueError("bad address")
+        return convert(order)
+
+    monkeypatch.setattr(woo_orders, "woo_order_to_staging", flaky)
+
+    staged, skipped, errors = woo_orders.pull_orders(dry_run=False, incremental=True)
+
+    assert (staged, skipped, errors) == (2, 0, 1)
+    assert env["marks"] == [datetime(2026, 1, 2, 10, 0) - timedelta(microseconds=1)]
+
+
+def test_incremental_pull_without_mark_uses_days_window(pull_env):
+    env = pull_env([_order(3, "2026-01-03T08:00:00")])
+
+    woo_orders.pull_orders(days=7, dry_run=True, incremental=True)
+
+    assert "after" in env["client"].params
+    assert "modified_after" not in env["client"].params
+    assert env["marks"] == []  # dry runs never move the mark
+
+
+def test_pull_checks_staged_orders_in_one_lookup(pull_env, monkeypatch):
+    orders = [_order(i, "2026-01-02T09:00:00") for i in range(1, 101)]
+    env = pull_env(orders, staged={5, 50, 500})
+
+    staged, skipped, errors = woo_orders.pull_orders(dry_run=False)
+
+    assert env["lookups"] == [list(range(1, 101))]
+    assert (staged, skipped, errors) == (98, 2, 0)
+
+    monkeypatch.setattr(woo_orders, "LOOKUP_CHUNK", 40)
+    env["lookups"].clear()
+    assert woo_orders.find_staged_order_ids([3, 50, 3] + list(range(60, 101))) == {50}
+    assert [len(chunk) for chunk in env["lookups"]] == [40, 3]
+
+
+def test_resolve_customers_batches_lookups_and_remembers_email_hits(monkeypatch):
+    # In-memory USER_CUSTOMER_MAP (active rows): Woo user ID -> CUST_NO
+    customer_map = {7: "MAPPED"}
+    queries = []
+
+    def fake_run_query(sql, params, suppress_errors=False):
+        queries.append(list(params))
+        if sql.startswith(woo_orders.FIND_CUSTOMERS_BY_WOO_IDS_SQL.split("{")[0]):
+            return [{"WOO_USER_ID": i, "CUST_NO": customer_map[i]} for i in params if i in customer_map]
+        mapped = next((i for i, c in customer_map.items() if c == "ANN"), None)
+        return ([{"EMAIL_ADRS_1": "Ann@Example.com", "CUST_NO": "ANN", "MAPPED_WOO_USER_ID": mapped}]
+                if "ann@example.com" in params else [])
+
+    def fake_bulk_merge(table, key_cols, rows, **kwargs):
+        assert table == "dbo.USER_CUSTOMER_MAP" and kwargs["update_cols"] == []
+        customer_map.update({r["WOO_USER_ID"]: r["CUST_NO"] for r in rows})
+        return len(rows), 0
+
+    monkeypatch.setattr(woo_orders, "run_query", fake_run_query)
+    monkeypatch.setattr(woo_orders, "bulk_merge", fake_bulk_merge)
+
+    def order(customer_id, email):
+        return {"customer_id": customer_id, "billing": {"email": email}}
+
+    orders = [order(7, "x@example.com"), order(0, " ANN@example.com"), order(8, "ann@example.com"),
+              order(7, None), order(0, "nobody@example.com")]
+
+    # Dry run: one map query for the Woo IDs, one AR_CUST query for the rest's emails, no writes
+    assert woo_orders.resolve_customers(orders) == ["MAPPED", "ANN", "ANN", "MAPPED", None]
+    assert queries == [[7, 8], ["ann@example.com", "nobody@example.com"]]
+    assert customer_map == {7: "MAPPED"}
+
+    # Live run: Woo user 8, found by email, is written to the map...
+    queries.clear()
+    assert woo_orders.resolve_customers(orders, remember=True) == ["MAPPED", "ANN", "ANN", "MAPPED", None]
+    assert customer_map == {7: "MAPPED", 8: "ANN"}
+
+    # ...so the next pull resolves it by ID; only the guest emails still go to AR_CUST
+    queries.clear()
+    assert woo_orders.resolve_customers(orders, remember=True) == ["MAPPED", "ANN", "ANN", "MAPPED", None]
+    assert queries == [[7, 8], ["ann@example.com", "nobody@example.com"]]
+    assert customer_map == {7: "MAPPED", 8: "ANN"}
+
+    # Deactivating the mapping invalidates it: back to the email lookup
+    del customer_map[8]
+    queries.clear()
+    assert woo_orders.resolve_customers([order(8, "ann@example.com")]) == ["ANN"]
+    assert queries == [[8], ["ann@example.com"]]
+
+
+def test_check_duplicate_orders_matches_by_id_or_number_in_chunks(monkeypatch):
+    from decimal import Decimal
+
+    staged = [
+        # WOO_ORDER_ID as the driver might return it (Decimal), matched by id
+        {"STAGING_ID": 1, "WOO_ORDER_ID": Decimal(101), "WOO_ORDER_NO": "101", "STATUS": "PENDING",
+         "CP_DOC_ID": None, "CREATED_DT": None},
+        # Re-keyed order: only the order number still matches
+        {"STAGING_ID": 2, "WOO_ORDER_ID": 9999, "WOO_ORDER_NO": "WP-102", "STATUS": "COMPLETED",
+         "CP_DOC_ID": 55, "CREATED_DT": None},
+    ]
+    calls = []
+
+    def fake_iter_query(sql, params, conn=None):
+        calls.append(list(params))
+        half = len(params) // 2
+        ids, numbers = params[:half], params[half:]
+        return [r for r in staged if int(r["WOO_ORDER_ID"]) in ids or r["WOO_ORDER_NO"] in numbers]
+
+    monkeypatch.setattr(woo_orders, "connection_ctx", lambda: nullcontext(object()))
+    monkeypatch.setattr(woo_orders, "iter_query", fake_iter_query)
+    monkeypatch.setattr(woo_orders, "LOOKUP_CHUNK", 2)
+
+    found = woo_orders.check_duplicate_orders([(101, None), (102, "WP-102"), (103, "103")])
+
+    assert calls == [[101, 102, "101", "WP-102"], [103, "103"]]
+    assert {k: (v["staging_id"], v["status"]) for k, v in found.items()} == {101: (1, "PENDING"), 102: (2, "COMPLETED")}
+
+
+def test_pull_retries_failed_batch_row_by_row(pull_env, monkeypatch):
+    orders = [_order(i, f"2026-01-02T0{i}:00:00") for i in range(1, 6)]
+    env = pull_env(orders, mark=datetime(2026, 1, 2, 0, 0))
+    convert = woo_orders.woo_order_to_staging
+    monkeypatch.setattr(woo_orders, "woo_order_to_staging", lambda order: dict(convert(order), WOO_ORDER_ID=order["id"]))
+    inserted = []
+
+    def insert(table, rows, batch_size=2):
+        # Commits per batch of 2 like bulk_insert; order 3 is rejected (e.g. a value too long)
+        done = 0
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            if any(row["WOO_ORDER_ID"] == 3 for row in chunk):
+                raise woo_orders.BulkInsertError(done, RuntimeError("String data, right truncation"))
+            inserted.extend(row["WOO_ORDER_ID"] for row in chunk)
+            done += len(chunk)
+        return done
+
+    monkeypatch.setattr(woo_orders, "bulk_insert", insert)
+
+    staged, skipped, errors = woo_orders.pull_orders(dry_run=False, incremental=True)
+
+    # Only order 3 fails; the rest of its batch and later batches are staged
+    assert inserted == [1, 2, 4, 5]
+    assert (staged, skipped, errors) == (4, 0, 1)
+    assert env["marks"] == [datetime(2026, 1, 2, 3, 0) - timedelta(microseconds=1)]
+
+
+def test_list_orders_is_capped_unless_all(monkeypatch):
+    orders = [dict(_order(i, "2026-01-02T09:00:00"), date_created="2026-01-02T09:00:00") for i in range(120)]
+    clients = []
+    monkeypatch.setattr(woo_orders, "WooClient", lambda: clients.append(FakeClient(orders)) or clients[-1])
+
+    assert len(woo_orders.list_woo_orders()) == 50
+    assert clients[-1].max_items == 50
+    assert len(woo_orders.list_woo_orders(limit=None)) == 120
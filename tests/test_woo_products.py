@@ -0,0 +1,182 @@
+import sys
+import os
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from unittest.mock import MagicMock
+
+import pytest
+
+import woo_products
+from woo_client import AdaptiveBatcher
+from woo_products import CategoryMap, field_digests, payload_diff, payload_hash
+
+
+class FakeWooClient:
+    """Stand-in for WooClient: applies every product except the SKUs in `fail`."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.sent = []
+        self.sku_index = None
+        self.batcher = AdaptiveBatcher(initial=10)
+
+    def sync_products_stream(self, products, on_applied=None, full_payload=None):
+        created = updated = 0
+        errors = []
+        for payload in products:
+            sku = payload["sku"]
+            self.sent.append(sku)
+            if sku in self.fail:
+                errors.append(f"{sku}: rejected")
+                continue
+            if "id" in payload:
+                updated += 1
+            else:
+                created += 1
+            on_applied({sku: payload.get("id", 1000 + len(self.sent))})
+        return created, updated, errors
+
+    def transport_stats(self):
+        return {"throttled": 0, "breaker_opens": 0, "retries": 0}
+
+
+def _product_row(sku, category=None):
+    return {"SKU": sku, "NAME": f"Item {sku}", "CATEGORY_CODE": category, "STOCK_QTY": 1, "ACTIVE": 1}
+
+
+@pytest.fixture
+def sync_env(monkeypatch):
+    """Run woo_products.main() against in-memory rows; returns what it wrote."""
+
+    def run(rows, *argv, fail=(), checkpointed=(), categories=None):
+        env = {"client": FakeWooClient(fail), "checkpoints": [], "cleared": [], "category_loads": 0}
+
+        def load_category_map(conn):
+            env["category_loads"] += 1
+            return CategoryMap(dict(categories or {}))
+
+        def no_per_row_lookup(conn, code):
+            raise AssertionError("per-product category query")
+
+        monkeypatch.setenv("PRODUCT_PAYLOAD_WORKERS", "1")
+        monkeypatch.setattr(sys, "argv", ["woo_products.py", "sync", *argv])
+        monkeypatch.setattr(woo_products, "get_integration_config", lambda: MagicMock(image_base_url=None))
+        monkeypatch.setattr(woo_products, "WooClient", lambda config: env["client"])
+        monkeypatch.setattr(woo_products, "connection_ctx", lambda: nullcontext(MagicMock()))
+        monkeypatch.setattr(woo_products, "get_last_sync_time", lambda conn: None)
+        monkeypatch.setattr(woo_products, "load_category_map", load_category_map)
+        monkeypatch.setattr(woo_products, "get_category_mapping", no_per_row_lookup)
+        monkeypatch.setattr(woo_products, "get_product_map", lambda conn: {})
+        monkeypatch.setattr(woo_products, "get_pushed_payloads", lambda conn: {})
+        monkeypatch.setattr(woo_products, "save_pushed_payloads", lambda conn, rows, user: (len(rows), 0))
+        monkeypatch.setattr(woo_products, "get_checkpointed_skus", lambda conn, batch_id: set(checkpointed))
+        monkeypatch.setattr(woo_products, "save_checkpoint",
+                            lambda conn, batch_id, chunk: env["checkpoints"].append((batch_id, dict(chunk))))
+        monkeypatch.setattr(woo_products, "clear_checkpoint", lambda conn, batch_id: env["cleared"].append(batch_id))
+        monkeypatch.setattr(woo_products, "log_sync", lambda *a, **k: None)
+        monkeypatch.setattr(woo_products, "iter_products", lambda conn, **kwargs: iter(rows))
+        woo_products.main()
+        return env
+
+    return run
+
+
+def test_payload_hash_ignores_key_order_and_payload_id():
+    a = {"sku": "A", "name": "Widget", "categories": [{"id": 3}]}
+    b = {"categories": [{"id": 3}], "name": "Widget", "sku": "A", "id": 42}
+
+    assert payload_hash(a, 42) == payload_hash(b, 42)
+    assert payload_hash(a, 42) != payload_hash(a, 43)
+    assert payload_hash(a, 42) != payload_hash(dict(a, name="Gadget"), 42)
+
+
+def test_payload_diff_sends_only_changed_fields():
+    before = {"sku": "A", "name": "Widget", "description": "<p>long</p>", "regular_price": "9.99"}
+    after = dict(before, regular_price="10.49", images=[{"src": "a.jpg"}])
+
+    diff = payload_diff(after, 42, field_digests(before))
+
+    assert diff == {"id": 42, "sku": "A", "regular_price": "10.49", "images": [{"src": "a.jpg"}]}
+    assert payload_diff(before, 42, field_digests(before)) == {"id": 42, "sku": "A"}
+
+
+def test_prepare_product_payloads_sanitizes_in_pool_and_keeps_order():
+    woo_products._sanitized_cache.clear()
+    rows = [
+        {"SKU": f"S{i}", "NAME": f"Item {i}", "SHORT_DESC": f"<p>short {i}<script>x</script></p>",
+         "LONG_DESC": "<div onclick='x'>shared</div>"}
+        for i in range(5)
+    ]
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        parsed = woo_products.presanitize(
+            (row[col] for row in rows for col in ("SHORT_DESC", "LONG_DESC")), pool=pool, chunk_size=2
+        )
+    payloads = woo_products.prepare_product_payloads(rows)
+
+    assert parsed == 6  # five short descriptions + one shared long description
+    assert [p["sku"] for p in payloads] == [f"S{i}" for i in range(5)]
+    assert payloads[3]["short_description"] == "<p>short 3x</p>"
+    assert payloads[0]["description"] == "<div>shared</div>"
+    assert woo_products.presanitize(row["LONG_DESC"] for row in rows) == 0
+
+
+def test_sanitize_cache_size_read_at_run_time(monkeypatch):
+    monkeypatch.setenv("PRODUCT_HTML_CACHE_SIZE", "2")
+    monkeypatch.setattr(woo_products, "_sanitized_cache_size", None)
+    woo_products._sanitized_cache.clear()
+
+    for i in range(3):
+        woo_products.sanitize_html(f"<p>{i}</p>")
+
+    assert len(woo_products._sanitized_cache) == 2
+    woo_products._sanitized_cache.clear()
+
+
+def test_sync_checkpoints_each_applied_chunk(sync_env):
+    env = sync_env([_product_row("A"), _product_row("B"), _product_row("C")],
+                   "--apply", "--full", "--batch-id", "RUN1", fail={"B"})
+
+    assert env["client"].sent == ["A", "B", "C"]
+    assert [batch_id for batch_id, _ in env["checkpoints"]] == ["RUN1", "RUN1"]
+    assert [sorted(chunk) for _, chunk in env["checkpoints"]] == [["A"], ["C"]]
+    # B was not applied: the checkpoint is kept for --resume
+    assert env["cleared"] == []
+
+
+def test_resume_skips_checkpointed_skus_and_clears_on_success(sync_env):
+    env = sync_env([_product_row("A"), _product_row("B"), _product_row("C")],
+                   "--apply", "--full", "--resume", "RUN1", checkpointed={"A", "C"})
+
+    assert env["client"].sent == ["B"]
+    assert env["checkpoints"] == [("RUN1", {"B": 1001})]
+    assert env["cleared"] == ["RUN1"]
+
+
+def test_categories_resolved_from_one_preloaded_map(sync_env):
+    rows = [_product_row("A", "PENS"), _product_row("B", "INK"), _product_row("C", "PENS")]
+    env = sync_env(rows, "--full", categories={"PENS": 11, "INK": 12})
+
+    # One map load for the run; get_category_mapping would raise if called per row
+    assert env["category_loads"] == 1
+
+    category_map = CategoryMap({"PENS": 11, "INK": 12})
+    payloads = woo_products.prepare_product_payloads(rows, category_map=category_map)
+    assert [p["categories"] for p in payloads] == [[{"id": 11}], [{"id": 12}], [{"id": 11}]]
+    assert category_map.woo_ids == {11, 12}
+
+
+def test_load_category_map_reads_table_once():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = [("PENS", 11), ("INK", 12)]
+
+    category_map = woo_products.load_category_map(conn)
+
+    assert conn.cursor.return_value.execute.call_count == 1
+    assert category_map.get("PENS") == 11 and category_map.get("NONE") is None and category_map.get(None) is None
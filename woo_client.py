@@ -4,7 +4,27 @@ WooCommerce REST API helper focused on safe, testable interactions.
 Supports:
     - test_connection(): GET small sample to verify credentials.
     - sync_products(): Batch create/update products.
+    - sync_products_stream(): same, consuming products from an iterator while
+      earlier batches are posted concurrently (bounded, with back-pressure).
     - sync_inventory(): Batch update inventory/stock quantities.
+    - map_concurrent() / execute_many(): run many requests in parallel with at
+      most WOO_MAX_CONCURRENCY in flight, results returned in input order.
+    - paginate(): yield every item of a list endpoint, fetching the pages
+      advertised by X-WP-TotalPages concurrently and then continuing until an
+      empty page (the header is never trusted as the end - sync invariant 6).
+    - SkuIndex: SKU -> product ID map consulted before the network, seeded
+      from USER_PRODUCT_MAP and kept current from batch-create responses;
+      only unknown SKUs are resolved, with concurrent ?sku= lookups.
+    - Field projection: get(), paginate() and WooRequest accept fields=... and
+      send it as _fields so list pages carry only the attributes a sync path
+      reads; responses are requested gzip-compressed.
+    - AdaptiveBatcher: sizes each /products/batch request from the latency,
+      body bytes and outcome of the previous ones (1..100 items, starting at
+      SYNC_BATCH_SIZE) instead of a fixed chunk size.
+    - Transport-level resilience (ResilientAdapter) for every request:
+      exponential backoff with full jitter, Retry-After, an AIMD concurrency
+      limit that halves on 429/503 and creeps back up on success, and a circuit
+      breaker that pauses all callers while the host is down.
     - Full error handling and logging.
 """
 
@@ -13,19 +33,516 @@ from __future__ import annotations
 import json
 import logging
 import os
-from typing import Dict, List, Optional, Tuple
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from config import IntegrationConfig, load_integration_config
+from config import IntegrationConfig, get_integration_config, get_setting
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass(slots=True)
+class WooRequest:
+    """One REST call for WooClient.execute_many(); path is relative to /wp-json/wc/v3."""
+
+    method: str
+    path: str
+    params: Optional[Dict[str, Any]] = None
+    json: Optional[Any] = None
+    timeout: int = 30
+    fields: Optional[Sequence[str]] = None
+
+
+# ---------- Field projection ----------
+
+# Minimal _fields sets for the sync paths; WooCommerce otherwise returns
+# descriptions, images, meta_data and _links on every object.
+PRODUCT_SKU_FIELDS = ("id", "sku")
+PRODUCT_STOCK_FIELDS = ("id", "sku", "stock_quantity", "stock_status", "manage_stock")
+ORDER_STATUS_FIELDS = ("id", "status")
+
+
+def with_fields(params: Optional[Dict[str, Any]], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Copy params and add the comma-separated _fields projection when fields are given."""
+
+    merged = dict(params or {})
+    if fields:
+        merged["_fields"] = ",".join(fields)
+    return merged
+
+
+# ---------- Transport resilience ----------
+
+# Statuses worth retrying. POST/batch calls are only retried when the server
+# refused the work outright (429/503), never on ambiguous 5xx where it may have
+# been applied.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_STATUSES_NON_IDEMPOTENT = frozenset({429, 503})
+OVERLOAD_STATUSES = frozenset({429, 503})
+HOST_DOWN_STATUSES = frozenset({500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+RETRY_AFTER_MAX_SECONDS = 120.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+BREAKER_MAX_WAIT_SECONDS = 300.0
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised when the WooCommerce host stays unreachable past BREAKER_MAX_WAIT_SECONDS."""
+
+
+# ---------- Adaptive batch sizing ----------
+
+# WooCommerce rejects /batch requests with more than 100 items
+BATCH_API_MAX_ITEMS = 100
+BATCH_MIN_ITEMS = 5
+# Each batch POST aims to finish in SYNC_BATCH_TARGET_SECONDS (well inside the
+# host's request timeout) and to carry at most SYNC_BATCH_MAX_BYTES of JSON body
+
+
+class AdaptiveBatcher:
+    """
+    Chooses how many items go into the next /batch request.
+
+    Starts at SYNC_BATCH_SIZE. A batch that finishes under the latency target
+    grows the next one by a quarter (at least one item); a slow batch shrinks
+    it in proportion to the overshoot; a failed batch halves it. Each batch is
+    also cut so its JSON body stays under max_bytes, and the size always stays
+    within [min_size, 100]. Chosen sizes are kept in `history` for the sync log.
+    """
+
+    def __init__(
+        self,
+        initial: Optional[int] = None,
+        min_size: int = BATCH_MIN_ITEMS,
+        max_size: int = BATCH_API_MAX_ITEMS,
+        target_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        if initial is None:
+            initial = int(get_setting("SYNC_BATCH_SIZE", "50"))
+        if target_seconds is None:
+            target_seconds = float(get_setting("SYNC_BATCH_TARGET_SECONDS", "15"))
+        if max_bytes is None:
+            max_bytes = int(get_setting("SYNC_BATCH_MAX_BYTES", str(2 * 1024 * 1024)))
+        self.max_size = max(1, min(max_size, BATCH_API_MAX_ITEMS))
+        self.min_size = max(1, min(min_size, self.max_size))
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self._size = float(self._clamp(initial))
+        self.history: List[int] = []
+        self._lock = threading.Lock()
+
+    def _clamp(self, size: float) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    @property
+    def size(self) -> int:
+        return self._clamp(self._size)
+
+    def take(self, item_bytes: Sequence[int]) -> int:
+        """How many of the upcoming items (given their JSON sizes) to send next; at least 1."""
+
+        limit = min(self.size, len(item_bytes))
+        count, total = 0, 0
+        for nbytes in item_bytes[:limit]:
+            if count and total + nbytes > self.max_bytes:
+                break
+            total += nbytes
+            count += 1
+        return max(1, count) if item_bytes else 0
+
+    def record(self, size: int, seconds: float, ok: bool) -> None:
+        """Adjust the next size after a batch of `size` items took `seconds`."""
+
+        with self._lock:
+            self.history.append(size)
+            if not ok:
+                self._size = max(float(self.min_size), self._size * 0.5)
+                logger.warning("Batch of %d failed; next batch size %d", size, self.size)
+            elif seconds > self.target_seconds:
+                self._size = max(float(self.min_size), size * self.target_seconds / seconds)
+                logger.info("Batch of %d took %.1fs; next batch size %d", size, seconds, self.size)
+            else:
+                self._size = min(float(self.max_size), max(self._size, size + max(1.0, size * 0.25)))
+
+    def describe(self, limit: int = 400, start: int = 0) -> Optional[str]:
+        """One-line summary of the sizes chosen since history[start] (None if no batch was sent)."""
+
+        sizes = self.history[start:]
+        if not sizes:
+            return None
+        summary = (f"{len(sizes)} batches (min {min(sizes)}, avg {sum(sizes) / len(sizes):.0f}, "
+                   f"max {max(sizes)}): ")
+        sequence = ",".join(str(n) for n in sizes)
+        if len(summary) + len(sequence) > limit:
+            keep = max(0, limit - len(summary) - 3)
+            sequence = sequence[: keep // 2] + "..." + sequence[len(sequence) - keep // 2:]
+        return summary + sequence
+
+
+# ---------- SKU index ----------
+
+# SKUs per ?sku= lookup (the parameter accepts a comma-separated list)
+SKU_LOOKUP_CHUNK = 25
+
+
+class SkuIndex:
+    """
+    Thread-safe SKU -> WooCommerce product ID map.
+
+    loader() seeds the index on first use (e.g. from dbo.USER_PRODUCT_MAP),
+    persist(mapping) is called with every newly learned or changed entry so
+    the next run starts warm, and forget(skus) with SKUs whose product was
+    deleted so the next run does not seed the dead ID again. All are
+    optional; without them the index only lives as long as the client.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[], Dict[str, int]]] = None,
+        persist: Optional[Callable[[Dict[str, int]], Any]] = None,
+        forget: Optional[Callable[[List[str]], Any]] = None,
+    ) -> None:
+        self._loader = loader
+        self._persist = persist
+        self._forget = forget
+        self._ids: Dict[str, int] = {}
+        self._loaded = loader is None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                seeded = self._loader() or {}
+                self._ids.update({sku: int(woo_id) for sku, woo_id in seeded.items() if sku and woo_id})
+                self._loaded = True
+                logger.debug("SKU index seeded with %d entries", len(self._ids))
+
+    def get_many(self, skus: Iterable[str]) -> Dict[str, int]:
+        """Known IDs for skus; unknown SKUs are simply absent from the result."""
+
+        self._ensure_loaded()
+        with self._lock:
+            return {sku: self._ids[sku] for sku in skus if sku in self._ids}
+
+    def update(self, mapping: Dict[str, int]) -> None:
+        """Record SKU -> ID pairs, persisting only the ones that are new or changed."""
+
+        self._ensure_loaded()
+        with self._lock:
+            changed = {sku: int(woo_id) for sku, woo_id in mapping.items()
+                       if sku and woo_id and self._ids.get(sku) != int(woo_id)}
+            self._ids.update(changed)
+        if changed and self._persist is not None:
+            try:
+                self._persist(changed)
+            except Exception:
+                # The in-memory index is still correct; the next run re-learns these
+                logger.exception("Failed to persist %d SKU index entries", len(changed))
+
+    def discard(self, sku: str) -> None:
+        """Forget a SKU whose product no longer exists in WooCommerce."""
+
+        with self._lock:
+            known = self._ids.pop(sku, None) is not None
+        if known and self._forget is not None:
+            try:
+                self._forget([sku])
+            except Exception:
+                logger.exception("Failed to forget stale SKU index entry %s", sku)
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._ids)
+
+
+def _page_items(response: requests.Response) -> List[Dict[str, Any]]:
+    """Items of a list-endpoint page; anything but a JSON array counts as empty."""
+
+    data = response.json()
+    return data if isinstance(data, list) else []
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date); None if absent/invalid."""
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    Every success raises the limit by 1/limit (about +1 per "round" of
+    requests); an overload response halves it, at most once per cooldown so a
+    burst of 503s from one round does not collapse the limit to the floor.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self._limit = float(self.max_limit)
+        self._decrease_factor = decrease_factor
+        self._cooldown = cooldown
+        self._clock = clock
+        self._last_decrease = float("-inf")
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, overloaded: bool = False) -> None:
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if overloaded:
+                now = self._clock()
+                if now - self._last_decrease >= self._cooldown:
+                    self._limit = max(float(self.min_limit), self._limit * self._decrease_factor)
+                    self._last_decrease = now
+                    logger.warning("WooCommerce overloaded; concurrency limit now %d", self.limit)
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / max(self._limit, 1.0))
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Opens after BREAKER_FAILURE_THRESHOLD consecutive host-down results.
+
+    While open, callers block (rather than hammering a dead host) until the
+    reset timeout elapses; then one probe request is let through. A successful
+    probe closes the breaker, a failed one re-opens it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_SECONDS,
+        max_wait: float = BREAKER_MAX_WAIT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_wait = max_wait
+        self._clock = clock
+        self._cond = threading.Condition()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probe_in_flight = False
+
+    def before_request(self) -> None:
+        deadline = self._clock() + self.max_wait
+        with self._cond:
+            while True:
+                if self.state == "closed":
+                    return
+                now = self._clock()
+                if now >= deadline:
+                    raise CircuitOpenError("WooCommerce circuit breaker open; host unavailable")
+                if self.state == "open":
+                    remaining = self.opened_at + self.reset_timeout - now
+                    if remaining <= 0:
+                        self.state = "half_open"
+                        self._probe_in_flight = True
+                        logger.info("Circuit breaker half-open; probing WooCommerce")
+                        return
+                    self._cond.wait(min(remaining, deadline - now))
+                elif self._probe_in_flight:
+                    self._cond.wait(deadline - now)
+                else:
+                    self._probe_in_flight = True
+                    return
+
+    def abandon_probe(self) -> None:
+        """Let another caller probe if ours failed for a reason unrelated to the host."""
+
+        with self._cond:
+            self._probe_in_flight = False
+            self._cond.notify_all()
+
+    def record_success(self) -> None:
+        with self._cond:
+            if self.state != "closed":
+                logger.info("Circuit breaker closed; WooCommerce reachable again")
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+            self._cond.notify_all()
+
+    def record_failure(self) -> None:
+        with self._cond:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or (
+                self.state == "closed" and self.failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self.opened_at = self._clock()
+                self.opens += 1
+                logger.error(
+                    "Circuit breaker open after %d failures; pausing WooCommerce calls for %.0fs",
+                    self.failures, self.reset_timeout,
+                )
+            self._cond.notify_all()
+
+
+class ResilientAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that retries, throttles and circuit-breaks every request sent
+    through the session, so callers get the same behaviour without their own
+    retry loops.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_retries: int = 4,
+        sleep: Callable[[float], None] = time.sleep,
+        rand: Callable[[], float] = random.random,
+        limiter: Optional[AIMDLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        **kwargs: Any,
+    ) -> None:
+        kwargs.setdefault("pool_connections", 1)
+        kwargs.setdefault("pool_maxsize", max_concurrency)
+        super().__init__(**kwargs)
+        self.retries = max(0, max_retries)
+        self.limiter = limiter or AIMDLimiter(max_concurrency)
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._rand = rand
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"requests": 0, "retries": 0, "throttled": 0, "server_errors": 0,
+                                      "connection_errors": 0}
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff; Retry-After (capped) wins when given."""
+
+        if retry_after is not None:
+            return min(retry_after, RETRY_AFTER_MAX_SECONDS)
+        return self._rand() * min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        method = (request.method or "GET").upper()
+        retry_statuses = RETRY_STATUSES if method in IDEMPOTENT_METHODS else RETRY_STATUSES_NON_IDEMPOTENT
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            self.limiter.acquire()
+            self._count("requests")
+            response = None
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self.limiter.release(overloaded=False)
+                self.breaker.record_failure()
+                self._count("connection_errors")
+                # A request that may have reached the server is only replayed if idempotent
+                safe = method in IDEMPOTENT_METHODS or isinstance(exc, requests.ConnectTimeout)
+                if not safe or attempt >= self.retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                logger.warning("%s %s failed (%s); retry %d/%d in %.1fs",
+                               method, request.url, exc, attempt + 1, self.retries, delay)
+            except BaseException:
+                self.limiter.release(overloaded=False)
+                self.breaker.abandon_probe()
+                raise
+            else:
+                status = response.status_code
+                overloaded = status in OVERLOAD_STATUSES
+                self.limiter.release(overloaded=overloaded)
+                if status in HOST_DOWN_STATUSES:
+                    self.breaker.record_failure()
+                    self._count("server_errors")
+                else:
+                    self.breaker.record_success()
+                if overloaded:
+                    self._count("throttled")
+                if status not in retry_statuses or attempt >= self.retries:
+                    return response
+                delay = self.backoff_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                logger.warning("%s %s returned %d; retry %d/%d in %.1fs",
+                               method, request.url, status, attempt + 1, self.retries, delay)
+                response.close()
+            attempt += 1
+            self._count("retries")
+            self._sleep(delay)
+
 
 class WooClient:
-    def __init__(self, config: Optional[IntegrationConfig] = None) -> None:
-        self.config = config or load_integration_config()
+    def __init__(self, config: Optional[IntegrationConfig] = None, sku_index: Optional[SkuIndex] = None) -> None:
+        self.config = config or get_integration_config()
+        self.sku_index = sku_index or SkuIndex()
+        self.batcher = AdaptiveBatcher()
+        self.max_concurrency = max(1, self.config.woo.max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._thread_prefix = f"woo-{id(self):x}"
         self.session = requests.Session()
+        # Keep one pooled socket per worker so parallel calls reuse connections;
+        # retries, throttling and the circuit breaker live in the adapter.
+        self.adapter = ResilientAdapter(
+            max_concurrency=self.max_concurrency,
+            max_retries=self.config.woo.max_retries,
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
         self.session.auth = (
             self.config.woo.consumer_key,
             self.config.woo.consumer_secret,
@@ -34,11 +551,258 @@ class WooClient:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
         })
 
     def _url(self, path: str) -> str:
         return f"{self.config.woo.base_url}/wp-json/wc/v3{path}"
 
+    # ---------- Concurrency ----------
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency, thread_name_prefix=self._thread_prefix
+                    )
+        return self._executor
+
+    def _in_worker(self) -> bool:
+        """True on one of our own worker threads, where nested fan-out could deadlock."""
+
+        return threading.current_thread().name.startswith(self._thread_prefix)
+
+    def map_concurrent(
+        self,
+        fn: Callable[[T], R],
+        items: Iterable[T],
+        return_exceptions: bool = False,
+    ) -> List[Union[R, BaseException]]:
+        """
+        Call fn(item) for every item with at most max_concurrency calls in flight.
+
+        Results come back in input order. With return_exceptions=True a failing
+        call yields its exception in that slot instead of raising, so one bad
+        item does not discard the rest of the batch.
+        """
+
+        items = list(items)
+        if not items:
+            return []
+        if self.max_concurrency == 1 or len(items) == 1 or self._in_worker():
+            futures = None
+        else:
+            executor = self._get_executor()
+            futures = [executor.submit(fn, item) for item in items]
+
+        results: List[Union[R, BaseException]] = []
+        for index, item in enumerate(items):
+            try:
+                results.append(futures[index].result() if futures else fn(item))
+            except Exception as exc:
+                if not return_exceptions:
+                    if futures:
+                        for pending in futures[index + 1:]:
+                            pending.cancel()
+                    raise
+                results.append(exc)
+        return results
+
+    def get(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        fields: Optional[Sequence[str]] = None,
+        timeout: int = 30,
+    ) -> requests.Response:
+        """GET path, projected to fields (sent as _fields) when given."""
+
+        return self.session.get(self._url(path), params=with_fields(params, fields), timeout=timeout)
+
+    def get_items(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        per_page: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        timeout: int = 30,
+    ) -> List[Dict[str, Any]]:
+        """
+        GET a single page of a list endpoint.
+
+        For lookups that cannot fill more than one page (an include= or sku=
+        list of at most per_page entries): paginate() would spend a second
+        request confirming the next page is empty.
+
+        Raises:
+            requests.HTTPError: if the request fails after transport retries.
+        """
+
+        base = with_fields(params, fields)
+        base["per_page"] = per_page
+        return _page_items(self._fetch_page(path, base, 1, timeout))
+
+    def _fetch_page(self, path: str, params: Dict[str, Any], page: int, timeout: int) -> Optional[requests.Response]:
+        """GET one page; None when the endpoint rejects a page past the end."""
+
+        response = self.session.get(self._url(path), params={**params, "page": page}, timeout=timeout)
+        if page > 1 and response.status_code == 400:
+            # Some endpoints answer 400 (invalid page number) instead of [] past the end
+            return None
+        response.raise_for_status()
+        return response
+
+    def paginate(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        per_page: int = 100,
+        max_items: Optional[int] = None,
+        ordered: bool = True,
+        timeout: int = 30,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every item from a paginated list endpoint such as /orders.
+
+        Page 1 is fetched first; the remaining pages advertised by
+        X-WP-TotalPages are then fetched concurrently (bounded window of
+        2 x max_concurrency), and items are yielded as pages arrive - in page
+        order by default, or in completion order with ordered=False. Because
+        X-WP-Total is not trusted, fetching then continues page by page until
+        an empty page comes back.
+
+        Args:
+            path: Endpoint path, e.g. "/customers".
+            params: Extra query parameters (per_page/page are managed here).
+            per_page: Page size (WooCommerce max is 100).
+            max_items: Stop after this many items (outstanding pages are cancelled).
+            ordered: Yield pages in page order (True) or as they complete (False).
+            timeout: Per-request timeout in seconds.
+            fields: Only return these attributes (sent as _fields).
+
+        Raises:
+            requests.HTTPError: if any page fails after transport retries, so a
+            partial listing is never mistaken for a complete one.
+        """
+
+        base = with_fields(params, fields)
+        base["per_page"] = per_page
+        remaining = max_items if max_items is not None else float("inf")
+        if remaining <= 0:
+            return
+
+        def fetch_items(page: int) -> List[Dict[str, Any]]:
+            response = self._fetch_page(path, base, page, timeout)
+            return _page_items(response) if response is not None else []
+
+        first = self._fetch_page(path, base, 1, timeout)
+        items = _page_items(first)
+        if not items:
+            return
+        for item in items[: int(min(len(items), remaining))]:
+            yield item
+        remaining -= len(items)
+        if remaining <= 0:
+            return
+
+        try:
+            total_pages = int(first.headers.get("X-WP-TotalPages", "0"))
+        except ValueError:
+            total_pages = 0
+
+        next_page = 2
+        saw_empty = False
+        if total_pages >= next_page and self.max_concurrency > 1 and not self._in_worker():
+            executor = self._get_executor()
+            window = self.max_concurrency * 2
+            pending: Deque[Tuple[int, Future]] = deque()
+            try:
+                while pending or (next_page <= total_pages and not saw_empty):
+                    while not saw_empty and next_page <= total_pages and len(pending) < window:
+                        pending.append((next_page, executor.submit(fetch_items, next_page)))
+                        next_page += 1
+                    if ordered:
+                        _, future = pending.popleft()
+                    else:
+                        done, _ = wait([f for _, f in pending], return_when=FIRST_COMPLETED)
+                        future = next(f for _, f in pending if f in done)
+                        pending = deque((p, f) for p, f in pending if f is not future)
+                    page_items = future.result()
+                    if not page_items:
+                        # Fewer pages than advertised; nothing after an empty page
+                        saw_empty = True
+                        if ordered:
+                            break
+                        continue
+                    for item in page_items[: int(min(len(page_items), remaining))]:
+                        yield item
+                    remaining -= len(page_items)
+                    if remaining <= 0:
+                        return
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+        if saw_empty:
+            return
+        # X-WP-TotalPages is advisory only: keep going until an empty page
+        while True:
+            page_items = fetch_items(next_page)
+            if not page_items:
+                return
+            for item in page_items[: int(min(len(page_items), remaining))]:
+                yield item
+            remaining -= len(page_items)
+            if remaining <= 0:
+                return
+            next_page += 1
+
+    def request(self, req: WooRequest) -> requests.Response:
+        """Send a single WooRequest on the shared session."""
+
+        return self.session.request(
+            req.method.upper(),
+            self._url(req.path),
+            params=with_fields(req.params, req.fields),
+            json=req.json,
+            timeout=req.timeout,
+        )
+
+    def execute_many(
+        self, requests_: Iterable[WooRequest]
+    ) -> List[Union[requests.Response, BaseException]]:
+        """
+        Send many requests concurrently; returns Response objects (or the
+        exception raised for that request) in the same order as the input.
+        """
+
+        return self.map_concurrent(self.request, requests_, return_exceptions=True)
+
+    def transport_stats(self) -> Dict[str, Any]:
+        """Retry/throttle/breaker counters for end-of-run summaries."""
+
+        stats: Dict[str, Any] = dict(self.adapter.stats)
+        stats["concurrency_limit"] = self.adapter.limiter.limit
+        stats["breaker_state"] = self.adapter.breaker.state
+        stats["breaker_opens"] = self.adapter.breaker.opens
+        return stats
+
+    def close(self) -> None:
+        """Shut down worker threads and close pooled HTTP connections."""
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+
+    def __enter__(self) -> "WooClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
     def test_connection(self) -> bool:
         """GET /products?per_page=1 to ensure credentials work."""
 
@@ -49,6 +813,10 @@ class WooClient:
         if response.ok:
             data = response.json()
             logger.info("WooCommerce connection OK; sample=%s", data[:1])
+            encoding = response.headers.get("Content-Encoding") or ""
+            if "gzip" not in encoding and "deflate" not in encoding:
+                # A proxy or the host stripped compression; list pages will be several times larger
+                logger.warning("WooCommerce responses are not compressed (Content-Encoding=%r)", encoding)
             return True
 
         logger.error(
@@ -59,12 +827,24 @@ class WooClient:
         )
         return False
 
+    def _lookup_skus(self, skus: List[str]) -> Dict[str, int]:
+        """Resolve one chunk of SKUs with a single targeted GET /products?sku=a,b,c."""
+
+        wanted = set(skus)
+        found = {}
+        for product in self.get_items("/products", {"sku": ",".join(skus)}, fields=PRODUCT_SKU_FIELDS):
+            sku = product.get("sku")
+            if sku in wanted and "id" in product:
+                found[sku] = product["id"]
+        return found
+
     def _get_existing_products(self, skus: List[str]) -> Dict[str, int]:
         """
         Fetch existing product IDs by SKU.
 
-        Note: WooCommerce API doesn't support filtering by multiple SKUs directly.
-        We fetch products in batches and match by SKU client-side.
+        SKUs already in sku_index are answered locally. Only the unknown ones
+        go to WooCommerce, as concurrent ?sku= lookups of SKU_LOOKUP_CHUNK
+        SKUs each, and whatever they find is added to the index.
 
         Returns:
             Dictionary mapping SKU to WooCommerce product ID.
@@ -72,45 +852,132 @@ class WooClient:
         if not skus:
             return {}
 
-        existing = {}
-        sku_set = set(skus)
-        page = 1
-        per_page = 100
-        max_pages = 50  # Safety limit
+        skus = list(dict.fromkeys(sku for sku in skus if sku))
+        existing = self.sku_index.get_many(skus)
+        unknown = [sku for sku in skus if sku not in existing]
 
-        logger.debug("Fetching existing products for %d SKUs", len(skus))
+        logger.debug("SKU index resolved %d of %d SKUs; looking up %d", len(existing), len(skus), len(unknown))
 
-        while page <= max_pages:
-            url = self._url("/products")
-            params = {"per_page": per_page, "page": page}
-            response = self.session.get(url, params=params, timeout=30)
+        if unknown:
+            # A comma inside a SKU would split it, so those are looked up alone
+            chunks = [[sku] for sku in unknown if "," in sku]
+            plain = [sku for sku in unknown if "," not in sku]
+            chunks += [plain[i : i + SKU_LOOKUP_CHUNK] for i in range(0, len(plain), SKU_LOOKUP_CHUNK)]
+            found: Dict[str, int] = {}
+            for result in self.map_concurrent(self._lookup_skus, chunks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    logger.warning("SKU lookup failed: %s", result)
+                    continue
+                found.update(result)
+            self.sku_index.update(found)
+            existing.update(found)
 
-            if not response.ok:
-                logger.warning("Failed to fetch existing products: %s", response.status_code)
-                break
+        logger.debug("Found %d of %d requested SKUs", len(existing), len(skus))
+        return existing
 
-            data = response.json()
-            if not data:
-                break
+    def _record_batch_result(
+        self, result: Dict[str, Any], sent: List[Dict], stale: Optional[List[Dict]] = None
+    ) -> Dict[str, int]:
+        """
+        Learn IDs from a /products/batch response and forget IDs WooCommerce rejected.
 
-            for product in data:
-                sku = product.get("sku")
-                if sku and sku in sku_set and "id" in product:
-                    existing[sku] = product["id"]
-                    if len(existing) >= len(skus):
-                        # Found all SKUs, can stop early
-                        logger.debug("Found all %d SKUs, stopping fetch", len(skus))
-                        return existing
+        Returns SKU -> product ID for the sent items WooCommerce applied without
+        error, taken straight from the response. Sent updates whose product no
+        longer exists are appended to `stale`, to be resolved again and re-sent.
+        """
 
-            if len(data) < per_page:
-                break
-            page += 1
+        self.sku_index.update({
+            item["sku"]: item["id"]
+            for item in result.get("create", [])
+            if item.get("sku") and item.get("id") and "error" not in item
+        })
+        applied = {}
+        for action in ("create", "update"):
+            for sent_item, item in zip(sent, result.get(action, [])):
+                error = item.get("error") or {}
+                sku = item.get("sku") or sent_item.get("sku")
+                woo_id = item.get("id") or sent_item.get("id")
+                if not error:
+                    if sku and woo_id:
+                        applied[sku] = int(woo_id)
+                elif action == "update" and error.get("code") == "woocommerce_rest_product_invalid_id" and sku:
+                    self.sku_index.discard(sku)
+                    if stale is not None:
+                        stale.append(sent_item)
+        return applied
 
-        logger.debug("Found %d of %d requested SKUs", len(existing), len(skus))
-        return existing
+    def _resend_stale(
+        self, stale: List[Dict], full_payload: Optional[Callable[[str], Optional[Dict]]]
+    ) -> List[Dict]:
+        """
+        Payloads to re-send for updates whose mapped product was deleted in WooCommerce.
+
+        Each SKU is looked up again with ?sku= (the index no longer knows it):
+        found means an update of the product that now has the SKU, otherwise a
+        create. The sent update may hold only changed fields, so the payload is
+        full_payload(sku) when given, else the sent item without its id.
+        """
+
+        payloads = []
+        for item in stale:
+            payload = dict((full_payload(item["sku"]) if full_payload else None) or item)
+            payload.pop("id", None)
+            payloads.append(payload)
+        existing = self._get_existing_products([p["sku"] for p in payloads])
+        for payload in payloads:
+            if payload["sku"] in existing:
+                payload["id"] = existing[payload["sku"]]
+        logger.warning("%d mapped product(s) no longer exist in WooCommerce; re-sending %d as updates, %d as creates",
+                       len(payloads), sum("id" in p for p in payloads), sum("id" not in p for p in payloads))
+        return payloads
+
+    def _post_batches(
+        self,
+        action: str,
+        items: List[Dict],
+        on_result: Callable[[Dict[str, Any], List[Dict]], None],
+        label: str,
+    ) -> List[str]:
+        """
+        POST items to /products/batch under `action`, sized by self.batcher.
+
+        on_result(response_json, batch) runs for every successful batch; the
+        returned list holds one message per failed batch.
+        """
+
+        url = self._url("/products/batch")
+        item_bytes = [len(json.dumps(item, separators=(",", ":"))) for item in items]
+        errors: List[str] = []
+        i = 0
+        while i < len(items):
+            size = self.batcher.take(item_bytes[i:])
+            batch = items[i : i + size]
+            logger.info("%s %s batch %d-%d of %d", action.capitalize(), label, i + 1, i + size, len(items))
+            started = time.monotonic()
+            ok = False
+            try:
+                response = self.session.post(url, json={action: batch}, timeout=120)
+                if response.ok:
+                    ok = True
+                    on_result(response.json(), batch)
+                else:
+                    error_msg = f"Batch {action} failed: {response.status_code} {response.reason}"
+                    logger.error(error_msg)
+                    errors.append(error_msg)
+            except Exception as exc:
+                error_msg = f"Exception during batch {action}: {exc}"
+                logger.exception(error_msg)
+                errors.append(error_msg)
+            self.batcher.record(size, time.monotonic() - started, ok)
+            i += size
+        return errors
 
     def sync_products(
-        self, products: List[Dict], dry_run: Optional[bool] = None
+        self,
+        products: List[Dict],
+        dry_run: Optional[bool] = None,
+        on_applied: Optional[Callable[[Dict[str, int]], None]] = None,
+        full_payload: Optional[Callable[[str], Optional[Dict]]] = None,
     ) -> Tuple[int, int, List[str]]:
         """
         Batch sync products to WooCommerce (create new or update existing).
@@ -118,6 +985,11 @@ class WooClient:
         Args:
             products: List of WooCommerce product payload dictionaries.
             dry_run: When True, only log what would be sent. If None, checks DRY_RUN env var.
+            on_applied: Called after each batch with SKU -> product ID for the items
+                WooCommerce applied without error, read from the batch response
+                (e.g. to save mappings without looking the SKUs up again).
+            full_payload: SKU -> complete payload, used when an update hits a
+                product deleted in WooCommerce and is re-sent (see _resend_stale).
 
         Returns:
             Tuple of (created_count, updated_count, error_list)
@@ -161,58 +1033,184 @@ class WooClient:
         created = 0
         updated = 0
         errors = []
+        stale: List[Dict] = []
 
-        batch_size = int(os.getenv("SYNC_BATCH_SIZE", "50"))
+        def on_updated(result: Dict[str, Any], batch: List[Dict]) -> None:
+            nonlocal updated
+            applied = self._record_batch_result(result, batch, stale)
+            if on_applied is not None:
+                on_applied(applied)
+            updated += len(result.get("update", []))
+            logger.info("✓ Updated %d products in this batch", len(result.get("update", [])))
+
+        # Update existing products first: ones whose product was deleted are
+        # re-resolved and join the creates (or a second round of updates)
+        if to_update:
+            errors += self._post_batches("update", to_update, on_updated, "products")
+
+        resent = self._resend_stale(stale, full_payload) if stale else []
+        to_create += [p for p in resent if "id" not in p]
+        to_update = [p for p in resent if "id" in p]
 
         # Create new products
         if to_create:
-            for i in range(0, len(to_create), batch_size):
-                batch = to_create[i : i + batch_size]
-                payload = {"create": batch}
-                url = self._url("/products/batch")
-                logger.info("Creating batch %d-%d of %d products", i + 1, min(i + batch_size, len(to_create)), len(to_create))
-
-                try:
-                    response = self.session.post(url, json=payload, timeout=120)
-                    if response.ok:
-                        result = response.json()
-                        created += len(result.get("create", []))
-                        logger.info("✓ Created %d products in this batch", len(result.get("create", [])))
-                    else:
-                        error_msg = f"Batch create failed: {response.status_code} {response.reason}"
-                        logger.error(error_msg)
-                        errors.append(error_msg)
-                except Exception as exc:
-                    error_msg = f"Exception during batch create: {exc}"
-                    logger.exception(error_msg)
-                    errors.append(error_msg)
+            def on_created(result: Dict[str, Any], batch: List[Dict]) -> None:
+                nonlocal created
+                applied = self._record_batch_result(result, batch)
+                if on_applied is not None:
+                    on_applied(applied)
+                created += len(result.get("create", []))
+                logger.info("✓ Created %d products in this batch", len(result.get("create", [])))
+
+            errors += self._post_batches("create", to_create, on_created, "products")
 
-        # Update existing products
+        # Re-resolved SKUs now owned by another product (re-sent once only)
         if to_update:
-            for i in range(0, len(to_update), batch_size):
-                batch = to_update[i : i + batch_size]
-                payload = {"update": batch}
-                url = self._url("/products/batch")
-                logger.info("Updating batch %d-%d of %d products", i + 1, min(i + batch_size, len(to_update)), len(to_update))
-
-                try:
-                    response = self.session.post(url, json=payload, timeout=120)
-                    if response.ok:
-                        result = response.json()
-                        updated += len(result.get("update", []))
-                        logger.info("✓ Updated %d products in this batch", len(result.get("update", [])))
-                    else:
-                        error_msg = f"Batch update failed: {response.status_code} {response.reason}"
-                        logger.error(error_msg)
-                        errors.append(error_msg)
-                except Exception as exc:
-                    error_msg = f"Exception during batch update: {exc}"
-                    logger.exception(error_msg)
-                    errors.append(error_msg)
+            errors += self._post_batches("update", to_update, on_updated, "products")
 
         logger.info("Sync complete: %d created, %d updated, %d errors", created, updated, len(errors))
         return created, updated, errors
 
+    def sync_products_stream(
+        self,
+        products: Iterable[Dict],
+        on_applied: Optional[Callable[[Dict[str, int]], None]] = None,
+        max_in_flight: Optional[int] = None,
+        full_payload: Optional[Callable[[str], Optional[Dict]]] = None,
+    ) -> Tuple[int, int, List[str]]:
+        """
+        Create/update products as they arrive, posting batches while later ones are built.
+
+        Products carrying an "id", or whose SKU the index knows, are updates;
+        unknown SKUs are resolved with concurrent ?sku= lookups a few chunks at
+        a time. A batch is posted as soon as the batcher's size (or byte cap) is
+        reached. At most max_in_flight (default max_concurrency) POSTs run at
+        once, and `products` is not advanced while they are all busy, so a slow
+        store throttles the producer instead of queueing payloads in memory.
+
+        Batch results (counters, SKU index, on_applied) are handled on the
+        calling thread. Errors are returned in batch submission order. Updates
+        that hit a product deleted in WooCommerce are re-sent once at the end
+        (see _resend_stale; full_payload supplies their complete payloads).
+
+        Returns:
+            Tuple of (created_count, updated_count, error_list)
+        """
+
+        url = self._url("/products/batch")
+        limit = max(1, max_in_flight or self.max_concurrency)
+        executor = self._get_executor()
+        buffers: Dict[str, List[Tuple[Dict, int]]] = {"create": [], "update": []}
+        unresolved: List[Dict] = []
+        in_flight: Dict[Future, Tuple[int, str, List[Dict]]] = {}
+        counts = {"create": 0, "update": 0}
+        errors: Dict[int, str] = {}
+        stale: List[Dict] = []
+        sequence = 0
+
+        def post(action: str, batch: List[Dict]) -> Tuple[Optional[requests.Response], float, Optional[Exception]]:
+            started = time.monotonic()
+            try:
+                response = self.session.post(url, json={action: batch}, timeout=120)
+                return response, time.monotonic() - started, None
+            except Exception as exc:
+                return None, time.monotonic() - started, exc
+
+        def complete(done: Iterable[Future]) -> None:
+            for future in done:
+                index, action, batch = in_flight.pop(future)
+                response, seconds, exc = future.result()
+                ok = response is not None and response.ok
+                self.batcher.record(len(batch), seconds, ok)
+                if exc is not None:
+                    errors[index] = f"Exception during batch {action}: {exc}"
+                elif not ok:
+                    errors[index] = f"Batch {action} failed: {response.status_code} {response.reason}"
+                else:
+                    try:
+                        result = response.json()
+                        applied = self._record_batch_result(result, batch, stale)
+                        counts[action] += len(result.get(action, []))
+                        logger.info("✓ %s %d products in batch %d", "Created" if action == "create" else "Updated",
+                                    len(result.get(action, [])), index + 1)
+                        if on_applied is not None:
+                            on_applied(applied)
+                    except Exception as exc:
+                        errors[index] = f"Exception during batch {action}: {exc}"
+                if index in errors:
+                    logger.error(errors[index])
+
+        def submit(action: str, batch: List[Dict]) -> None:
+            nonlocal sequence
+            while len(in_flight) >= limit:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                complete(done)
+            logger.info("%s batch %d: %d products", action.capitalize(), sequence + 1, len(batch))
+            in_flight[executor.submit(post, action, batch)] = (sequence, action, batch)
+            sequence += 1
+
+        def flush(action: str, final: bool = False) -> None:
+            buffer = buffers[action]
+            while buffer:
+                item_bytes = [nbytes for _, nbytes in buffer]
+                size = self.batcher.take(item_bytes)
+                if not final and size == len(buffer) < self.batcher.size:
+                    return  # batch not full yet
+                submit(action, [item for item, _ in buffer[:size]])
+                del buffer[:size]
+
+        def route(product: Dict) -> None:
+            action = "update" if "id" in product else "create"
+            buffers[action].append((product, len(json.dumps(product, separators=(",", ":")))))
+            flush(action)
+            complete([f for f in in_flight if f.done()])
+
+        def resolve() -> None:
+            existing = self._get_existing_products([p["sku"] for p in unresolved])
+            for product in unresolved:
+                if product["sku"] in existing:
+                    product["id"] = existing[product["sku"]]
+                route(product)
+            unresolved.clear()
+
+        for product in products:
+            sku = product.get("sku")
+            if not sku:
+                logger.warning("Product missing SKU, skipping: %s", product.get("name", "Unknown"))
+                continue
+            if "id" not in product:
+                known = self.sku_index.get_many([sku])
+                if sku not in known:
+                    unresolved.append(product)
+                    if len(unresolved) >= SKU_LOOKUP_CHUNK * self.max_concurrency:
+                        resolve()
+                    continue
+                product["id"] = known[sku]
+            route(product)
+
+        def drain() -> None:
+            flush("create", final=True)
+            flush("update", final=True)
+            while in_flight:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                complete(done)
+
+        if unresolved:
+            resolve()
+        drain()
+        if stale:
+            # Re-sent once; a second miss stays unapplied rather than looping
+            resent = self._resend_stale(stale, full_payload)
+            stale.clear()
+            for product in resent:
+                route(product)
+            drain()
+
+        error_list = [errors[index] for index in sorted(errors)]
+        logger.info("Sync complete: %d created, %d updated, %d errors",
+                    counts["create"], counts["update"], len(error_list))
+        return counts["create"], counts["update"], error_list
+
     def sync_inventory(
         self, products: List[Dict], dry_run: Optional[bool] = None
     ) -> Tuple[int, List[str]]:
@@ -273,29 +1271,14 @@ class WooClient:
         logger.info("Valid inventory updates: %d", len(valid_updates))
 
         updated = 0
-        errors = []
-        batch_size = int(os.getenv("SYNC_BATCH_SIZE", "50"))
 
-        for i in range(0, len(valid_updates), batch_size):
-            batch = valid_updates[i : i + batch_size]
-            payload = {"update": batch}
-            url = self._url("/products/batch")
-            logger.info("Updating inventory batch %d-%d of %d", i + 1, min(i + batch_size, len(valid_updates)), len(valid_updates))
+        def on_updated(result: Dict[str, Any], batch: List[Dict]) -> None:
+            nonlocal updated
+            self._record_batch_result(result, batch)
+            updated += len(result.get("update", []))
+            logger.info("✓ Updated inventory for %d products in this batch", len(result.get("update", [])))
 
-            try:
-                response = self.session.post(url, json=payload, timeout=120)
-                if response.ok:
-                    result = response.json()
-                    updated += len(result.get("update", []))
-                    logger.info("✓ Updated inventory for %d products in this batch", len(result.get("update", [])))
-                else:
-                    error_msg = f"Inventory batch update failed: {response.status_code} {response.reason}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
-            except Exception as exc:
-                error_msg = f"Exception during inventory update: {exc}"
-                logger.exception(error_msg)
-                errors.append(error_msg)
+        errors = self._post_batches("update", valid_updates, on_updated, "inventory")
 
         logger.info("Inventory sync complete: %d updated, %d errors", updated, len(errors))
         return updated, errors
@@ -363,6 +1346,29 @@ class WooClient:
             return False, error_msg
 
 
+_SHARED_CLIENT: Optional[WooClient] = None
+_SHARED_CLIENT_LOCK = threading.Lock()
+
+
+def get_client(reload: bool = False) -> WooClient:
+    """
+    Return a process-wide WooClient so per-order loops reuse one HTTP session
+    (keep-alive connections, auth and headers) instead of building a new one.
+
+    Args:
+        reload: Reload configuration and replace the shared client.
+    """
+
+    global _SHARED_CLIENT
+    if _SHARED_CLIENT is None or reload:
+        with _SHARED_CLIENT_LOCK:
+            if _SHARED_CLIENT is None or reload:
+                old, _SHARED_CLIENT = _SHARED_CLIENT, WooClient(get_integration_config(reload=reload))
+                if old is not None:
+                    old.close()
+    return _SHARED_CLIENT
+
+
 def main() -> None:
     logging.basicConfig(level=logging.INFO)
     client = WooClient()
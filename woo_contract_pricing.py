@@ -24,7 +24,6 @@ from functools import lru_cache
 from datetime import datetime, timedelta
 
 from database import get_connection, connection_ctx
-from config import load_integration_config
 
 logger = logging.getLogger(__name__)
 
@@ -112,9 +111,8 @@ def get_customer_ncr_bid(woo_customer_id: int) -> Optional[str]:
         NCR BID # string or None if not found
     """
     try:
-        from woo_client import WooClient
-        config = load_integration_config()
-        client = WooClient(config)
+        from woo_client import get_client
+        client = get_client()
         
         customer = client.get_customer(woo_customer_id)
         if customer:
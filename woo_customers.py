@@ -35,9 +35,14 @@ import string
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 
-from database import run_query, get_connection
+from database import run_query, bulk_insert, bulk_merge, BulkInsertError
 from config import load_integration_config
-from woo_client import WooClient
+from woo_client import WooClient, WooRequest
+
+
+# Customers created per round of concurrent POSTs; their mappings are saved
+# before the next round starts, so a crash loses at most one round
+CUSTOMER_CREATE_BATCH = 50
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -344,31 +349,15 @@ def cp_customer_to_woo_payload(cust: Dict) -> Dict:
 def get_existing_woo_customers(client: WooClient) -> Dict[str, int]:
     """Fetch existing WooCommerce customers, return dict of email -> ID."""
     existing = {}
-    page = 1
-    
-    while True:
-        url = client._url("/customers")
-        resp = client.session.get(url, params={"per_page": 100, "page": page, "role": "all"}, timeout=30)
-        if not resp.ok:
-            print(f"Warning: Failed to fetch customers page {page}: {resp.status_code}")
-            break
-        
-        data = resp.json()
-        if not data:
-            break
-        
-        for cust in data:
-            email = cust.get('email', '').lower()
-            if email:
-                existing[email] = cust['id']
-            # Also check for cp_cust_no in meta
-            for meta in cust.get('meta_data', []):
-                if meta.get('key') == 'cp_cust_no':
-                    existing[f"cust:{meta['value']}"] = cust['id']
-        
-        if len(data) < 100:
-            break
-        page += 1
+    
+    for cust in client.paginate("/customers", {"role": "all"}, fields=("id", "email", "meta_data")):
+        email = cust.get('email', '').lower()
+        if email:
+            existing[email] = cust['id']
+        # Also check for cp_cust_no in meta
+        for meta in cust.get('meta_data', []):
+            if meta.get('key') == 'cp_cust_no':
+                existing[f"cust:{meta['value']}"] = cust['id']
     
     return existing
 
@@ -390,23 +379,8 @@ def get_existing_woo_customers_full(client: WooClient) -> List[Dict]:
     # ─────────────────────────────────────────────────────────────────────────
     # STEP 1: Fetch from customer list API with role=all
     # ─────────────────────────────────────────────────────────────────────────
-    page = 1
-    while True:
-        url = client._url("/customers")
-        resp = client.session.get(url, params={"per_page": 100, "page": page, "role": "all"}, timeout=60)
-        if not resp.ok:
-            break
-        
-        data = resp.json()
-        if not data:
-            break
-        
-        for c in data:
-            customers_by_id[c['id']] = c
-        
-        if len(data) < 100:
-            break
-        page += 1
+    for c in client.paginate("/customers", {"role": "all"}, timeout=60):
+        customers_by_id[c['id']] = c
     
     list_count = len(customers_by_id)
     
@@ -414,61 +388,49 @@ def get_existing_woo_customers_full(client: WooClient) -> List[Dict]:
     # STEP 2: Scan orders for customers not in the list
     # This catches customers created during checkout who weren't indexed
     # ─────────────────────────────────────────────────────────────────────────
-    page = 1
     orders_scanned = 0
     additional_found = 0
+    missing_ids = {}  # insertion-ordered set of registered customer IDs
     
-    while True:
-        url = client._url("/orders")
-        resp = client.session.get(url, params={"per_page": 100, "page": page}, timeout=60)
-        if not resp.ok:
-            break
+    for order in client.paginate("/orders", timeout=60):
+        orders_scanned += 1
+        customer_id = order.get('customer_id', 0)
         
-        orders = resp.json()
-        if not orders:
-            break
+        # Skip if we already have this customer
+        if customer_id in customers_by_id:
+            continue
         
-        for order in orders:
-            orders_scanned += 1
-            customer_id = order.get('customer_id', 0)
-            
-            # Skip if we already have this customer
-            if customer_id in customers_by_id:
-                continue
-            
-            # For registered customers not in list, fetch directly by ID
-            if customer_id > 0:
-                cust_url = client._url(f"/customers/{customer_id}")
-                cust_resp = client.session.get(cust_url, timeout=30)
-                if cust_resp.ok:
-                    cust = cust_resp.json()
-                    customers_by_id[customer_id] = cust
+        # For registered customers not in list, fetch directly by ID (below, in parallel)
+        if customer_id > 0:
+            missing_ids.setdefault(customer_id, None)
+        # Guest checkout - create pseudo-customer from order billing
+        else:
+            billing = order.get('billing', {})
+            if billing.get('email'):
+                # Use negative order ID as pseudo-ID to avoid conflicts
+                pseudo_id = -order['id']
+                if pseudo_id not in customers_by_id:
+                    customers_by_id[pseudo_id] = {
+                        'id': pseudo_id,  # Negative = guest
+                        'email': billing.get('email'),
+                        'first_name': billing.get('first_name', ''),
+                        'last_name': billing.get('last_name', ''),
+                        'username': '',
+                        'role': 'guest',
+                        'billing': billing,
+                        'shipping': order.get('shipping', {}),
+                        'date_created': order.get('date_created'),
+                        '_is_guest': True,
+                        '_from_order_id': order['id'],
+                    }
                     additional_found += 1
-            # Guest checkout - create pseudo-customer from order billing
-            else:
-                billing = order.get('billing', {})
-                if billing.get('email'):
-                    # Use negative order ID as pseudo-ID to avoid conflicts
-                    pseudo_id = -order['id']
-                    if pseudo_id not in customers_by_id:
-                        customers_by_id[pseudo_id] = {
-                            'id': pseudo_id,  # Negative = guest
-                            'email': billing.get('email'),
-                            'first_name': billing.get('first_name', ''),
-                            'last_name': billing.get('last_name', ''),
-                            'username': '',
-                            'role': 'guest',
-                            'billing': billing,
-                            'shipping': order.get('shipping', {}),
-                            'date_created': order.get('date_created'),
-                            '_is_guest': True,
-                            '_from_order_id': order['id'],
-                        }
-                        additional_found += 1
-        
-        if len(orders) < 100:
-            break
-        page += 1
+    
+    missing = list(missing_ids)
+    responses = client.execute_many(WooRequest('GET', f"/customers/{cid}") for cid in missing)
+    for customer_id, cust_resp in zip(missing, responses):
+        if not isinstance(cust_resp, Exception) and cust_resp.ok:
+            customers_by_id[customer_id] = cust_resp.json()
+            additional_found += 1
     
     # Log what we found (helpful for debugging)
     if additional_found > 0:
@@ -532,47 +494,54 @@ def push_customers_to_woo(dry_run: bool = True) -> Tuple[int, int, int]:
             print(json.dumps(to_create[0], indent=2)[:500])
         return len(to_create), len(to_update), 0
     
-    # Execute creates
+    # Execute creates (concurrently, CUSTOMER_CREATE_BATCH at a time; responses
+    # come back in payload order). Each round's mappings are saved before the
+    # next round, so an interrupted run doesn't create duplicates next time.
     created = 0
     errors = 0
     
-    for payload in to_create:
-        try:
-            url = client._url("/customers")
-            resp = client.session.post(url, json=payload, timeout=30)
-            if resp.ok:
+    for start in range(0, len(to_create), CUSTOMER_CREATE_BATCH):
+        batch = to_create[start:start + CUSTOMER_CREATE_BATCH]
+        new_mappings = []
+        responses = client.execute_many(
+            WooRequest('POST', "/customers", json=payload) for payload in batch
+        )
+        for payload, resp in zip(batch, responses):
+            if isinstance(resp, Exception):
+                errors += 1
+                print(f"  [ERR] Error creating {payload['email']}: {resp}")
+            elif resp.ok:
                 data = resp.json()
                 created += 1
-                # Store mapping
-                _save_customer_mapping(
+                new_mappings.append((
                     payload['meta_data'][0]['value'],  # cp_cust_no
                     data['id'],
                     payload['email'],
                     'AUTO_PUSH'
-                )
+                ))
                 print(f"  [OK] Created: {payload['email']} (Woo ID: {data['id']})")
             else:
                 errors += 1
                 print(f"  [ERR] Failed to create {payload['email']}: {resp.status_code} {resp.text[:200]}")
-        except Exception as e:
-            errors += 1
-            print(f"  [ERR] Error creating {payload['email']}: {e}")
+        
+        if new_mappings:
+            _save_customer_mappings(new_mappings)
     
     # Execute updates
     updated = 0
     
-    for payload in to_update:
-        try:
-            url = client._url(f"/customers/{payload['id']}")
-            resp = client.session.put(url, json=payload, timeout=30)
-            if resp.ok:
-                updated += 1
-            else:
-                errors += 1
-                print(f"  [ERR] Failed to update ID {payload['id']}: {resp.status_code}")
-        except Exception as e:
+    responses = client.execute_many(
+        WooRequest('PUT', f"/customers/{payload['id']}", json=payload) for payload in to_update
+    )
+    for payload, resp in zip(to_update, responses):
+        if isinstance(resp, Exception):
+            errors += 1
+            print(f"  [ERR] Error updating ID {payload['id']}: {resp}")
+        elif resp.ok:
+            updated += 1
+        else:
             errors += 1
-            print(f"  [ERR] Error updating ID {payload['id']}: {e}")
+            print(f"  [ERR] Failed to update ID {payload['id']}: {resp.status_code}")
     
     print(f"\n{'='*60}")
     print(f"Results: Created {created}, Updated {updated}, Errors {errors}")
@@ -583,41 +552,30 @@ def push_customers_to_woo(dry_run: bool = True) -> Tuple[int, int, int]:
 
 def _save_customer_mapping(cust_no: str, woo_id: int, email: str, source: str):
     """Save customer mapping to USER_CUSTOMER_MAP."""
-    conn = None
-    cursor = None
+    _save_customer_mappings([(cust_no, woo_id, email, source)])
+
+
+def _save_customer_mappings(mappings: List[Tuple[str, int, str, str]]):
+    """
+    Save many (cust_no, woo_id, email, source) mappings to USER_CUSTOMER_MAP
+    with one bulk MERGE: active rows are updated, missing ones inserted.
+    """
+    rows = [
+        {'CUST_NO': cust_no, 'WOO_USER_ID': woo_id, 'WOO_EMAIL': email, 'MAPPING_SOURCE': source}
+        for cust_no, woo_id, email, source in mappings
+    ]
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check if mapping exists
-        cursor.execute("""
-            SELECT MAP_ID FROM dbo.USER_CUSTOMER_MAP 
-            WHERE CUST_NO = ? AND IS_ACTIVE = 1
-        """, (cust_no,))
-        
-        if cursor.fetchone():
-            # Update existing
-            cursor.execute("""
-                UPDATE dbo.USER_CUSTOMER_MAP
-                SET WOO_USER_ID = ?, WOO_EMAIL = ?, UPDATED_DT = GETDATE()
-                WHERE CUST_NO = ? AND IS_ACTIVE = 1
-            """, (woo_id, email, cust_no))
-        else:
-            # Insert new
-            cursor.execute("""
-                INSERT INTO dbo.USER_CUSTOMER_MAP 
-                (CUST_NO, WOO_USER_ID, WOO_EMAIL, MAPPING_SOURCE, IS_ACTIVE)
-                VALUES (?, ?, ?, ?, 1)
-            """, (cust_no, woo_id, email, source))
-        
-        conn.commit()
+        bulk_merge(
+            "dbo.USER_CUSTOMER_MAP",
+            key_cols=['CUST_NO'],
+            rows=rows,
+            update_cols=['WOO_USER_ID', 'WOO_EMAIL'],
+            update_extra={'UPDATED_DT': 'GETDATE()'},
+            insert_extra={'IS_ACTIVE': '1'},
+            match_extra='t.IS_ACTIVE = 1',
+        )
     except Exception as e:
         print(f"  Warning: Could not save mapping: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -658,13 +616,12 @@ def extract_ship_to_addresses_from_woo(batch_id: str, dry_run: bool = True) -> i
         
         try:
             # Get orders for this customer
-            url = client._url("/orders")
-            resp = client.session.get(url, params={
+            resp = client.get("/orders", {
                 "customer": woo_user_id,
                 "after": after_date,
                 "per_page": 100,
                 "status": "any"
-            }, timeout=30)
+            }, fields=("id", "shipping"))
             
             if not resp.ok:
                 continue
@@ -721,40 +678,26 @@ def extract_ship_to_addresses_from_woo(batch_id: str, dry_run: bool = True) -> i
         return len(ship_to_addresses)
     
     # Stage to database
-    conn = get_connection()
-    cursor = conn.cursor()
-    staged = 0
-    
-    try:
-        for addr_data in ship_to_addresses.values():
-            cursor.execute("""
-                INSERT INTO dbo.USER_SHIP_TO_STAGING (
-                    BATCH_ID, CUST_NO, WOO_USER_ID,
-                    NAM, FST_NAM, LST_NAM,
-                    ADRS_1, ADRS_2, CITY, STATE, ZIP_COD, CNTRY,
-                    PHONE_1, SOURCE_SYSTEM
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'WOOCOMMERCE')
-            """, (
-                batch_id,
-                addr_data['CUST_NO'],
-                addr_data['WOO_USER_ID'],
-                addr_data['NAM'],
-                addr_data['FST_NAM'],
-                addr_data['LST_NAM'],
-                addr_data['ADRS_1'],
-                addr_data['ADRS_2'],
-                addr_data['CITY'],
-                addr_data['STATE'],
-                addr_data['ZIP_COD'],
-                addr_data['CNTRY'],
-                addr_data['PHONE_1'],
-            ))
-            staged += 1
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+    rows = [
+        {
+            'BATCH_ID': batch_id,
+            'CUST_NO': addr_data['CUST_NO'],
+            'WOO_USER_ID': addr_data['WOO_USER_ID'],
+            'NAM': addr_data['NAM'],
+            'FST_NAM': addr_data['FST_NAM'],
+            'LST_NAM': addr_data['LST_NAM'],
+            'ADRS_1': addr_data['ADRS_1'],
+            'ADRS_2': addr_data['ADRS_2'],
+            'CITY': addr_data['CITY'],
+            'STATE': addr_data['STATE'],
+            'ZIP_COD': addr_data['ZIP_COD'],
+            'CNTRY': addr_data['CNTRY'],
+            'PHONE_1': addr_data['PHONE_1'],
+            'SOURCE_SYSTEM': 'WOOCOMMERCE',
+        }
+        for addr_data in ship_to_addresses.values()
+    ]
+    staged = bulk_insert("dbo.USER_SHIP_TO_STAGING", rows)
     
     return staged
 
@@ -794,8 +737,7 @@ def extract_customer_notes_from_woo(batch_id: str, dry_run: bool = True) -> int:
         
         try:
             # Fetch customer from WooCommerce
-            url = client._url(f"/customers/{woo_user_id}")
-            resp = client.session.get(url, timeout=30)
+            resp = client.get(f"/customers/{woo_user_id}", fields=("id", "note", "meta_data"))
             
             if not resp.ok:
                 continue
@@ -840,30 +782,18 @@ def extract_customer_notes_from_woo(batch_id: str, dry_run: bool = True) -> int:
         return len(notes_staged)
     
     # Stage to database
-    conn = get_connection()
-    cursor = conn.cursor()
-    staged = 0
-    
-    try:
-        for note_data in notes_staged:
-            cursor.execute("""
-                INSERT INTO dbo.USER_CUSTOMER_NOTES_STAGING (
-                    BATCH_ID, CUST_NO, WOO_USER_ID,
-                    NOTE, NOTE_TXT, SOURCE_SYSTEM
-                ) VALUES (?, ?, ?, ?, ?, 'WOOCOMMERCE')
-            """, (
-                batch_id,
-                note_data['CUST_NO'],
-                note_data['WOO_USER_ID'],
-                note_data['NOTE'],
-                note_data['NOTE_TXT'],
-            ))
-            staged += 1
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+    rows = [
+        {
+            'BATCH_ID': batch_id,
+            'CUST_NO': note_data['CUST_NO'],
+            'WOO_USER_ID': note_data['WOO_USER_ID'],
+            'NOTE': note_data['NOTE'],
+            'NOTE_TXT': note_data['NOTE_TXT'],
+            'SOURCE_SYSTEM': 'WOOCOMMERCE',
+        }
+        for note_data in notes_staged
+    ]
+    staged = bulk_insert("dbo.USER_CUSTOMER_NOTES_STAGING", rows)
     
     return staged
 
@@ -1001,78 +931,75 @@ def pull_customers_from_woo(dry_run: bool = True) -> int:
     # Stored procedure usp_Preflight_Validate_Customer_Staging handles the rest
     batch_id = f"WOO_PULL_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    staged = 0
+    rows = []
+    guest_rows = []  # is_guest per row, to count guests among committed rows
     guests_staged = 0
     skipped = 0
     validation_errors_set = 0
     
+    for c in unmapped:
+        try:
+            # Use smart extraction to get best available data
+            data = extract_best_customer_data(c)
+            
+            # Validate customer - check for required fields (to filter bots/non-serious)
+            is_valid, missing_fields = validate_customer_for_cp_sync(data)
+            validation_error = None
+            if not is_valid:
+                # Set validation error (following existing pattern)
+                validation_error = f"Missing required fields: {', '.join(missing_fields)}"
+                validation_errors_set += 1
+            
+            # For guest checkouts (negative ID), WOO_USER_ID should be NULL
+            # The stored procedure handles NULL WOO_USER_ID (creates customer, no mapping)
+            woo_user_id = c['id'] if c['id'] > 0 else None
+            is_guest = c.get('_is_guest') or c['id'] < 0
+            
+            # Extract tier from WordPress role
+            wp_role = c.get('role', 'customer')
+            prof_cod_1 = get_prof_cod_1_from_wp_role(wp_role)
+            
+            # Calculate and abbreviate tax code (max 10 chars for CounterPoint)
+            tax_code = get_tax_code(data['state'], data['city'])
+            tax_code_abbrev = abbreviate_tax_code(tax_code)  # Ensure max 10 chars
+            
+            rows.append({
+                'BATCH_ID': batch_id,
+                'WOO_USER_ID': woo_user_id,  # NULL for guests
+                'EMAIL_ADRS_1': data['email'],
+                'NAM': data['nam'],           # Company name if available, else "First Last"
+                'FST_NAM': data['first_name'],
+                'LST_NAM': data['last_name'],
+                'PHONE_1': data['phone'],
+                'ADRS_1': data['address_1'],
+                'ADRS_2': data['address_2'],
+                'CITY': data['city'],
+                'STATE': data['state'],
+                'ZIP_COD': data['postcode'],
+                'CNTRY': data['country'],
+                'CATEG_COD': 'RETAIL',
+                'PROF_COD_1': prof_cod_1,  # Tier pricing from WordPress role
+                'TAX_COD': tax_code_abbrev,  # Tax code (abbreviated to max 10 chars)
+                'SOURCE_SYSTEM': 'WOOCOMMERCE',
+                'IS_VALIDATED': 0,  # Always 0 initially (preflight validation will set to 1 if valid)
+                'VALIDATION_ERROR': validation_error,  # NULL if valid, error message if invalid
+            })
+            guest_rows.append(bool(is_guest))
+            if is_guest:
+                guests_staged += 1
+        except Exception as e:
+            print(f"  [ERR] Error staging {c.get('email')}: {e}")
+            skipped += 1
+    
+    # One fast_executemany round trip per batch instead of one INSERT per customer
     try:
-        for c in unmapped:
-            try:
-                # Use smart extraction to get best available data
-                data = extract_best_customer_data(c)
-                
-                # Validate customer - check for required fields (to filter bots/non-serious)
-                is_valid, missing_fields = validate_customer_for_cp_sync(data)
-                validation_error = None
-                if not is_valid:
-                    # Set validation error (following existing pattern)
-                    validation_error = f"Missing required fields: {', '.join(missing_fields)}"
-                    validation_errors_set += 1
-                
-                # For guest checkouts (negative ID), WOO_USER_ID should be NULL
-                # The stored procedure handles NULL WOO_USER_ID (creates customer, no mapping)
-                woo_user_id = c['id'] if c['id'] > 0 else None
-                is_guest = c.get('_is_guest') or c['id'] < 0
-                
-                # Extract tier from WordPress role
-                wp_role = c.get('role', 'customer')
-                prof_cod_1 = get_prof_cod_1_from_wp_role(wp_role)
-                
-                # Calculate and abbreviate tax code (max 10 chars for CounterPoint)
-                tax_code = get_tax_code(data['state'], data['city'])
-                tax_code_abbrev = abbreviate_tax_code(tax_code)  # Ensure max 10 chars
-                
-                cursor.execute("""
-                    INSERT INTO dbo.USER_CUSTOMER_STAGING (
-                        BATCH_ID, WOO_USER_ID, EMAIL_ADRS_1,
-                        NAM, FST_NAM, LST_NAM,
-                        PHONE_1, ADRS_1, ADRS_2, CITY, STATE, ZIP_COD, CNTRY,
-                        CATEG_COD, PROF_COD_1, TAX_COD, SOURCE_SYSTEM,
-                        IS_VALIDATED, VALIDATION_ERROR
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'RETAIL', ?, ?, 'WOOCOMMERCE', ?, ?)
-                """, (
-                    batch_id,
-                    woo_user_id,  # NULL for guests
-                    data['email'],
-                    data['nam'],           # Company name if available, else "First Last"
-                    data['first_name'],
-                    data['last_name'],
-                    data['phone'],
-                    data['address_1'],
-                    data['address_2'],
-                    data['city'],
-                    data['state'],
-                    data['postcode'],
-                    data['country'],
-                    prof_cod_1,  # Tier pricing from WordPress role
-                    tax_code_abbrev,  # Tax code (abbreviated to max 10 chars)
-                    0,  # IS_VALIDATED: Always 0 initially (preflight validation will set to 1 if valid)
-                    validation_error,  # VALIDATION_ERROR: NULL if valid, error message if invalid
-                ))
-                staged += 1
-                if is_guest:
-                    guests_staged += 1
-            except Exception as e:
-                print(f"  [ERR] Error staging {c.get('email')}: {e}")
-                skipped += 1
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+        staged = bulk_insert("dbo.USER_CUSTOMER_STAGING", rows)
+    except Exception as e:
+        print(f"  [ERR] Error staging customers for batch {batch_id}: {e}")
+        # Batches committed before the failure are staged; the rest are not
+        staged = e.inserted if isinstance(e, BulkInsertError) else 0
+        guests_staged = sum(guest_rows[:staged])
+        skipped += len(rows) - staged
     
     print(f"\n[OK] Staged {staged} customers ({guests_staged} guests)")
     if skipped > 0:
@@ -6,28 +6,64 @@ Purpose:
   - Fast, frequent sync (every 5 minutes)
   - Does NOT create new products or update product details
   - Only updates stock_quantity and stock_status for existing products
+  - Remembers what was last pushed (USER_INVENTORY_PUSH_STATE), so SKUs whose
+    CounterPoint stock has not changed are skipped without any HTTP call
+  - Incremental by default: only SKUs whose IM_ITEM/IM_INV rows (or product
+    mapping) changed since the stored high-water mark (USER_SYNC_WATERMARK) are
+    read; a full run is forced every INVENTORY_FULL_SYNC_HOURS
+  - Watch mode: a long-running loop that follows SQL Server Change Tracking on
+    IM_INV/IM_ITEM and pushes changed SKUs within seconds
 
 Usage:
     python woo_inventory_sync.py sync             # Sync inventory (dry-run)
     python woo_inventory_sync.py sync --apply     # Sync inventory (live)
     python woo_inventory_sync.py sync --sku SKU123 # Sync specific SKU
+    python woo_inventory_sync.py sync --apply --verify  # Reconcile every SKU against live Woo
+    python woo_inventory_sync.py sync --apply --full    # Ignore the watermark, read every SKU
+    python woo_inventory_sync.py watch --apply          # Near-real-time push (needs
+                                                        # enable_inventory_change_tracking.sql)
+
+Environment:
+    INVENTORY_WATERMARK_OVERLAP_MINUTES - Re-read changes this far before the mark (clock skew, default 10)
+    INVENTORY_FULL_SYNC_HOURS           - Force a full run when the last one is older than this (default 24)
+    INVENTORY_WATCH_POLL_SECONDS        - Watch mode: how often to ask for changes (default 2)
+    INVENTORY_WATCH_DEBOUNCE_SECONDS    - Watch mode: coalesce changes for this long before pushing (default 3)
 """
 
 import sys
 import os
-from typing import List, Dict, Optional
-from datetime import datetime
+import hashlib
+import json
+import time
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Set, Tuple
+from datetime import datetime, timedelta
 
 # Add project root to path
 project_root = os.path.dirname(os.path.abspath(__file__))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from database import get_connection, connection_ctx
-from woo_client import WooClient
+from database import (
+    get_connection, connection_ctx, iter_query, run_query, bulk_merge,
+    get_sync_watermark, set_sync_watermark,
+)
+from config import get_setting
+from woo_client import PRODUCT_STOCK_FIELDS, WooClient, get_client
 from data_utils import sanitize_string
 
 
+# Rows per bulk stock read and per /products/batch update (WooCommerce caps both at 100)
+INVENTORY_BATCH_SIZE = 100
+
+# USER_SYNC_WATERMARK.SYNC_NAME for incremental inventory extraction
+WATERMARK_NAME = 'inventory_sync'
+
+# Failed SKUs are re-queued this many times; after that the scheduled sync picks them up
+WATCH_MAX_RETRIES = 3
+# Longest pause between polls while the database or Woo keeps failing
+WATCH_MAX_BACKOFF_SECONDS = 60.0
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # SQL QUERIES
 # ─────────────────────────────────────────────────────────────────────────────
@@ -38,7 +74,9 @@ SELECT
     WOO_PRODUCT_ID,
     STOCK_QTY,
     CP_STATUS,
-    IS_ECOMM_ITEM
+    IS_ECOMM_ITEM,
+    ITEM_LAST_MODIFIED,
+    INVENTORY_LAST_MODIFIED
 FROM dbo.VI_INVENTORY_SYNC
 ORDER BY SKU;
 """
@@ -49,11 +87,56 @@ SELECT
     WOO_PRODUCT_ID,
     STOCK_QTY,
     CP_STATUS,
-    IS_ECOMM_ITEM
+    IS_ECOMM_ITEM,
+    ITEM_LAST_MODIFIED,
+    INVENTORY_LAST_MODIFIED
 FROM dbo.VI_INVENTORY_SYNC
 WHERE SKU = ?;
 """
 
+GET_INVENTORY_BY_SKUS_SQL = """
+SELECT 
+    SKU,
+    WOO_PRODUCT_ID,
+    STOCK_QTY,
+    CP_STATUS,
+    IS_ECOMM_ITEM,
+    ITEM_LAST_MODIFIED,
+    INVENTORY_LAST_MODIFIED
+FROM dbo.VI_INVENTORY_SYNC
+WHERE SKU IN ({placeholders})
+ORDER BY SKU;
+"""
+
+# Changed SKUs are found on the base tables first, so the view only
+# aggregates IM_INV for those items (the SKU predicate is on its GROUP BY key)
+GET_INVENTORY_CHANGED_SQL = """
+WITH changed AS (
+    SELECT ITEM_NO FROM dbo.IM_ITEM WHERE LST_MAINT_DT >= ?
+    UNION
+    SELECT ITEM_NO FROM dbo.IM_INV WHERE LST_MAINT_DT >= ?
+    UNION
+    SELECT SKU FROM dbo.USER_PRODUCT_MAP
+    WHERE IS_ACTIVE = 1 AND ISNULL(UPDATED_DT, CREATED_DT) >= ?
+)
+SELECT 
+    v.SKU,
+    v.WOO_PRODUCT_ID,
+    v.STOCK_QTY,
+    v.CP_STATUS,
+    v.IS_ECOMM_ITEM,
+    v.ITEM_LAST_MODIFIED,
+    v.INVENTORY_LAST_MODIFIED
+FROM dbo.VI_INVENTORY_SYNC v
+WHERE v.SKU IN (SELECT ITEM_NO FROM changed)
+ORDER BY v.SKU;
+"""
+
+GET_PUSH_STATE_SQL = """
+SELECT SKU, LAST_HASH
+FROM dbo.USER_INVENTORY_PUSH_STATE;
+"""
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # HELPER FUNCTIONS
@@ -76,6 +159,11 @@ def calculate_stock_status(stock_qty: float) -> tuple[str, float]:
         return ('onbackorder', 0)  # Display as 0, but status shows "On Order"
 
 
+def inventory_state_hash(woo_product_id: int, stock_qty: float, stock_status: str) -> str:
+    """SHA-1 of what a push would set in WooCommerce (USER_INVENTORY_PUSH_STATE.LAST_HASH)."""
+    return hashlib.sha1(f"{int(woo_product_id)}|{int(stock_qty)}|{stock_status}".encode()).hexdigest()
+
+
 def prepare_inventory_payload(woo_product_id: int, stock_qty: float, stock_status: str) -> Dict:
     """
     Prepare WooCommerce API payload for inventory update.
@@ -100,6 +188,59 @@ def prepare_inventory_payload(woo_product_id: int, stock_qty: float, stock_statu
 # SYNC FUNCTIONS
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _inventory_record(row) -> Dict:
+    return {
+        'SKU': row.SKU,
+        'STOCK_QTY': float(row.STOCK_QTY) if row.STOCK_QTY is not None else 0.0,
+        'CP_STATUS': row.CP_STATUS,
+        'IS_ECOMM_ITEM': row.IS_ECOMM_ITEM,
+        'WOO_PRODUCT_ID': row.WOO_PRODUCT_ID,
+        'LAST_MODIFIED': max((d for d in (row.ITEM_LAST_MODIFIED, row.INVENTORY_LAST_MODIFIED) if d), default=None),
+    }
+
+
+def iter_inventory(sku_filter: Optional[str] = None, batch_size: int = 100, conn=None,
+                   changed_since: Optional[datetime] = None) -> Iterator[List[Dict]]:
+    """
+    Stream inventory data from CounterPoint in batches.
+    
+    Batches are yielded as they come off the cursor, so WooCommerce updates for
+    the first SKUs can start while the rest of VI_INVENTORY_SYNC is still streaming.
+    
+    Args:
+        sku_filter: Optional SKU to filter by
+        batch_size: Rows per batch
+        conn: Optional connection to stream on (defaults to a pooled connection)
+        changed_since: Only SKUs whose item, inventory or mapping rows changed
+            at or after this time (ignored with sku_filter)
+    
+    Yields:
+        Lists of inventory records with SKU, stock quantity, and WooCommerce product ID
+    """
+    if sku_filter:
+        sql, params = GET_INVENTORY_BY_SKU_SQL, (sku_filter,)
+    elif changed_since is not None:
+        sql, params = GET_INVENTORY_CHANGED_SQL, (changed_since, changed_since, changed_since)
+    else:
+        sql, params = GET_INVENTORY_SQL, ()
+    
+    for rows in iter_query(sql, params, batch_size=batch_size, row_type="namedtuple", batches=True, conn=conn):
+        yield [_inventory_record(row) for row in rows]
+
+
+def fetch_inventory_for_skus(skus: Iterable[str]) -> List[Dict]:
+    """Current VI_INVENTORY_SYNC rows for specific SKUs (unmapped/non-ecomm SKUs are absent)."""
+    skus = sorted(set(skus))
+    rows = []
+    for i in range(0, len(skus), INVENTORY_BATCH_SIZE):
+        chunk = skus[i:i + INVENTORY_BATCH_SIZE]
+        sql = GET_INVENTORY_BY_SKUS_SQL.format(placeholders=", ".join("?" for _ in chunk))
+        for batch in iter_query(sql, tuple(chunk), batch_size=INVENTORY_BATCH_SIZE,
+                                row_type="namedtuple", batches=True):
+            rows.extend(_inventory_record(row) for row in batch)
+    return rows
+
+
 def fetch_inventory(conn, sku_filter: Optional[str] = None) -> List[Dict]:
     """
     Fetch inventory data from CounterPoint.
@@ -111,40 +252,294 @@ def fetch_inventory(conn, sku_filter: Optional[str] = None) -> List[Dict]:
     Returns:
         List of inventory records with SKU, stock quantity, and WooCommerce product ID
     """
-    cursor = conn.cursor()
+    inventory = []
+    for batch in iter_inventory(sku_filter, conn=conn):
+        inventory.extend(batch)
+    return inventory
+
+
+def _error_extra(resp) -> List[str]:
+    """Detail lines for a failed WooCommerce response."""
+    error_text = resp.text[:300] if resp.text else "No error message"
+    extra = [f"  Error response: {error_text}"]
+    # Try to get more details
+    try:
+        error_json = resp.json()
+        if 'message' in error_json:
+            extra.append(f"  Error message: {error_json['message']}")
+    except:
+        pass
+    return extra
+
+
+def load_push_state() -> Dict[str, str]:
+    """
+    Last pushed state hash per SKU from USER_INVENTORY_PUSH_STATE.
     
+    Returns {} when the table is missing or unreadable, so every SKU is
+    compared against WooCommerce as before.
+    """
+    return {row['SKU']: row['LAST_HASH'] for row in run_query(GET_PUSH_STATE_SQL)}
+
+
+def save_push_state(items: List[Dict], verified: bool = False) -> None:
+    """Record the stock just pushed to (or confirmed in) WooCommerce for items."""
+    rows = []
+    for item in items:
+        stock_status, display_qty = calculate_stock_status(item['STOCK_QTY'])
+        rows.append({
+            'SKU': item['SKU'],
+            'WOO_PRODUCT_ID': item['WOO_PRODUCT_ID'],
+            'LAST_QTY': int(display_qty),
+            'LAST_STATUS': stock_status,
+            'LAST_HASH': inventory_state_hash(item['WOO_PRODUCT_ID'], display_qty, stock_status),
+        })
+    stamps = {'PUSHED_DT': 'SYSDATETIME()'}
+    if verified:
+        stamps['VERIFIED_DT'] = 'SYSDATETIME()'
     try:
-        if sku_filter:
-            cursor.execute(GET_INVENTORY_BY_SKU_SQL, (sku_filter,))
-        else:
-            cursor.execute(GET_INVENTORY_SQL)
+        bulk_merge(
+            "dbo.USER_INVENTORY_PUSH_STATE",
+            key_cols=['SKU'],
+            rows=rows,
+            update_extra=stamps,
+            insert_extra=stamps,
+        )
+    except Exception as e:
+        # Not fatal: these SKUs are simply compared against Woo again next run
+        print(f"  [WARN] Could not save inventory push state for {len(rows)} SKU(s): {e}")
+
+
+def _push_inventory_batch(client: WooClient, batch: List[Dict], dry_run: bool,
+                          compare: bool = True) -> List[Tuple[str, str, str, List[str]]]:
+    """
+    Compare one batch of CP inventory rows with WooCommerce and update the changed ones.
+    
+    Current Woo stock for the whole batch is read with one ?include= list
+    (projected to id/stock fields), compared locally, and only changed rows
+    are sent in a single /products/batch update. With compare=False the
+    read is skipped and every row is pushed (the caller already knows they
+    changed). Batches must not exceed INVENTORY_BATCH_SIZE rows
+    (WooCommerce's per_page and batch limit).
+    
+    Runs on WooClient worker threads, so it only returns what to print.
+    
+    Returns:
+        One (outcome, display_status, action, extra_lines) per row, in batch
+        order, where outcome is 'updated', 'skipped' or 'error'.
+    """
+    results: List[Optional[Tuple[str, str, str, List[str]]]] = [None] * len(batch)
+    payloads = []
+    for item in batch:
+        stock_status, display_qty = calculate_stock_status(item['STOCK_QTY'])
+        payloads.append((stock_status, display_qty, prepare_inventory_payload(item['WOO_PRODUCT_ID'], display_qty, stock_status)))
+    
+    if dry_run:
+        # Count as would-be update in dry-run
+        return [('updated', stock_status, "WOULD UPDATE", []) for stock_status, _, _ in payloads]
+    
+    if not compare:
+        return _send_inventory_updates(client, payloads, list(range(len(batch))), results)
+    
+    try:
+        # Bulk-read current stock for every product in the batch: one GET,
+        # since a batch never holds more IDs than fit on a page
+        ids = sorted({int(item['WOO_PRODUCT_ID']) for item in batch})
+        current = {
+            product['id']: product
+            for product in client.get_items(
+                "/products",
+                {"include": ",".join(str(woo_id) for woo_id in ids)},
+                per_page=INVENTORY_BATCH_SIZE,
+                fields=PRODUCT_STOCK_FIELDS,
+            )
+        }
+    except Exception as e:
+        error = ('error', 'ERROR', f"ERROR: {str(e)[:30]}", [f"  Exception: {e}"])
+        return [error] * len(batch)
+    
+    changed = []  # indexes into batch
+    for index, (item, (stock_status, display_qty, _)) in enumerate(zip(batch, payloads)):
+        woo_id = item['WOO_PRODUCT_ID']
+        product_data = current.get(int(woo_id))
+        if product_data is None:
+            results[index] = ('error', 'ERROR', f"ERROR: Product {woo_id} not found", [])
+            continue
         
-        rows = cursor.fetchall()
+        # Check if stock actually changed
+        current_woo_stock = float(product_data.get('stock_quantity', 0) or 0)
+        current_woo_status = product_data.get('stock_status', 'outofstock')
         
-        # Convert to list of dicts
-        inventory = []
-        for row in rows:
-            inventory.append({
-                'SKU': row.SKU,
-                'STOCK_QTY': float(row.STOCK_QTY) if row.STOCK_QTY is not None else 0.0,
-                'CP_STATUS': row.CP_STATUS,
-                'IS_ECOMM_ITEM': row.IS_ECOMM_ITEM,
-                'WOO_PRODUCT_ID': row.WOO_PRODUCT_ID
-            })
+        # Compare stock quantity and status
+        stock_changed = abs(current_woo_stock - display_qty) > 0.01  # Allow small floating point differences
+        status_changed = current_woo_status != stock_status
         
-        return inventory
+        if not stock_changed and not status_changed:
+            # Stock hasn't changed, skip update
+            results[index] = ('skipped', stock_status, "SKIPPED (no change)", [])
+        else:
+            changed.append(index)
     
-    finally:
-        cursor.close()
+    return _send_inventory_updates(client, payloads, changed, results)
 
 
-def sync_inventory(dry_run: bool = True, sku_filter: Optional[str] = None) -> tuple[int, int, int]:
+def _send_inventory_updates(client: WooClient, payloads: List[Tuple[str, float, Dict]], changed: List[int],
+                            results: List[Optional[Tuple[str, str, str, List[str]]]]) -> List[Tuple[str, str, str, List[str]]]:
+    """
+    Push payloads[changed] as /products/batch updates and fill in their results.
+    
+    Requests are sized by client.batcher (shared with the product sync), so
+    a slow or failing store gets smaller batches and the sizes are logged.
+    """
+    url = client._url("/products/batch")
+    item_bytes = [len(json.dumps(payloads[index][2], separators=(',', ':'))) for index in changed]
+    start = 0
+    while start < len(changed):
+        size = client.batcher.take(item_bytes[start:])
+        part = changed[start:start + size]
+        started = time.monotonic()
+        ok = False
+        try:
+            resp = client.session.post(url, json={"update": [payloads[index][2] for index in part]}, timeout=120)
+            if resp.ok:
+                ok = True
+                updates = resp.json().get('update', [])
+                for position, index in enumerate(part):
+                    stock_status = payloads[index][0]
+                    entry = updates[position] if position < len(updates) else {}
+                    error = entry.get('error') if isinstance(entry, dict) else None
+                    if entry and not error:
+                        results[index] = ('updated', stock_status, "UPDATED", [])
+                    else:
+                        message = (error or {}).get('message', 'missing from batch response')
+                        results[index] = ('error', stock_status, "ERROR: batch item", [f"  Error message: {message}"])
+            else:
+                extra = _error_extra(resp)
+                for index in part:
+                    results[index] = ('error', payloads[index][0], f"ERROR: {resp.status_code}", extra)
+        except Exception as e:
+            import traceback
+            extra = [f"  Exception: {e}", traceback.format_exc().rstrip()]
+            for index in part:
+                results[index] = ('error', 'ERROR', f"ERROR: {str(e)[:30]}", extra)
+        client.batcher.record(len(part), time.monotonic() - started, ok)
+        start += size
+    
+    return results
+
+
+def _sync_batches(client: WooClient, batches: List[List[Dict]], dry_run: bool, push_state: Dict[str, str],
+                  counts: Dict[str, int], verify: bool = False) -> List[str]:
+    """
+    Push up to client.max_concurrency batches, print one line per row and record push state.
+    
+    Rows are split by push_state: unchanged since the last push are skipped
+    locally, changed ones are pushed without a read, unknown ones are compared
+    with live Woo stock first. counts and (on live runs) push_state are
+    updated in place.
+    
+    Returns:
+        SKUs whose push failed
+    """
+    batch_results = []
+    jobs = []  # (rows, compare, batch_results index, row indexes)
+    for batch_no, batch in enumerate(batches):
+        results = [None] * len(batch)
+        unpushed, compare = [], []
+        for index, item in enumerate(batch):
+            stock_status, display_qty = calculate_stock_status(item['STOCK_QTY'])
+            last_hash = push_state.get(item['SKU'])
+            if last_hash is None:
+                compare.append(index)
+            elif last_hash == inventory_state_hash(item['WOO_PRODUCT_ID'], display_qty, stock_status):
+                results[index] = ('skipped', stock_status, "SKIPPED (unchanged)", [])
+            else:
+                unpushed.append(index)
+        for indexes, needs_compare in ((unpushed, False), (compare, True)):
+            if indexes:
+                jobs.append(([batch[i] for i in indexes], needs_compare, batch_no, indexes))
+        batch_results.append(results)
+    
+    outcomes = client.map_concurrent(
+        lambda job: _push_inventory_batch(client, job[0], dry_run, compare=job[1]), jobs
+    )
+    for (_, _, batch_no, indexes), job_results in zip(jobs, outcomes):
+        for index, result in zip(indexes, job_results):
+            batch_results[batch_no][index] = result
+    
+    confirmed = []  # rows now known to match WooCommerce
+    failed = []
+    for batch_no, batch in enumerate(batches):
+        for item, (outcome, status, action, extra) in zip(batch, batch_results[batch_no]):
+            counts[outcome] += 1
+            if outcome == 'error':
+                failed.append(item['SKU'])
+            if outcome != 'error' and (outcome == 'updated' or item['SKU'] not in push_state):
+                confirmed.append(item)
+            print(f"{item['SKU']:<20} {item['WOO_PRODUCT_ID']:<10} {item['STOCK_QTY']:>10.2f}    {status:<15} {action:<10}")
+            for line in extra:
+                print(line)
+    if confirmed and not dry_run:
+        save_push_state(confirmed, verified=verify)
+        for item in confirmed:
+            stock_status, display_qty = calculate_stock_status(item['STOCK_QTY'])
+            push_state[item['SKU']] = inventory_state_hash(item['WOO_PRODUCT_ID'], display_qty, stock_status)
+    return failed
+
+
+def _watermark_overlap() -> timedelta:
+    return timedelta(minutes=int(get_setting('INVENTORY_WATERMARK_OVERLAP_MINUTES', '10')))
+
+
+def _incremental_start(full: bool) -> Tuple[Optional[datetime], bool]:
+    """
+    Decide where this run reads from.
+    
+    Returns (changed_since, is_full): changed_since is the stored high-water
+    mark minus INVENTORY_WATERMARK_OVERLAP_MINUTES, or None for a full run (no
+    mark yet, --full, or the last full run is older than
+    INVENTORY_FULL_SYNC_HOURS).
+    """
+    if full:
+        return None, True
+    mark = get_sync_watermark(WATERMARK_NAME)
+    if mark.high_water_mark is None:
+        print("No inventory watermark yet - full run")
+        return None, True
+    full_interval = timedelta(hours=float(get_setting('INVENTORY_FULL_SYNC_HOURS', '24')))
+    if mark.last_full_run is None or datetime.now() - mark.last_full_run >= full_interval:
+        print(f"Last full inventory run older than {full_interval} - full run")
+        return None, True
+    return mark.high_water_mark - _watermark_overlap(), False
+
+
+def sync_inventory(dry_run: bool = True, sku_filter: Optional[str] = None,
+                   verify: bool = False, full: bool = False) -> tuple[int, int, int]:
     """
     Sync inventory levels from CounterPoint to WooCommerce.
     
+    Each row is first checked against USER_INVENTORY_PUSH_STATE:
+      - same stock as last pushed: skipped locally, no HTTP call
+      - changed since last push: pushed directly (no read)
+      - never pushed: compared with live Woo stock, pushed only if different
+    
+    Only SKUs changed since the stored watermark are read unless this is a
+    full run (--full, --verify, no watermark yet, or INVENTORY_FULL_SYNC_HOURS
+    elapsed). A live run advances the watermark to the newest row read, or to
+    just before the oldest failed row so failures are re-read next run; a
+    completed full run is recorded even if some SKUs failed.
+    
+    Inventory streams in batches of INVENTORY_BATCH_SIZE; each batch costs at
+    most one bulk stock read (a single GET) plus one /products/batch update,
+    and up to WOO_MAX_CONCURRENCY batches are in flight at once. Results are printed in
+    CounterPoint order.
+    
     Args:
         dry_run: If True, don't actually update WooCommerce
         sku_filter: Optional SKU to sync (for testing)
+        verify: Ignore the push state and compare every SKU with live Woo
+            stock, to catch drift (e.g. stock edited in the Woo admin)
+        full: Ignore the watermark and read every SKU
     
     Returns:
         (updated, skipped, errors)
@@ -153,109 +548,282 @@ def sync_inventory(dry_run: bool = True, sku_filter: Optional[str] = None) -> tu
     print(f"{'DRY RUN - ' if dry_run else ''}Inventory Sync: CounterPoint -> WooCommerce")
     print(f"{'='*60}")
     
-    # Get inventory from CounterPoint
-    with connection_ctx() as conn:
-        inventory = fetch_inventory(conn, sku_filter)
+    # Get WooCommerce client
+    client = get_client()
     
-    if not inventory:
-        print("No inventory records found to sync.")
-        return 0, 0, 0
+    changed_since, is_full = (None, False) if sku_filter else _incremental_start(full or verify)
+    if changed_since is not None:
+        print(f"Incremental run: SKUs changed since {changed_since:%Y-%m-%d %H:%M:%S} "
+              f"(watermark minus {_watermark_overlap()})")
     
-    print(f"Found {len(inventory)} products with inventory data")
+    push_state = {} if verify else load_push_state()
+    if verify:
+        print("Verify mode: comparing every SKU with live WooCommerce stock")
+    else:
+        print(f"Loaded last pushed state for {len(push_state)} SKU(s)")
     
-    # Get WooCommerce client
-    client = WooClient()
+    counts = {'updated': 0, 'skipped': 0, 'error': 0}
+    total = 0
+    batches_before = len(client.batcher.history)
+    high_water_mark = None
+    oldest_failed = None   # LAST_MODIFIED of the oldest row that failed to push
+    failed_undated = False  # a failed row without LAST_MODIFIED pins the mark
+    pending: List[List[Dict]] = []
+    
+    def flush():
+        nonlocal oldest_failed, failed_undated
+        failed = set(_sync_batches(client, pending, dry_run, push_state, counts, verify=verify))
+        for batch in pending:
+            for item in batch:
+                if item['SKU'] not in failed:
+                    continue
+                if item['LAST_MODIFIED'] is None:
+                    failed_undated = True
+                elif oldest_failed is None or item['LAST_MODIFIED'] < oldest_failed:
+                    oldest_failed = item['LAST_MODIFIED']
+        pending.clear()
     
-    updated = 0
-    skipped = 0
-    errors = 0
+    # Stream inventory from CounterPoint; updates start with the first batches
+    for batch in iter_inventory(sku_filter, batch_size=INVENTORY_BATCH_SIZE, changed_since=changed_since):
+        for item in batch:
+            if item['LAST_MODIFIED'] and (high_water_mark is None or item['LAST_MODIFIED'] > high_water_mark):
+                high_water_mark = item['LAST_MODIFIED']
+        if total == 0:
+            print(f"\n{'SKU':<20} {'Woo ID':<10} {'CP Stock':<12} {'Woo Status':<15} {'Action':<10}")
+            print("-" * 80)
+        total += len(batch)
+        pending.append(batch)
+        if len(pending) >= client.max_concurrency:
+            flush()
+    if pending:
+        flush()
     
-    print(f"\n{'SKU':<20} {'Woo ID':<10} {'CP Stock':<12} {'Woo Status':<15} {'Action':<10}")
-    print("-" * 80)
+    updated, skipped, errors = counts['updated'], counts['skipped'], counts['error']
     
-    for item in inventory:
-        sku = item['SKU']
-        woo_id = item['WOO_PRODUCT_ID']
-        stock_qty = item['STOCK_QTY']
-        
-        # Calculate stock status
-        stock_status, display_qty = calculate_stock_status(stock_qty)
-        
-        # Prepare payload
-        payload = prepare_inventory_payload(woo_id, display_qty, stock_status)
-        
-        # Update WooCommerce
+    # Failed SKUs must be re-read next run: hold the mark just before the
+    # oldest of them (None keeps the stored mark). The rest still advance it,
+    # and a full run that completed is recorded either way.
+    if failed_undated:
+        high_water_mark = None
+    elif oldest_failed is not None and high_water_mark is not None:
+        high_water_mark = min(high_water_mark, oldest_failed - timedelta(microseconds=1))
+    if not dry_run and not sku_filter:
         try:
-            if not dry_run:
-                # First, verify product exists and get current stock
-                url = client._url(f"/products/{woo_id}")
-                get_resp = client.session.get(url, timeout=30)
-                
-                if not get_resp.ok:
-                    errors += 1
-                    action = f"ERROR: Product {woo_id} not found ({get_resp.status_code})"
-                    print(f"{sku:<20} {woo_id:<10} {stock_qty:>10.2f}    {'ERROR':<15} {action:<10}")
-                    continue
-                
-                # Check if stock actually changed
-                product_data = get_resp.json()
-                current_woo_stock = float(product_data.get('stock_quantity', 0) or 0)
-                current_woo_status = product_data.get('stock_status', 'outofstock')
-                
-                # Compare stock quantity and status
-                stock_changed = abs(current_woo_stock - display_qty) > 0.01  # Allow small floating point differences
-                status_changed = current_woo_status != stock_status
-                
-                if not stock_changed and not status_changed:
-                    # Stock hasn't changed, skip update
-                    skipped += 1
-                    action = "SKIPPED (no change)"
-                    print(f"{sku:<20} {woo_id:<10} {stock_qty:>10.2f}    {stock_status:<15} {action:<10}")
-                    continue
-                
-                # Stock changed, update product inventory using PUT
-                resp = client.session.put(url, json=payload, timeout=30)
-                
-                if resp.ok:
-                    updated += 1
-                    action = "UPDATED"
-                else:
-                    errors += 1
-                    action = f"ERROR: {resp.status_code}"
-                    error_text = resp.text[:300] if resp.text else "No error message"
-                    print(f"  Error response: {error_text}")
-                    # Try to get more details
-                    try:
-                        error_json = resp.json()
-                        if 'message' in error_json:
-                            print(f"  Error message: {error_json['message']}")
-                    except:
-                        pass
-            else:
-                updated += 1  # Count as would-be update in dry-run
-                action = "WOULD UPDATE"
-            
-            print(f"{sku:<20} {woo_id:<10} {stock_qty:>10.2f}    {stock_status:<15} {action:<10}")
-        
+            set_sync_watermark(WATERMARK_NAME, high_water_mark, full_run=is_full)
         except Exception as e:
-            errors += 1
-            action = f"ERROR: {str(e)[:30]}"
-            print(f"{sku:<20} {woo_id:<10} {stock_qty:>10.2f}    {'ERROR':<15} {action:<10}")
-            if not dry_run:
-                print(f"  Exception: {e}")
-                import traceback
-                traceback.print_exc()
+            print(f"  [WARN] Could not save inventory watermark: {e}")
+    
+    if total == 0:
+        print("No inventory records found to sync.")
+        return 0, 0, 0
     
     print(f"\n{'='*60}")
     print(f"Summary:")
+    print(f"  Products with inventory data: {total}")
     print(f"  Updated: {updated}")
     print(f"  Skipped: {skipped}")
     print(f"  Errors: {errors}")
+    batch_sizes = client.batcher.describe(limit=120, start=batches_before)
+    if batch_sizes:
+        print(f"  Batch sizes: {batch_sizes}")
     print(f"{'='*60}")
     
     return updated, skipped, errors
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# WATCH MODE (SQL Server Change Tracking)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class ChangeTrackingExpired(Exception):
+    """The saved Change Tracking version is older than the retention window."""
+
+
+class InventoryChangeSource:
+    """
+    Changed ITEM_NOs from SQL Server Change Tracking on IM_INV and IM_ITEM.
+    
+    Requires 01_Production/enable_inventory_change_tracking.sql. Anything with
+    the same current_version()/changes_since() shape can stand in for it
+    (the tests use an in-memory change stream).
+    """
+    
+    CURRENT_VERSION_SQL = "SELECT CHANGE_TRACKING_CURRENT_VERSION() AS VERSION;"
+    MIN_VALID_VERSION_SQL = """
+        SELECT CASE
+            WHEN CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('dbo.IM_INV'))
+               > CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('dbo.IM_ITEM'))
+            THEN CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('dbo.IM_INV'))
+            ELSE CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('dbo.IM_ITEM'))
+        END AS MIN_VERSION;
+    """
+    CHANGES_SQL = """
+        SELECT ct.ITEM_NO FROM CHANGETABLE(CHANGES dbo.IM_INV, ?) AS ct
+        UNION
+        SELECT ct.ITEM_NO FROM CHANGETABLE(CHANGES dbo.IM_ITEM, ?) AS ct;
+    """
+    
+    # iter_query raises database errors (run_query would turn them into "no
+    # rows", i.e. "nothing changed", and the version would move past them)
+    
+    def _current_version(self, conn) -> int:
+        rows = list(iter_query(self.CURRENT_VERSION_SQL, conn=conn))
+        if not rows or rows[0]['VERSION'] is None:
+            raise RuntimeError("Change Tracking is not enabled (run enable_inventory_change_tracking.sql)")
+        return int(rows[0]['VERSION'])
+    
+    def current_version(self) -> int:
+        with connection_ctx() as conn:
+            return self._current_version(conn)
+    
+    def changes_since(self, version: int) -> Tuple[int, Set[str]]:
+        """
+        Return (new_version, item_nos changed after version).
+        
+        The new version is read before the changes, so a change committed
+        in between is reported again next time rather than lost.
+        
+        Raises:
+            ChangeTrackingExpired: version fell out of the retention window.
+            pyodbc.Error: a query failed; the caller keeps its old version.
+        """
+        with connection_ctx() as conn:
+            new_version = self._current_version(conn)
+            if new_version == version:
+                return version, set()
+            rows = list(iter_query(self.MIN_VALID_VERSION_SQL, conn=conn))
+            if rows and rows[0]['MIN_VERSION'] is not None and version < int(rows[0]['MIN_VERSION']):
+                raise ChangeTrackingExpired(f"version {version} < min valid {rows[0]['MIN_VERSION']}")
+            changed = {row['ITEM_NO'] for row in iter_query(self.CHANGES_SQL, (version, version), conn=conn)}
+        return new_version, changed
+
+
+def watch_inventory(dry_run: bool = True, source=None, client: Optional[WooClient] = None,
+                    fetch_rows: Callable[[Iterable[str]], List[Dict]] = fetch_inventory_for_skus,
+                    poll_seconds: Optional[float] = None, debounce_seconds: Optional[float] = None,
+                    should_stop: Callable[[], bool] = lambda: False, resync: Optional[Callable[[], object]] = None,
+                    clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+                    ) -> Dict[str, int]:
+    """
+    Push inventory changes in near real time until should_stop() is true.
+    
+    Change Tracking is polled every poll_seconds. Changed SKUs are coalesced
+    for debounce_seconds from the first change (or until a full
+    INVENTORY_BATCH_SIZE micro-batch is waiting), re-read from
+    VI_INVENTORY_SYNC, and pushed through the same push-state / batch logic as
+    sync_inventory. If the tracked version expires (watcher down longer than
+    the retention window) a catch-up sync_inventory run is made and watching
+    resumes from the current version. A failed poll, catch-up or push is
+    logged and retried after a backoff (up to WATCH_MAX_BACKOFF_SECONDS);
+    the version and pending SKUs are kept, so nothing is skipped.
+    
+    Args:
+        dry_run: If True, don't actually update WooCommerce
+        source: Change source (default: InventoryChangeSource)
+        client: WooClient (default: shared client)
+        fetch_rows: SKUs -> inventory records (default: VI_INVENTORY_SYNC)
+        poll_seconds / debounce_seconds: Default to INVENTORY_WATCH_POLL_SECONDS
+            and INVENTORY_WATCH_DEBOUNCE_SECONDS
+        resync: Catch-up run on start and after expiry (default: incremental sync_inventory)
+        should_stop / clock / sleep: Loop control, injectable for tests
+    
+    Returns:
+        Counters: updated, skipped, error, pushes (micro-batches), resyncs
+    """
+    source = source or InventoryChangeSource()
+    client = client or get_client()
+    if poll_seconds is None:
+        poll_seconds = float(get_setting('INVENTORY_WATCH_POLL_SECONDS', '2'))
+    if debounce_seconds is None:
+        debounce_seconds = float(get_setting('INVENTORY_WATCH_DEBOUNCE_SECONDS', '3'))
+    if resync is None:
+        resync = lambda: sync_inventory(dry_run=dry_run)
+    counts = {'updated': 0, 'skipped': 0, 'error': 0, 'pushes': 0, 'resyncs': 0}
+    
+    # Take the version first, then catch up, so nothing between the two is missed
+    version = source.current_version()
+    resync()
+    push_state = {} if dry_run else load_push_state()
+    print(f"\nWatching IM_INV/IM_ITEM from Change Tracking version {version} "
+          f"(poll {poll_seconds}s, debounce {debounce_seconds}s)")
+    
+    pending: Set[str] = set()
+    retries: Dict[str, int] = {}
+    window_started = 0.0
+    failures = 0
+    
+    def back_off(what: str, exc: Exception) -> None:
+        nonlocal failures
+        failures += 1
+        delay = min(poll_seconds * 2 ** failures, WATCH_MAX_BACKOFF_SECONDS)
+        print(f"[WARN] {what} failed ({exc}); retrying in {delay:.0f}s")
+        sleep(delay)
+    
+    while not should_stop():
+        try:
+            version, changed = source.changes_since(version)
+        except ChangeTrackingExpired as e:
+            print(f"[WARN] Change Tracking gap ({e}); running catch-up sync")
+            try:
+                new_version = source.current_version()
+                resync()
+            except Exception as exc:
+                back_off("Catch-up sync", exc)
+                continue
+            version = new_version
+            counts['resyncs'] += 1
+            pending.clear()
+            if not dry_run:
+                push_state = load_push_state()
+            continue
+        except Exception as e:
+            back_off("Change Tracking poll", e)
+            continue
+        
+        if changed:
+            if not pending:
+                window_started = clock()
+            pending |= changed
+        
+        if pending and (clock() - window_started >= debounce_seconds or len(pending) >= INVENTORY_BATCH_SIZE):
+            skus, pending = pending, set()
+            try:
+                rows = fetch_rows(skus)
+            except Exception as e:
+                pending |= skus
+                back_off("Inventory read", e)
+                continue
+            failures = 0
+            if rows:
+                counts['pushes'] += 1
+                print(f"\n[{datetime.now():%H:%M:%S}] Pushing {len(rows)} changed SKU(s)")
+                batches = [rows[i:i + INVENTORY_BATCH_SIZE] for i in range(0, len(rows), INVENTORY_BATCH_SIZE)]
+                failed = []
+                for start in range(0, len(batches), client.max_concurrency):
+                    failed += _sync_batches(client, batches[start:start + client.max_concurrency],
+                                            dry_run, push_state, counts)
+                for sku in skus - set(failed):
+                    retries.pop(sku, None)
+                for sku in failed:
+                    retries[sku] = retries.get(sku, 0) + 1
+                    if retries[sku] <= WATCH_MAX_RETRIES:
+                        pending.add(sku)
+                    else:
+                        print(f"  [WARN] Giving up on {sku} after {WATCH_MAX_RETRIES} retries")
+                        retries.pop(sku)
+                if pending:
+                    window_started = clock()
+            continue
+        
+        failures = 0
+        if pending:
+            sleep(max(0.0, min(poll_seconds, debounce_seconds - (clock() - window_started))))
+        else:
+            sleep(poll_seconds)
+    
+    return counts
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # MAIN
 # ─────────────────────────────────────────────────────────────────────────────
@@ -264,15 +832,25 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Sync inventory from CounterPoint to WooCommerce')
-    parser.add_argument('action', choices=['sync'], help='Action to perform')
+    parser.add_argument('action', choices=['sync', 'watch'], help='Action to perform')
     parser.add_argument('--apply', action='store_true', help='Actually update WooCommerce (default: dry-run)')
     parser.add_argument('--sku', type=str, help='Sync specific SKU only (for testing)')
+    parser.add_argument('--full', action='store_true', help='Ignore the watermark and read every SKU')
+    parser.add_argument('--verify', action='store_true',
+                        help='Ignore last pushed state and reconcile every SKU against live WooCommerce (run periodically)')
     
     args = parser.parse_args()
     
+    if args.action == 'watch':
+        try:
+            watch_inventory(dry_run=not args.apply)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        return 0
+    
     if args.action == 'sync':
         dry_run = not args.apply
-        updated, skipped, errors = sync_inventory(dry_run=dry_run, sku_filter=args.sku)
+        updated, skipped, errors = sync_inventory(dry_run=dry_run, sku_filter=args.sku, verify=args.verify, full=args.full)
         
         if dry_run:
             print("\n[!] DRY RUN - No changes made to WooCommerce")
@@ -5,19 +5,27 @@ This pulls orders from WooCommerce and stages them for import into CounterPoint.
 Orders go into USER_ORDER_STAGING for review before creating in PS_DOC_HDR.
 
 Usage:
-    python woo_orders.py list                  # List recent Woo orders
+    python woo_orders.py list                  # List the 50 most recent Woo orders
+    python woo_orders.py list --all            # List every Woo order in the --days window
     python woo_orders.py pull                  # Pull new orders to staging (dry-run)
     python woo_orders.py pull --apply          # Pull new orders to staging (live)
     python woo_orders.py pull --days 7         # Pull orders from last 7 days
+    python woo_orders.py pull --incremental --apply  # Only orders modified since the last pull
     python woo_orders.py status 12345          # Check status of a specific order
 """
 
 import sys
 import json
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Iterable, List, Dict, Optional, Set, Tuple
 
-from database import run_query, get_connection
+import requests
+
+from database import (
+    run_query, connection_ctx, iter_query, bulk_insert, bulk_merge, BulkInsertError,
+    get_sync_watermark, set_sync_watermark,
+)
+from config import get_setting
 from woo_client import WooClient
 from data_utils import (
     sanitize_string, sanitize_amount, normalize_phone,
@@ -26,6 +34,15 @@ from data_utils import (
 )
 
 
+# USER_SYNC_WATERMARK.SYNC_NAME for incremental pulls; the mark is the newest
+# date_modified_gmt pulled, and each pull re-reads ORDER_PULL_OVERLAP_MINUTES
+# before it (orders already staged are skipped by the duplicate check)
+ORDER_WATERMARK_NAME = 'woo_order_pull'
+
+# Keys per set-based IN-list lookup (SQL Server allows 2100 parameters)
+LOOKUP_CHUNK = 1000
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # SQL QUERIES
 # ─────────────────────────────────────────────────────────────────────────────
@@ -36,7 +53,13 @@ FROM dbo.USER_ORDER_STAGING
 WHERE WOO_ORDER_ID = ?
 """
 
-CHECK_DUPLICATE_ORDER_SQL = """
+FIND_STAGED_ORDER_IDS_SQL = """
+SELECT DISTINCT WOO_ORDER_ID
+FROM dbo.USER_ORDER_STAGING
+WHERE WOO_ORDER_ID IN ({placeholders})
+"""
+
+CHECK_DUPLICATE_ORDERS_SQL = """
 SELECT 
     s.STAGING_ID,
     s.WOO_ORDER_ID,
@@ -51,11 +74,26 @@ SELECT
         ELSE 'PENDING'
     END AS STATUS
 FROM dbo.USER_ORDER_STAGING s
-WHERE s.WOO_ORDER_ID = ? OR s.WOO_ORDER_NO = ?
+WHERE s.WOO_ORDER_ID IN ({id_placeholders}) OR s.WOO_ORDER_NO IN ({no_placeholders})
+ORDER BY s.STAGING_ID
 """
 
-FIND_CUSTOMER_BY_EMAIL_SQL = """
-SELECT CUST_NO, NAM FROM dbo.AR_CUST WHERE EMAIL_ADRS_1 = ?
+CHECK_DUPLICATE_ORDER_SQL = """
+SELECT 
+    s.STAGING_ID,
+    s.WOO_ORDER_ID,
+    s.WOO_ORDER_NO,
+    s.IS_APPLIED,
+    s.CP_DOC_ID,
+    s.CREATED_DT,
+    CASE 
+        WHEN s.IS_APPLIED = 1 AND s.CP_DOC_ID IS NOT NULL THEN 'COMPLETED'
+        WHEN s.IS_APPLIED = 1 THEN 'APPLIED'
+        WHEN s.IS_VALIDATED = 1 THEN 'VALIDATED'
+        ELSE 'PENDING'
+    END AS STATUS
+FROM dbo.USER_ORDER_STAGING s
+WHERE s.WOO_ORDER_ID = ? OR s.WOO_ORDER_NO = ?
 """
 
 FIND_ITEM_BY_SKU_SQL = """
@@ -66,11 +104,19 @@ FIND_ITEMS_BY_SKUS_SQL = """
 SELECT ITEM_NO, DESCR, STAT FROM dbo.IM_ITEM WHERE ITEM_NO IN ({placeholders})
 """
 
-FIND_CUSTOMER_BY_WOO_ID_SQL = """
-SELECT m.CUST_NO, c.NAM 
+FIND_CUSTOMERS_BY_WOO_IDS_SQL = """
+SELECT m.WOO_USER_ID, m.CUST_NO
 FROM dbo.USER_CUSTOMER_MAP m
 JOIN dbo.AR_CUST c ON c.CUST_NO = m.CUST_NO
-WHERE m.WOO_USER_ID = ? AND m.IS_ACTIVE = 1
+WHERE m.WOO_USER_ID IN ({placeholders}) AND m.IS_ACTIVE = 1
+"""
+
+FIND_CUSTOMERS_BY_EMAILS_SQL = """
+SELECT c.EMAIL_ADRS_1, c.CUST_NO, m.WOO_USER_ID AS MAPPED_WOO_USER_ID
+FROM dbo.AR_CUST c
+LEFT JOIN dbo.USER_CUSTOMER_MAP m ON m.CUST_NO = c.CUST_NO AND m.IS_ACTIVE = 1
+WHERE c.EMAIL_ADRS_1 IN ({placeholders})
+ORDER BY c.CUST_NO
 """
 
 GET_RECENT_STAGED_ORDERS_SQL = """
@@ -86,6 +132,17 @@ ORDER BY CREATED_DT DESC
 # HELPER FUNCTIONS
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _duplicate_info(r: Dict) -> Dict:
+    return {
+        'staging_id': r['STAGING_ID'],
+        'woo_order_id': r['WOO_ORDER_ID'],
+        'status': r['STATUS'],
+        'cp_doc_id': r['CP_DOC_ID'],
+        'created_dt': r['CREATED_DT'],
+        'is_duplicate': True
+    }
+
+
 def check_duplicate_order(woo_order_id: int, woo_order_no: str = None) -> Optional[Dict]:
     """
     Check if an order has already been staged or processed.
@@ -98,6 +155,8 @@ def check_duplicate_order(woo_order_id: int, woo_order_no: str = None) -> Option
     - status: 'PENDING', 'VALIDATED', 'APPLIED', 'COMPLETED'
     - cp_doc_id: CounterPoint document ID (if applied)
     - created_dt: When the staging record was created
+    
+    Bulk callers should use check_duplicate_orders().
     """
     result = run_query(
         CHECK_DUPLICATE_ORDER_SQL, 
@@ -106,19 +165,71 @@ def check_duplicate_order(woo_order_id: int, woo_order_no: str = None) -> Option
     )
     
     if result and len(result) > 0:
-        r = result[0]
-        return {
-            'staging_id': r['STAGING_ID'],
-            'woo_order_id': r['WOO_ORDER_ID'],
-            'status': r['STATUS'],
-            'cp_doc_id': r['CP_DOC_ID'],
-            'created_dt': r['CREATED_DT'],
-            'is_duplicate': True
-        }
+        return _duplicate_info(result[0])
     
     return None
 
 
+def check_duplicate_orders(orders: Iterable[Tuple[int, Optional[str]]]) -> Dict[int, Dict]:
+    """
+    Set-based check_duplicate_order() for many (woo_order_id, woo_order_no) pairs.
+    
+    One IN-list query per LOOKUP_CHUNK orders, all on one connection.
+    Database errors are raised rather than read as "not a duplicate".
+    
+    Returns:
+        woo_order_id -> duplicate info (same shape as check_duplicate_order)
+        for the orders already staged; others are absent.
+    """
+    pairs = list(dict.fromkeys(
+        (int(order_id), str(order_no or order_id).strip()) for order_id, order_no in orders
+    ))
+    duplicates: Dict[int, Dict] = {}
+    if not pairs:
+        return duplicates
+    
+    with connection_ctx() as conn:
+        for start in range(0, len(pairs), LOOKUP_CHUNK):
+            chunk = pairs[start:start + LOOKUP_CHUNK]
+            marks = ','.join('?' for _ in chunk)
+            sql = CHECK_DUPLICATE_ORDERS_SQL.format(id_placeholders=marks, no_placeholders=marks)
+            by_id: Dict[int, Dict] = {}
+            by_no: Dict[str, Dict] = {}
+            for r in iter_query(sql, [p[0] for p in chunk] + [p[1] for p in chunk], conn=conn):
+                # Normalised keys: the driver's types must not decide a match
+                by_id.setdefault(int(r['WOO_ORDER_ID']), r)
+                if r['WOO_ORDER_NO'] is not None:
+                    by_no.setdefault(str(r['WOO_ORDER_NO']).strip(), r)
+            for order_id, order_no in chunk:
+                r = by_id.get(order_id) or by_no.get(order_no)
+                if r is not None:
+                    duplicates[order_id] = _duplicate_info(r)
+    
+    return duplicates
+
+
+def find_staged_order_ids(woo_order_ids: Iterable[int]) -> Set[int]:
+    """
+    The WOO_ORDER_IDs among woo_order_ids already in USER_ORDER_STAGING.
+    
+    One IN-list query per LOOKUP_CHUNK IDs, all on one connection.
+    Database errors are raised: reading a failed lookup as "nothing staged"
+    would stage every order again.
+    """
+    ids = sorted({int(order_id) for order_id in woo_order_ids})
+    staged: Set[int] = set()
+    if not ids:
+        return staged
+    
+    with connection_ctx() as conn:
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[start:start + LOOKUP_CHUNK]
+            sql = FIND_STAGED_ORDER_IDS_SQL.format(placeholders=','.join('?' for _ in chunk))
+            staged.update(row[0] for row in iter_query(sql, chunk, row_type="tuple", conn=conn))
+    
+    return staged
+
+
 def validate_order_skus(line_items: List[Dict]) -> Tuple[List[Dict], List[str]]:
     """
     Validate SKUs in order line items against CounterPoint IM_ITEM.
@@ -200,6 +311,103 @@ def validate_order_skus(line_items: List[Dict]) -> Tuple[List[Dict], List[str]]:
     return validated, warnings
 
 
+def _lookup_customers(sql: str, keys: List, key_column: str, normalize) -> Dict[object, Dict]:
+    """Run an IN-list customer lookup in LOOKUP_CHUNK pieces; first row per key wins."""
+    found: Dict[object, Dict] = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start:start + LOOKUP_CHUNK]
+        rows = run_query(sql.format(placeholders=','.join('?' for _ in chunk)), chunk, suppress_errors=True)
+        for r in rows:
+            found.setdefault(normalize(r[key_column]), r)
+    return found
+
+
+def _order_customer_keys(woo_order: Dict) -> Tuple[Optional[int], Optional[str]]:
+    woo_cust_id = woo_order.get('customer_id')
+    woo_cust_id = int(woo_cust_id) if woo_cust_id and int(woo_cust_id) > 0 else None
+    email = ((woo_order.get('billing') or {}).get('email') or '').strip().lower() or None
+    return woo_cust_id, email
+
+
+def _remember_customer_mappings(mappings: Dict[int, Tuple[str, str]]) -> None:
+    """
+    Insert Woo user ID -> (CUST_NO, email) rows into USER_CUSTOMER_MAP.
+    
+    Insert-only: a CUST_NO that already has an active mapping is left alone.
+    A failed write only costs the next pull an email lookup.
+    """
+    rows = [
+        {'CUST_NO': cust_no, 'WOO_USER_ID': woo_id, 'WOO_EMAIL': email, 'MAPPING_SOURCE': 'AUTO'}
+        for woo_id, (cust_no, email) in mappings.items()
+    ]
+    try:
+        bulk_merge(
+            "dbo.USER_CUSTOMER_MAP",
+            key_cols=['CUST_NO'],
+            rows=rows,
+            update_cols=[],
+            insert_extra={'IS_ACTIVE': '1'},
+            match_extra='t.IS_ACTIVE = 1',
+        )
+    except Exception as e:
+        print(f"  Warning: Could not save customer mappings: {e}")
+
+
+def resolve_customers(woo_orders: List[Dict], remember: bool = False) -> List[Optional[str]]:
+    """
+    Resolve many WooCommerce orders to CounterPoint customers at once.
+    
+    Same resolution order as resolve_customer(), but with one set-based
+    query per step for the whole list (plus one per LOOKUP_CHUNK keys)
+    instead of up to two queries per order; each Woo ID and email is looked
+    up once per call.
+    
+    USER_CUSTOMER_MAP is the cross-run cache: with remember=True, a
+    registered Woo customer found by billing email (and whose CUST_NO has no
+    active mapping yet) is written there, so later pulls resolve it in step 1
+    and skip the AR_CUST email lookup. Deactivating a mapping (IS_ACTIVE = 0)
+    invalidates it on the next pull.
+    
+    Returns:
+        CUST_NO (or None) for each order, in input order
+    """
+    keys = [_order_customer_keys(o) for o in woo_orders]
+    resolved: Dict[Tuple[str, object], str] = {}
+    
+    # 1. USER_CUSTOMER_MAP by Woo customer ID
+    woo_ids = list(dict.fromkeys(i for i, _ in keys if i is not None))
+    if woo_ids:
+        for woo_id, row in _lookup_customers(FIND_CUSTOMERS_BY_WOO_IDS_SQL, woo_ids, 'WOO_USER_ID', int).items():
+            resolved[('id', woo_id)] = row['CUST_NO']
+    
+    # 2. AR_CUST by billing email, for orders the map didn't cover
+    emails = list(dict.fromkeys(
+        e for i, e in keys
+        if e is not None and not (i is not None and ('id', i) in resolved)
+    ))
+    unmapped_cust_nos: Set[str] = set()
+    if emails:
+        normalize = lambda e: (e or '').strip().lower()
+        for email, row in _lookup_customers(FIND_CUSTOMERS_BY_EMAILS_SQL, emails, 'EMAIL_ADRS_1', normalize).items():
+            resolved[('email', email)] = row['CUST_NO']
+            if row.get('MAPPED_WOO_USER_ID') is None:
+                unmapped_cust_nos.add(row['CUST_NO'])
+    
+    if remember and unmapped_cust_nos:
+        # One row per Woo user and per CUST_NO (both are unique among active mappings)
+        mappings: Dict[int, Tuple[str, str]] = {}
+        for woo_id, email in keys:
+            cust_no = resolved.get(('email', email))
+            if (woo_id is not None and ('id', woo_id) not in resolved and woo_id not in mappings
+                    and cust_no in unmapped_cust_nos):
+                mappings[woo_id] = (cust_no, email)
+                unmapped_cust_nos.discard(cust_no)
+        if mappings:
+            _remember_customer_mappings(mappings)
+    
+    return [resolved.get(('id', i)) or resolved.get(('email', e)) for i, e in keys]
+
+
 def resolve_customer(woo_order: Dict) -> Optional[str]:
     """
     Try to resolve WooCommerce order to CounterPoint customer.
@@ -208,23 +416,10 @@ def resolve_customer(woo_order: Dict) -> Optional[str]:
     1. Check USER_CUSTOMER_MAP by Woo customer ID
     2. Check AR_CUST by billing email
     3. Return None if not found
-    """
-    # Try by Woo customer ID
-    woo_cust_id = woo_order.get('customer_id')
-    if woo_cust_id and woo_cust_id > 0:
-        result = run_query(FIND_CUSTOMER_BY_WOO_ID_SQL, (woo_cust_id,), suppress_errors=True)
-        if result:
-            return result[0]['CUST_NO']
-    
-    # Try by email
-    billing = woo_order.get('billing', {})
-    email = billing.get('email')
-    if email:
-        result = run_query(FIND_CUSTOMER_BY_EMAIL_SQL, (email,), suppress_errors=True)
-        if result:
-            return result[0]['CUST_NO']
     
-    return None
+    Use resolve_customers() for more than one order.
+    """
+    return resolve_customers([woo_order])[0]
 
 
 def woo_order_to_staging(order: Dict) -> Dict:
@@ -366,12 +561,11 @@ def woo_order_to_staging(order: Dict) -> Dict:
 # LIST ORDERS
 # ─────────────────────────────────────────────────────────────────────────────
 
-def list_woo_orders(days: int = 30, status: str = 'any') -> List[Dict]:
-    """List recent WooCommerce orders."""
+def list_woo_orders(days: int = 30, status: str = 'any', limit: Optional[int] = 50) -> List[Dict]:
+    """List recent WooCommerce orders (the newest `limit`, or all with limit=None)."""
     client = WooClient()
     
     params = {
-        'per_page': 50,
         'orderby': 'date',
         'order': 'desc',
     }
@@ -383,14 +577,14 @@ def list_woo_orders(days: int = 30, status: str = 'any') -> List[Dict]:
         after_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%dT00:00:00')
         params['after'] = after_date
     
-    url = client._url("/orders")
-    resp = client.session.get(url, params=params, timeout=30)
-    
-    if not resp.ok:
-        print(f"Error fetching orders: {resp.status_code} {resp.text[:200]}")
+    try:
+        orders = list(client.paginate("/orders", params, per_page=min(limit or 100, 100), max_items=limit))
+    except requests.RequestException as e:
+        print(f"Error fetching orders: {e}")
         return []
     
-    orders = resp.json()
+    # Orders can shift between pages while they are fetched concurrently; keep newest-first
+    orders.sort(key=lambda o: o.get('date_created_gmt') or o.get('date_created') or '', reverse=True)
     
     print(f"\n{'='*80}")
     print(f"WooCommerce Orders (last {days} days)")
@@ -440,10 +634,47 @@ def list_staged_orders():
 # PULL ORDERS
 # ─────────────────────────────────────────────────────────────────────────────
 
-def pull_orders(days: int = 30, dry_run: bool = True) -> Tuple[int, int, int]:
+def _order_modified_gmt(order: Dict) -> Optional[datetime]:
+    """date_modified_gmt of a Woo order as a naive UTC datetime (None if absent)."""
+    value = order.get('date_modified_gmt')
+    try:
+        return datetime.fromisoformat(value[:19]) if value else None
+    except ValueError:
+        return None
+
+
+def _advance_order_watermark(woo_orders: List[Dict], failed: Iterable[Dict] = ()) -> None:
+    """
+    Move the incremental-pull mark to the newest modification pulled.
+    
+    With failed orders the mark stops just before the oldest of them, so
+    they are pulled again next run while the rest of the window moves on.
+    A failed order without date_modified_gmt keeps the stored mark.
+    """
+    stamps = [m for m in (_order_modified_gmt(o) for o in woo_orders) if m is not None]
+    if not stamps:
+        return
+    mark = max(stamps)
+    for order in failed:
+        modified = _order_modified_gmt(order)
+        if modified is None:
+            print("Order watermark kept: a failed order has no modification date")
+            return
+        mark = min(mark, modified - timedelta(microseconds=1))
+    set_sync_watermark(ORDER_WATERMARK_NAME, mark)
+    print(f"Order watermark advanced to {mark:%Y-%m-%d %H:%M:%S} UTC")
+
+
+def pull_orders(days: int = 30, dry_run: bool = True, incremental: bool = False) -> Tuple[int, int, int]:
     """
     Pull WooCommerce orders into USER_ORDER_STAGING.
     
+    Every page of the result is read (concurrently, via WooClient.paginate).
+    With incremental=True only orders modified since the stored watermark
+    (minus ORDER_PULL_OVERLAP_MINUTES) are requested; the first incremental run,
+    with no watermark yet, pulls the `days` window. A live run advances the
+    watermark, but not past the oldest order that failed to stage.
+    
     Returns: (new_orders, skipped, errors)
     """
     client = WooClient()
@@ -454,45 +685,66 @@ def pull_orders(days: int = 30, dry_run: bool = True) -> Tuple[int, int, int]:
     
     # Fetch orders from Woo
     params = {
-        'per_page': 100,
         'orderby': 'date',
         'order': 'desc',
         'status': 'processing,completed',  # Only paid orders
     }
     
-    if days:
+    mark = get_sync_watermark(ORDER_WATERMARK_NAME).high_water_mark if incremental else None
+    if mark is not None:
+        # Oldest change first: orders modified while we page move to the end
+        # instead of shifting earlier pages
+        overlap = timedelta(minutes=int(get_setting('ORDER_PULL_OVERLAP_MINUTES', '10')))
+        modified_after = mark - overlap
+        params.update({
+            'orderby': 'modified',
+            'order': 'asc',
+            'modified_after': modified_after.strftime('%Y-%m-%dT%H:%M:%S'),
+            'dates_are_gmt': 'true',
+        })
+        print(f"Incremental pull: orders modified since {modified_after:%Y-%m-%d %H:%M:%S} UTC "
+              f"(watermark minus {overlap})")
+    elif days:
+        if incremental:
+            print(f"No order watermark yet - pulling the last {days} days")
         after_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%dT00:00:00')
         params['after'] = after_date
         print(f"Fetching orders since: {after_date[:10]}")
     
-    url = client._url("/orders")
-    resp = client.session.get(url, params=params, timeout=60)
-    
-    if not resp.ok:
-        print(f"Error: {resp.status_code} {resp.text[:200]}")
+    try:
+        woo_orders = list(client.paginate("/orders", params, timeout=60))
+    except requests.RequestException as e:
+        print(f"Error: {e}")
         return 0, 0, 1
     
-    woo_orders = resp.json()
     print(f"WooCommerce orders found: {len(woo_orders)}")
     
-    # Check which are already staged
-    new_orders = []
-    skipped = 0
+    # Check which are already staged: one set-based lookup for the whole pull
+    try:
+        staged_ids = find_staged_order_ids(o['id'] for o in woo_orders)
+    except Exception as e:
+        print(f"Error checking staged orders: {e}")
+        return 0, 0, 1
     
-    for order in woo_orders:
-        existing = run_query(FIND_STAGED_ORDER_SQL, (order['id'],), suppress_errors=True)
-        if existing:
-            skipped += 1
-        else:
-            new_orders.append(order)
+    new_orders = [o for o in woo_orders if int(o['id']) not in staged_ids]
+    skipped = len(woo_orders) - len(new_orders)
     
     print(f"Already staged: {skipped}")
     print(f"New to stage: {len(new_orders)}")
     
     if not new_orders:
         print("\nNo new orders to pull.")
+        if incremental and not dry_run:
+            _advance_order_watermark(woo_orders)
         return 0, skipped, 0
     
+    # Resolve every order's customer up front: the preview and the staging
+    # rows share one set-based lookup
+    customers = dict(zip((o['id'] for o in new_orders), resolve_customers(new_orders, remember=not dry_run)))
+    unmapped = sum(1 for cust_no in customers.values() if cust_no is None)
+    if unmapped:
+        print(f"Customer not mapped: {unmapped}")
+    
     # Preview
     print(f"\n{'ORDER':<10} {'CUSTOMER':<30} {'TOTAL':>10} {'CP_CUST':<12}")
     print("-" * 70)
@@ -500,7 +752,7 @@ def pull_orders(days: int = 30, dry_run: bool = True) -> Tuple[int, int, int]:
     for o in new_orders[:10]:
         billing = o.get('billing', {})
         name = f"{billing.get('first_name', '')} {billing.get('last_name', '')}".strip()[:30]
-        cp_cust = resolve_customer(o) or 'NOT MAPPED'
+        cp_cust = customers[o['id']] or 'NOT MAPPED'
         print(f"#{o['id']:<9} {name:<30} ${float(o.get('total', 0)):>9.2f} {cp_cust:<12}")
     
     if len(new_orders) > 10:
@@ -514,68 +766,79 @@ def pull_orders(days: int = 30, dry_run: bool = True) -> Tuple[int, int, int]:
     # Insert into staging
     batch_id = f"WOO_ORDERS_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    staged = 0
+    rows = []
+    row_orders = []  # the Woo order behind each row
+    failed_orders = []
     errors = 0
     
+    for order in new_orders:
+        try:
+            data = woo_order_to_staging(order)
+            cp_cust = customers[order['id']]
+            
+            rows.append({
+                'BATCH_ID': batch_id,
+                'WOO_ORDER_ID': data['WOO_ORDER_ID'],
+                'WOO_ORDER_NO': data['WOO_ORDER_NO'],
+                'CUST_NO': cp_cust,
+                'CUST_EMAIL': data['CUST_EMAIL'],
+                'ORD_DAT': data['ORD_DAT'],
+                'ORD_STATUS': data['ORD_STATUS'],
+                'PMT_METH': data['PMT_METH'],
+                'SHIP_VIA': data['SHIP_VIA'],
+                'SUBTOT': data['SUBTOT'],
+                'SHIP_AMT': data['SHIP_AMT'],
+                'TAX_AMT': data['TAX_AMT'],
+                'DISC_AMT': data['DISC_AMT'],
+                'TOT_AMT': data['TOT_AMT'],
+                'SHIP_NAM': data['SHIP_NAM'],
+                'SHIP_ADRS_1': data['SHIP_ADRS_1'],
+                'SHIP_ADRS_2': data['SHIP_ADRS_2'],
+                'SHIP_CITY': data['SHIP_CITY'],
+                'SHIP_STATE': data['SHIP_STATE'],
+                'SHIP_ZIP_COD': data['SHIP_ZIP_COD'],
+                'SHIP_CNTRY': data['SHIP_CNTRY'],
+                'SHIP_PHONE': data['SHIP_PHONE'],
+                'LINE_ITEMS_JSON': data['LINE_ITEMS_JSON'],
+            })
+            row_orders.append(order)
+            
+        except Exception as e:
+            errors += 1
+            failed_orders.append(order)
+            print(f"  [ERR] Error staging order #{order['id']}: {e}")
+    
+    # One fast_executemany round trip per batch instead of one INSERT per order
     try:
-        for order in new_orders:
+        staged = bulk_insert("dbo.USER_ORDER_STAGING", rows)
+    except BulkInsertError as e:
+        # Batches before the failure are committed; retry the rest one order
+        # at a time so only the rejected order(s) fail, not the whole batch
+        print(f"  [WARN] Batch insert failed after {e.inserted} order(s) ({e}); retrying the rest one by one")
+        staged = e.inserted
+        for row, order in zip(rows[e.inserted:], row_orders[e.inserted:]):
             try:
-                data = woo_order_to_staging(order)
-                cp_cust = resolve_customer(order)
-                
-                cursor.execute("""
-                    INSERT INTO dbo.USER_ORDER_STAGING (
-                        BATCH_ID, WOO_ORDER_ID, WOO_ORDER_NO,
-                        CUST_NO, CUST_EMAIL,
-                        ORD_DAT, ORD_STATUS, PMT_METH, SHIP_VIA,
-                        SUBTOT, SHIP_AMT, TAX_AMT, DISC_AMT, TOT_AMT,
-                        SHIP_NAM, SHIP_ADRS_1, SHIP_ADRS_2, 
-                        SHIP_CITY, SHIP_STATE, SHIP_ZIP_COD, SHIP_CNTRY, SHIP_PHONE,
-                        LINE_ITEMS_JSON
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    batch_id,
-                    data['WOO_ORDER_ID'],
-                    data['WOO_ORDER_NO'],
-                    cp_cust,
-                    data['CUST_EMAIL'],
-                    data['ORD_DAT'],
-                    data['ORD_STATUS'],
-                    data['PMT_METH'],
-                    data['SHIP_VIA'],
-                    data['SUBTOT'],
-                    data['SHIP_AMT'],
-                    data['TAX_AMT'],
-                    data['DISC_AMT'],
-                    data['TOT_AMT'],
-                    data['SHIP_NAM'],
-                    data['SHIP_ADRS_1'],
-                    data['SHIP_ADRS_2'],
-                    data['SHIP_CITY'],
-                    data['SHIP_STATE'],
-                    data['SHIP_ZIP_COD'],
-                    data['SHIP_CNTRY'],
-                    data['SHIP_PHONE'],
-                    data['LINE_ITEMS_JSON'],
-                ))
-                staged += 1
-                
-            except Exception as e:
+                staged += bulk_insert("dbo.USER_ORDER_STAGING", [row])
+            except Exception as row_error:
                 errors += 1
-                print(f"  [ERR] Error staging order #{order['id']}: {e}")
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+                failed_orders.append(order)
+                print(f"  [ERR] Error staging order #{order['id']}: {row_error}")
+    except Exception as e:
+        staged = 0
+        errors += len(rows)
+        failed_orders += row_orders
+        print(f"  [ERR] Error staging orders for batch {batch_id}: {e}")
     
     print(f"\n{'='*60}")
     print(f"[OK] Staged {staged} orders (Batch: {batch_id})")
     print(f"  Errors: {errors}")
     print(f"{'='*60}")
     
+    # Orders that failed to stage must be re-read next time: the mark stops
+    # just before the oldest of them
+    if incremental:
+        _advance_order_watermark(woo_orders, failed_orders)
+    
     print(f"\nNext steps:")
     print(f"  1. Review: SELECT * FROM USER_ORDER_STAGING WHERE BATCH_ID = '{batch_id}'")
     print(f"  2. Map unmapped customers")
@@ -642,13 +905,17 @@ woo_orders.py - Pull WooCommerce Orders to CounterPoint
 
 COMMANDS:
 
-  list                          List recent WooCommerce orders
+  list                          List the 50 most recent WooCommerce orders
   list --days 7                 List orders from last 7 days
+  list --all                    List every order in the window (no 50 cap)
   staged                        List orders in CP staging table
   
   pull                          Pull new orders to staging (dry-run)
   pull --apply                  Pull new orders to staging (live)
   pull --days 7 --apply         Pull last 7 days of orders
+  pull --incremental --apply    Pull only orders modified since the last
+                                incremental pull (USER_SYNC_WATERMARK; first
+                                run uses the --days window)
   
   status <WOO_ORDER_ID>         Check status of specific order
 
@@ -681,6 +948,7 @@ def main():
     
     cmd = args[0].lower()
     apply_flag = '--apply' in args
+    incremental_flag = '--incremental' in args
     
     # Parse --days N
     days = 30
@@ -693,13 +961,13 @@ def main():
                 pass
     
     if cmd == 'list':
-        list_woo_orders(days=days)
+        list_woo_orders(days=days, limit=None if '--all' in args else 50)
     
     elif cmd == 'staged':
         list_staged_orders()
     
     elif cmd == 'pull':
-        pull_orders(days=days, dry_run=not apply_flag)
+        pull_orders(days=days, dry_run=not apply_flag, incremental=incremental_flag)
     
     elif cmd == 'status' and len(args) > 1:
         try:
@@ -5,30 +5,54 @@ Handles:
   - CP → Woo: Export products from VI_EXPORT_PRODUCTS view to WooCommerce
   - Product mapping (USER_PRODUCT_MAP)
   - Category mapping (USER_CATEGORY_MAP)
-  - HTML sanitization for descriptions
+  - HTML sanitization for descriptions (cached by content hash; large batches
+    are parsed in a process pool by prepare_product_payloads)
   - Stock quantity sync (Phase 2 - will not update stock until Phase 3)
+  - Payload hashing: products whose WooCommerce payload is unchanged since the
+    last successful push (USER_PRODUCT_MAP.PAYLOAD_HASH) are skipped
+  - Field-level updates: changed products are sent as id + sku + the fields
+    whose digest differs from the last push (USER_PRODUCT_MAP.PAYLOAD_FIELDS)
+  - Streaming pipeline: rows are read ahead on a background thread, payloads
+    are built as they arrive and batches are posted concurrently as they fill
+  - Checkpoints: every batch WooCommerce applies is recorded under the sync
+    batch ID (USER_PRODUCT_SYNC_CHECKPOINT); --resume skips those SKUs
 
 Usage:
     python woo_products.py sync             # Sync products (dry-run)
     python woo_products.py sync --apply     # Sync products (live)
     python woo_products.py sync --max 10    # Sync first 10 products
     python woo_products.py sync --sku SKU123 # Sync specific SKU
+    python woo_products.py sync --apply --full --force  # Re-send every product in full, even unchanged
+    python woo_products.py sync --apply --resume PROD_SYNC_20250101_120000  # Finish an interrupted run
 """
 
+import os
 import sys
 import argparse
 import datetime as dt
 import uuid
 import html
+import hashlib
+import itertools
+import json
 import re
-from typing import List, Dict, Optional, Set
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import FrozenSet, Iterable, Iterator, List, Dict, Optional, Set, Tuple
 from html.parser import HTMLParser
 
-from database import get_connection, connection_ctx
-from config import load_integration_config, IntegrationConfig
-from woo_client import WooClient
+from database import get_connection, connection_ctx, iter_query, bulk_merge, read_ahead
+from config import get_integration_config, get_setting, IntegrationConfig
+from woo_client import SkuIndex, WooClient
 from data_utils import sanitize_string
 
+# Descriptions per worker task when sanitizing in a process pool. The other
+# pipeline knobs (PRODUCT_READ_AHEAD_ROWS, PRODUCT_PAYLOAD_BATCH_ROWS,
+# PRODUCT_PAYLOAD_WORKERS, PRODUCT_HTML_CACHE_SIZE) are read at run time,
+# after .env is loaded
+SANITIZE_CHUNK = 50
+
 
 # ---------- HTML Sanitization ----------
 
@@ -105,22 +129,89 @@ class HTMLSanitizer(HTMLParser):
         return ''.join(self.result)
 
 
+def _sanitize_uncached(html_content: str) -> str:
+    # If content doesn't look like HTML, just sanitize as plain text
+    if not re.search(r'<[a-z]+[^>]*>', html_content, re.IGNORECASE):
+        return sanitize_string(html_content)
+    
+    sanitizer = HTMLSanitizer()
+    return sanitizer.sanitize(html_content)
+
+
+# SHA-1 of the raw description -> sanitized HTML (least recently used evicted first)
+_sanitized_cache: "OrderedDict[str, str]" = OrderedDict()
+_sanitized_cache_size: Optional[int] = None
+
+
+def _content_key(html_content: str) -> str:
+    return hashlib.sha1(html_content.encode('utf-8')).hexdigest()
+
+
+def _remember_sanitized(key: str, sanitized: str) -> None:
+    global _sanitized_cache_size
+    if _sanitized_cache_size is None:
+        _sanitized_cache_size = int(get_setting("PRODUCT_HTML_CACHE_SIZE", "50000"))
+    _sanitized_cache[key] = sanitized
+    _sanitized_cache.move_to_end(key)
+    while len(_sanitized_cache) > _sanitized_cache_size:
+        _sanitized_cache.popitem(last=False)
+
+
 def sanitize_html(html_content: str) -> str:
     """
     Sanitize HTML content for safe display in WooCommerce.
     
     Allows safe HTML tags (p, br, strong, etc.) and strips dangerous ones.
-    Escapes text content to prevent XSS.
+    Escapes text content to prevent XSS. Results are cached by content hash,
+    so a description seen before (another product, or SHORT_DESC repeated as
+    LONG_DESC) is not parsed again.
     """
     if not html_content:
         return ''
     
-    # If content doesn't look like HTML, just sanitize as plain text
-    if not re.search(r'<[a-z]+[^>]*>', html_content, re.IGNORECASE):
-        return sanitize_string(html_content)
+    key = _content_key(html_content)
+    cached = _sanitized_cache.get(key)
+    if cached is not None:
+        _sanitized_cache.move_to_end(key)
+        return cached
     
-    sanitizer = HTMLSanitizer()
-    return sanitizer.sanitize(html_content)
+    sanitized = _sanitize_uncached(html_content)
+    _remember_sanitized(key, sanitized)
+    return sanitized
+
+
+def _sanitize_chunk(contents: List[str]) -> List[str]:
+    """Process-pool task: sanitize a chunk of descriptions, in order."""
+    return [_sanitize_uncached(content) for content in contents]
+
+
+def presanitize(contents: Iterable[str], pool: Optional[Executor] = None, chunk_size: int = SANITIZE_CHUNK) -> int:
+    """
+    Sanitize descriptions not yet cached, spread over `pool` in chunks.
+    
+    Duplicates are parsed once. With no pool (or a single chunk) the work runs
+    in-process. Returns how many distinct descriptions were parsed.
+    """
+    pending: Dict[str, str] = {}
+    for content in contents:
+        if content:
+            key = _content_key(content)
+            if key not in _sanitized_cache:
+                pending.setdefault(key, content)
+    if not pending:
+        return 0
+    
+    keys = list(pending)
+    values = list(pending.values())
+    chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+    if pool is not None and len(chunks) > 1:
+        results = pool.map(_sanitize_chunk, chunks)
+    else:
+        results = map(_sanitize_chunk, chunks)
+    sanitized = [item for chunk in results for item in chunk]
+    for key, value in zip(keys, sanitized):
+        _remember_sanitized(key, value)
+    return len(keys)
 
 
 # ---------- Data access ----------
@@ -158,21 +249,27 @@ def parse_updated_since(value: str, last_sync: Optional[dt.datetime] = None) ->
         raise ValueError(f"Invalid --updated-since format: {value}. Use ISO format, 'Xh', 'Xd', or 'last'")
 
 
-def fetch_products(conn, max_records: int = None, sku_filter: str = None, updated_since: Optional[dt.datetime] = None) -> List[Dict]:
+def iter_products(conn, max_records: int = None, sku_filter: str = None, updated_since: Optional[dt.datetime] = None,
+                  batch_size: int = 200) -> Iterator[Dict]:
     """
-    Fetch products from VI_EXPORT_PRODUCTS view.
+    Stream products from VI_EXPORT_PRODUCTS view.
+    
+    Rows are fetched in batches of `batch_size` on a separate pooled connection,
+    so callers can keep using `conn` (category lookups, mapping) while rows stream.
+    The capability check on `conn` runs when this is called, not on first
+    iteration, so the returned iterator can be consumed on another thread
+    (e.g. read_ahead) without sharing `conn` across threads.
     
     Args:
-        conn: Database connection
+        conn: Database connection (used for the LST_MAINT_DT capability check)
         max_records: Maximum number of records to fetch (None = all)
         sku_filter: Optional SKU to filter by
         updated_since: Optional timestamp to filter by (only products updated since this time)
+        batch_size: Rows per fetchmany() round trip
         
-    Returns:
-        List of product dictionaries
+    Yields:
+        Product dictionaries
     """
-    cur = conn.cursor()
-    
     # Build WHERE clause
     where_clauses = []
     params = []
@@ -187,6 +284,7 @@ def fetch_products(conn, max_records: int = None, sku_filter: str = None, update
     try:
         test_cur = conn.cursor()
         test_cur.execute("SELECT TOP 1 LST_MAINT_DT FROM dbo.VI_EXPORT_PRODUCTS")
+        test_cur.fetchall()
         has_lst_maint_dt = True
         test_cur.close()
     except Exception as e:
@@ -205,41 +303,64 @@ def fetch_products(conn, max_records: int = None, sku_filter: str = None, update
     # Order by clause - use LST_MAINT_DT if available, otherwise just SKU
     order_by = "ORDER BY LST_MAINT_DT DESC, SKU" if has_lst_maint_dt else "ORDER BY SKU"
     
-    if sku_filter:
-        sql = f"""
-            SELECT SKU, NAME, SHORT_DESC, LONG_DESC, ACTIVE, STOCK_QTY, CATEGORY_CODE
-            FROM dbo.VI_EXPORT_PRODUCTS
-            {where_sql}
-            {order_by};
-        """
-        cur.execute(sql, tuple(params))
-    elif max_records:
-        sql = f"""
-            SELECT TOP ({max_records})
-                SKU, NAME, SHORT_DESC, LONG_DESC, ACTIVE, STOCK_QTY, CATEGORY_CODE
-            FROM dbo.VI_EXPORT_PRODUCTS
-            {where_sql}
-            {order_by};
-        """
-        cur.execute(sql, tuple(params))
-    else:
-        sql = f"""
-            SELECT SKU, NAME, SHORT_DESC, LONG_DESC, ACTIVE, STOCK_QTY, CATEGORY_CODE
-            FROM dbo.VI_EXPORT_PRODUCTS
-            {where_sql}
-            {order_by};
-        """
-        cur.execute(sql, tuple(params))
+    top_sql = f"TOP ({int(max_records)})" if max_records and not sku_filter else ""
+    sql = f"""
+        SELECT {top_sql}
+            SKU, NAME, SHORT_DESC, LONG_DESC, ACTIVE, STOCK_QTY, CATEGORY_CODE
+        FROM dbo.VI_EXPORT_PRODUCTS
+        {where_sql}
+        {order_by};
+    """
+    return iter_query(sql, tuple(params), batch_size=batch_size)
+
+
+def fetch_products(conn, max_records: int = None, sku_filter: str = None, updated_since: Optional[dt.datetime] = None) -> List[Dict]:
+    """
+    Fetch products from VI_EXPORT_PRODUCTS view.
+    
+    Convenience wrapper around iter_products() for callers that need the full list.
+    
+    Returns:
+        List of product dictionaries
+    """
+    return list(iter_products(conn, max_records=max_records, sku_filter=sku_filter, updated_since=updated_since))
+
+
+@dataclass(frozen=True)
+class CategoryMap:
+    """USER_CATEGORY_MAP loaded once per run: CP category code -> WooCommerce category ID."""
     
-    cols = [c[0] for c in cur.description]
-    rows = [dict(zip(cols, r)) for r in cur.fetchall()]
-    return rows
+    by_code: Dict[str, int] = field(default_factory=dict)
+    
+    @property
+    def woo_ids(self) -> FrozenSet[int]:
+        """Every mapped WooCommerce category ID (the only IDs a create may reference)."""
+        return frozenset(self.by_code.values())
+    
+    def get(self, category_code: Optional[str]) -> Optional[int]:
+        if not category_code:
+            return None
+        return self.by_code.get(category_code)
+
+
+def load_category_map(conn) -> CategoryMap:
+    """Load all active category mappings in one query (the table holds at most a few hundred rows)."""
+    sql = """
+        SELECT CP_CATEGORY_CODE, WOO_CATEGORY_ID
+        FROM dbo.USER_CATEGORY_MAP
+        WHERE IS_ACTIVE = 1;
+    """
+    cur = conn.cursor()
+    cur.execute(sql)
+    return CategoryMap({row[0]: row[1] for row in cur.fetchall()})
 
 
 def get_category_mapping(conn, category_code: str) -> Optional[int]:
     """
     Get WooCommerce category ID for a CP category code.
     
+    One query per call; sync runs should use load_category_map() instead.
+    
     Returns:
         WooCommerce category ID or None if not mapped
     """
@@ -259,7 +380,8 @@ def get_category_mapping(conn, category_code: str) -> Optional[int]:
     return None
 
 
-def prepare_product_payload(product: Dict, category_id: Optional[int] = None, config: Optional[IntegrationConfig] = None) -> Dict:
+def prepare_product_payload(product: Dict, category_id: Optional[int] = None, config: Optional[IntegrationConfig] = None,
+                            category_map: Optional[CategoryMap] = None) -> Dict:
     """
     Prepare a comprehensive product payload for WooCommerce API.
     Includes all available CounterPoint data: pricing, images, weight, dimensions, etc.
@@ -268,10 +390,14 @@ def prepare_product_payload(product: Dict, category_id: Optional[int] = None, co
         product: Product dict from VI_EXPORT_PRODUCTS (comprehensive view)
         category_id: WooCommerce category ID (optional)
         config: IntegrationConfig for image_base_url (optional)
+        category_map: Preloaded CategoryMap, used when category_id is not given
         
     Returns:
         WooCommerce product payload dictionary with all available fields
     """
+    if category_id is None and category_map is not None:
+        category_id = category_map.get(product.get("CATEGORY_CODE"))
+    
     # Sanitize and prepare data
     name = sanitize_string(product.get("NAME") or "", max_length=200)
     short_desc = sanitize_html(product.get("SHORT_DESC") or "")
@@ -457,6 +583,21 @@ def prepare_product_payload(product: Dict, category_id: Optional[int] = None, co
     return payload
 
 
+def prepare_product_payloads(rows: Iterable[Dict], config: Optional[IntegrationConfig] = None,
+                             category_map: Optional[CategoryMap] = None,
+                             pool: Optional[Executor] = None) -> List[Dict]:
+    """
+    Build WooCommerce payloads for many rows, in the same order as `rows`.
+    
+    SHORT_DESC/LONG_DESC values missing from the sanitized-HTML cache are
+    parsed first, in chunks across `pool` (e.g. a ProcessPoolExecutor);
+    prepare_product_payload() then only hits the cache.
+    """
+    rows = list(rows)
+    presanitize((row.get(col) for row in rows for col in ('SHORT_DESC', 'LONG_DESC')), pool=pool)
+    return [prepare_product_payload(row, config=config, category_map=category_map) for row in rows]
+
+
 # ---------- Mapping & logging ----------
 
 def get_product_map(conn) -> Dict[str, int]:
@@ -467,43 +608,218 @@ def get_product_map(conn) -> Dict[str, int]:
     return {row[0]: row[1] for row in cur.fetchall()}
 
 
+def _canonical_json(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def payload_hash(payload: Dict, woo_id: Optional[int] = None) -> str:
+    """
+    Stable SHA-256 of a WooCommerce product payload.
+    
+    Keys are sorted and the payload's own 'id' is replaced by woo_id, so the
+    same content pushed to the same product always hashes the same whether or
+    not the ID was set when it was built.
+    """
+    content = {k: v for k, v in payload.items() if k != 'id'}
+    return hashlib.sha256(f"{woo_id or ''}|{_canonical_json(content)}".encode('utf-8')).hexdigest()
+
+
+def field_digests(payload: Dict) -> Dict[str, str]:
+    """Short digest of each top-level payload field (except 'id'), for field-level diffs."""
+    return {
+        key: hashlib.sha1(_canonical_json(value).encode('utf-8')).hexdigest()[:16]
+        for key, value in payload.items() if key != 'id'
+    }
+
+
+def payload_diff(payload: Dict, woo_id: int, previous: Dict[str, str]) -> Dict:
+    """
+    Update payload with only the fields that changed since the last push.
+    
+    'id' and 'sku' are always kept ('sku' ties batch responses back to the
+    product). A field absent from `previous` counts as changed.
+    """
+    current = field_digests(payload)
+    diff = {'id': woo_id, 'sku': payload['sku']}
+    diff.update({key: payload[key] for key, digest in current.items() if previous.get(key) != digest})
+    return diff
+
+
+@dataclass(frozen=True)
+class PushedPayload:
+    """What was last pushed for a SKU: whole-payload hash and per-field digests."""
+    hash: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+def get_pushed_payloads(conn) -> Dict[str, PushedPayload]:
+    """Last pushed payload per SKU; {} if PAYLOAD_HASH/PAYLOAD_FIELDS are not deployed yet."""
+    sql = """
+        SELECT SKU, PAYLOAD_HASH, PAYLOAD_FIELDS
+        FROM dbo.USER_PRODUCT_MAP
+        WHERE IS_ACTIVE = 1 AND PAYLOAD_HASH IS NOT NULL;
+    """
+    try:
+        cur = conn.cursor()
+        cur.execute(sql)
+        return {
+            row[0]: PushedPayload(row[1], json.loads(row[2]) if row[2] else {})
+            for row in cur.fetchall()
+        }
+    except Exception as e:
+        print(f"  WARNING: Could not read pushed payloads ({e}); run 01_Production/product_payload_hash.sql "
+              f"and 01_Production/product_payload_fields.sql")
+        return {}
+
+
+def save_pushed_payloads(conn, rows: Dict[str, Tuple[int, Dict]], user: str = "SYSTEM") -> Tuple[int, int]:
+    """
+    Record pushed payloads (mapping, hash and per-field digests) in one bulk MERGE.
+    
+    Args:
+        rows: SKU -> (WooCommerce product ID, full payload that is now in WooCommerce)
+    
+    Returns: (inserted, updated)
+    """
+    return bulk_merge(
+        "dbo.USER_PRODUCT_MAP",
+        key_cols=["SKU"],
+        rows=[
+            {"SKU": sku, "WOO_PRODUCT_ID": woo_id, "PAYLOAD_HASH": payload_hash(payload, woo_id),
+             "PAYLOAD_FIELDS": _canonical_json(field_digests(payload)), "UPDATED_BY": user, "CREATED_BY": user}
+            for sku, (woo_id, payload) in rows.items()
+        ],
+        update_cols=["WOO_PRODUCT_ID", "PAYLOAD_HASH", "PAYLOAD_FIELDS", "UPDATED_BY"],
+        insert_cols=["SKU", "WOO_PRODUCT_ID", "PAYLOAD_HASH", "PAYLOAD_FIELDS", "CREATED_BY"],
+        update_extra={"PAYLOAD_HASH_DT": "SYSDATETIME()", "UPDATED_DT": "SYSDATETIME()"},
+        insert_extra={"IS_ACTIVE": "1", "PAYLOAD_HASH_DT": "SYSDATETIME()", "CREATED_DT": "SYSDATETIME()"},
+        match_extra="t.IS_ACTIVE = 1",
+        conn=conn,
+    )
+
+
+def get_checkpointed_skus(conn, batch_id: str) -> Set[str]:
+    """SKUs already applied under batch_id; empty if the checkpoint table is not deployed yet."""
+    sql = "SELECT SKU FROM dbo.USER_PRODUCT_SYNC_CHECKPOINT WHERE SYNC_ID = ?;"
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, (batch_id,))
+        return {row[0] for row in cur.fetchall()}
+    except Exception as e:
+        print(f"  WARNING: Could not read checkpoints ({e}); run 01_Production/product_sync_checkpoint_table.sql")
+        return set()
+
+
+def save_checkpoint(conn, batch_id: str, applied: Dict[str, int]) -> Tuple[int, int]:
+    """
+    Record SKUs WooCommerce applied in this batch, so --resume can skip them.
+    
+    Returns: (inserted, updated)
+    """
+    return bulk_merge(
+        "dbo.USER_PRODUCT_SYNC_CHECKPOINT",
+        key_cols=["SYNC_ID", "SKU"],
+        rows=[{"SYNC_ID": batch_id, "SKU": sku, "WOO_PRODUCT_ID": woo_id} for sku, woo_id in applied.items()],
+        update_cols=["WOO_PRODUCT_ID"],
+        update_extra={"CHECKPOINT_DT": "SYSDATETIME()"},
+        insert_extra={"CHECKPOINT_DT": "SYSDATETIME()"},
+        conn=conn,
+    )
+
+
+def clear_checkpoint(conn, batch_id: str) -> None:
+    """Drop batch_id's checkpoint rows once every SKU in it was applied."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM dbo.USER_PRODUCT_SYNC_CHECKPOINT WHERE SYNC_ID = ?;", (batch_id,))
+    conn.commit()
+
+
 def upsert_product_map(conn, sku: str, woo_id: int, user: str = "SYSTEM"):
     """Update or insert product mapping."""
-    sql = """
-        MERGE dbo.USER_PRODUCT_MAP AS t
-        USING (SELECT ? AS SKU, ? AS WOO_PRODUCT_ID) AS s
-        ON t.SKU = s.SKU
-        WHEN MATCHED THEN
-            UPDATE SET WOO_PRODUCT_ID = s.WOO_PRODUCT_ID, UPDATED_DT = SYSDATETIME(), UPDATED_BY = ?
-        WHEN NOT MATCHED THEN
-            INSERT (SKU, WOO_PRODUCT_ID, IS_ACTIVE, CREATED_DT, CREATED_BY)
-            VALUES (s.SKU, s.WOO_PRODUCT_ID, 1, SYSDATETIME(), ?);
+    upsert_product_maps(conn, {sku: woo_id}, user)
+
+
+def upsert_product_maps(conn, mappings: Dict[str, int], user: str = "SYSTEM") -> Tuple[int, int]:
+    """
+    Update or insert many product mappings in one bulk MERGE.
+
+    Returns: (inserted, updated)
+    """
+    rows = [
+        {"SKU": sku, "WOO_PRODUCT_ID": woo_id, "UPDATED_BY": user, "CREATED_BY": user}
+        for sku, woo_id in mappings.items()
+    ]
+    return bulk_merge(
+        "dbo.USER_PRODUCT_MAP",
+        key_cols=["SKU"],
+        rows=rows,
+        update_cols=["WOO_PRODUCT_ID", "UPDATED_BY"],
+        insert_cols=["SKU", "WOO_PRODUCT_ID", "CREATED_BY"],
+        update_extra={"UPDATED_DT": "SYSDATETIME()"},
+        insert_extra={"IS_ACTIVE": "1", "CREATED_DT": "SYSDATETIME()"},
+        conn=conn,
+    )
+
+
+def deactivate_product_maps(conn, skus: Iterable[str], user: str = "SYSTEM") -> int:
     """
+    Deactivate mappings whose WooCommerce product was deleted.
+    
+    Called by the SKU index when an update is rejected as an invalid ID, so
+    later runs look the SKU up again instead of seeding the dead ID.
+    
+    Returns: rows deactivated
+    """
+    skus = list(dict.fromkeys(skus))
+    if not skus:
+        return 0
     cur = conn.cursor()
-    cur.execute(sql, (sku, woo_id, user, user))
+    cur.execute(
+        f"""
+        UPDATE dbo.USER_PRODUCT_MAP
+        SET IS_ACTIVE = 0, UPDATED_DT = SYSDATETIME(), UPDATED_BY = ?,
+            NOTES = 'WooCommerce product no longer exists'
+        WHERE IS_ACTIVE = 1 AND SKU IN ({', '.join('?' for _ in skus)});
+        """,
+        [user, *skus],
+    )
     conn.commit()
+    return cur.rowcount
 
 
 def log_sync(conn, batch_id: str, op_type: str, dry_run: bool, started: dt.datetime,
              records_input: int, records_created: int, records_updated: int, 
-             records_failed: int, error_message: Optional[str] = None):
-    """Log sync operation to USER_SYNC_LOG."""
-    sql = """
-        INSERT INTO dbo.USER_SYNC_LOG
-        (SYNC_ID, OPERATION_TYPE, DIRECTION, DRY_RUN, START_TIME, END_TIME, DURATION_SECONDS,
-         RECORDS_INPUT, RECORDS_CREATED, RECORDS_UPDATED, RECORDS_FAILED, SUCCESS, ERROR_MESSAGE, CREATED_DT, CREATED_BY)
-        VALUES (?, ?, 'CP_TO_WOO', ?, ?, SYSDATETIME(),
-                DATEDIFF(SECOND, ?, SYSDATETIME()),
-                ?, ?, ?, ?, ?, ?, SYSDATETIME(), SYSTEM_USER);
+             records_failed: int, error_message: Optional[str] = None, records_skipped: int = 0,
+             batch_sizes: Optional[str] = None):
     """
-    cur = conn.cursor()
-    cur.execute(sql, (
+    Log sync operation to USER_SYNC_LOG.
+    
+    batch_sizes (the adaptive /batch sizes used) goes to BATCH_SIZES; if that
+    column is not deployed yet the row is logged without it.
+    """
+    columns = ("SYNC_ID, OPERATION_TYPE, DIRECTION, DRY_RUN, START_TIME, END_TIME, DURATION_SECONDS, "
+               "RECORDS_INPUT, RECORDS_CREATED, RECORDS_UPDATED, RECORDS_SKIPPED, RECORDS_FAILED, SUCCESS, "
+               "ERROR_MESSAGE, CREATED_DT, CREATED_BY")
+    values = ("?, ?, 'CP_TO_WOO', ?, ?, SYSDATETIME(), DATEDIFF(SECOND, ?, SYSDATETIME()), "
+              "?, ?, ?, ?, ?, ?, ?, SYSDATETIME(), SYSTEM_USER")
+    params = [
         batch_id, op_type, dry_run,
         started, started,
-        records_input, records_created, records_updated, records_failed,
+        records_input, records_created, records_updated, records_skipped, records_failed,
         1 if not error_message else 0,
         error_message
-    ))
+    ]
+    cur = conn.cursor()
+    if batch_sizes is not None:
+        try:
+            cur.execute(f"INSERT INTO dbo.USER_SYNC_LOG ({columns}, BATCH_SIZES) VALUES ({values}, ?);",
+                        (*params, batch_sizes))
+            conn.commit()
+            return
+        except Exception as e:
+            conn.rollback()
+            print(f"  WARNING: Could not log batch sizes ({e}); run 01_Production/sync_log_batch_sizes.sql")
+    cur.execute(f"INSERT INTO dbo.USER_SYNC_LOG ({columns}) VALUES ({values});", tuple(params))
     conn.commit()
 
 
@@ -531,23 +847,34 @@ def main():
     parser.add_argument("--apply", action="store_true", help="Actually sync (default is dry-run)")
     parser.add_argument("--max", type=int, default=None, help="Maximum number of products to sync")
     parser.add_argument("--sku", type=str, default=None, help="Sync specific SKU only")
-    parser.add_argument("--batch-id", type=str, default=None, help="Optional batch ID")
+    batch_group = parser.add_mutually_exclusive_group()
+    batch_group.add_argument("--batch-id", type=str, default=None, help="Optional batch ID")
+    batch_group.add_argument("--resume", type=str, default=None, metavar="BATCH_ID",
+                             help="Continue an interrupted run: skip SKUs already applied under this batch ID "
+                                  "(pass the same --full/--sku/--max options as the original run)")
     parser.add_argument("--updated-since", type=str, default=None, 
                        help="Only sync products updated since this time (ISO format or 'Xh'/'Xd' for hours/days ago, or 'last' for last sync)")
     parser.add_argument("--full", action="store_true", help="Force full sync (ignore incremental)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-send full payloads, even for unchanged products or fields")
     args = parser.parse_args()
 
     dry_run = not args.apply
-    config = load_integration_config()
+    config = get_integration_config()
     woo_client = WooClient(config)
+    # Pipeline knobs: rows the reader thread may fetch ahead, rows per
+    # prepare_product_payloads() call, sanitizer processes (0 = one per CPU)
+    read_ahead_rows = int(get_setting("PRODUCT_READ_AHEAD_ROWS", "500"))
+    build_rows = int(get_setting("PRODUCT_PAYLOAD_BATCH_ROWS", "500"))
+    workers = int(get_setting("PRODUCT_PAYLOAD_WORKERS", "0")) or (os.cpu_count() or 1)
     
-    batch_id = args.batch_id or f"PROD_SYNC_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    batch_id = args.resume or args.batch_id or f"PROD_SYNC_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}"
     started = dt.datetime.now()
     
     print("=" * 60)
     print(f"{'DRY RUN - ' if dry_run else ''}Product Sync: CounterPoint -> WooCommerce")
     print("=" * 60)
-    print(f"Batch ID: {batch_id}")
+    print(f"Batch ID: {batch_id}{' (resuming)' if args.resume else ''}")
     print(f"Started: {started.strftime('%Y-%m-%d %H:%M:%S')}")
     print()
 
@@ -569,129 +896,214 @@ def main():
                         print(f"Auto-incremental sync: Using last sync time ({updated_since.strftime('%Y-%m-%d %H:%M:%S')})")
                         print("  (Use --full to force full sync)")
             
-            # Fetch products
-            products = fetch_products(conn, max_records=args.max, sku_filter=args.sku, updated_since=updated_since)
-            print(f"Found {len(products)} product(s) to sync")
+            # Category mappings: one query per run instead of one per product
+            category_map = load_category_map(conn)
+            print(f"Loaded {len(category_map.by_code)} category mapping(s)")
             
-            if not products:
-                print("No products found. Exiting.")
-                return
-            
-            # Get existing mappings
+            # Get existing mappings; they seed the client's SKU index so only
+            # unknown SKUs are looked up in WooCommerce, and new IDs are saved back
             product_map = get_product_map(conn)
             print(f"Found {len(product_map)} existing product mapping(s)")
-            print()
+            if not dry_run:
+                woo_client.sku_index = SkuIndex(
+                    loader=lambda: product_map,
+                    persist=lambda mappings: upsert_product_maps(conn, mappings, "woo_products.py"),
+                    forget=lambda skus: deactivate_product_maps(conn, skus, "woo_products.py"),
+                )
             
-            # Prepare products for WooCommerce
-            woo_products = []
-            for cp_product in products:
-                sku = cp_product['SKU']
-                existing_woo_id = product_map.get(sku)
-                
-                # Get category mapping
-                category_id = get_category_mapping(conn, cp_product.get('CATEGORY_CODE'))
-                
-                # Prepare payload (pass config for image_base_url)
-                payload = prepare_product_payload(cp_product, category_id, config)
+            # Last pushed payloads: identical products are not re-sent, and changed
+            # ones are sent as id + sku + the fields that differ
+            pushed = {} if args.force else get_pushed_payloads(conn)
+            
+            # Resuming: SKUs applied before the interruption are not sent again
+            checkpointed = get_checkpointed_skus(conn, batch_id) if args.resume else set()
+            if args.resume:
+                print(f"Resuming {batch_id}: {len(checkpointed)} SKU(s) already applied")
+            
+            # Pipeline: the DB reader runs ahead on its own thread (bounded queue),
+            # payloads are built here as rows arrive, and WooClient posts each batch
+            # as soon as it fills while later payloads are still being built
+            counts = {'input': 0, 'skipped': 0, 'resumed': 0, 'create': 0, 'update': 0}
+            uncategorized: List[str] = []
+            sent_skus: List[str] = []
+            full_payloads: Dict[str, Dict] = {}   # sent, awaiting WooCommerce's response
+            known_categories = category_map.woo_ids
+            
+            # HTML sanitizing is the CPU-heavy part of building payloads: parse
+            # uncached descriptions in worker processes (started on first use)
+            pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+            
+            def build_payloads() -> Iterator[Dict]:
+                # iter_products() uses `conn` here, on this thread; only the
+                # pooled-connection row stream moves to the reader thread
+                rows = read_ahead(
+                    iter_products(conn, max_records=args.max, sku_filter=args.sku, updated_since=updated_since),
+                    maxsize=read_ahead_rows,
+                )
+                while True:
+                    chunk = list(itertools.islice(rows, build_rows))
+                    if not chunk:
+                        return
+                    counts['input'] += len(chunk)
+                    todo = [row for row in chunk if row['SKU'] not in checkpointed]
+                    counts['resumed'] += len(chunk) - len(todo)
+                    # Prepare payloads (pass config for image_base_url), in row order
+                    payloads = prepare_product_payloads(todo, config=config, category_map=category_map, pool=pool)
+                    yield from route_payloads(todo, payloads)
+            
+            def route_payloads(rows: List[Dict], payloads: List[Dict]) -> Iterator[Dict]:
+                for cp_product, payload in zip(rows, payloads):
+                    sku = cp_product['SKU']
+                    existing_woo_id = product_map.get(sku)
+                    last = pushed.get(sku)
+                    
+                    # Unchanged since the last successful push to this product: skip
+                    if existing_woo_id and last and last.hash == payload_hash(payload, existing_woo_id):
+                        counts['skipped'] += 1
+                        continue
+                    
+                    full_payloads[sku] = payload
+                    sent_skus.append(sku)
+                    if existing_woo_id:
+                        counts['update'] += 1
+                        # Send only changed fields when the last push is known
+                        if last and last.fields:
+                            yield payload_diff(payload, existing_woo_id, last.fields)
+                        else:
+                            yield dict(payload, id=existing_woo_id)
+                    else:
+                        counts['create'] += 1
+                        # New products without a mapped category land in Woo's "Uncategorized"
+                        if not any(c['id'] in known_categories for c in payload.get('categories', [])):
+                            uncategorized.append(sku)
+                        yield payload
+            
+            try:
+                created = updated = failed = 0
+            
+                if dry_run:
+                    print("DRY RUN - Would sync the following products:")
+                    for p in build_payloads():
+                        if len(sent_skus) <= 10:  # Show first 10
+                            if 'id' in p:
+                                changed = [k for k in p if k not in ('id', 'sku')]
+                                print(f"  UPDATE: {p['sku']} - {', '.join(changed) if changed else '(id only)'}")
+                            else:
+                                print(f"  CREATE: {p['sku']} - {p['name'][:50]}")
+                        full_payloads.pop(p['sku'], None)
+                    if len(sent_skus) > 10:
+                        print(f"  ... and {len(sent_skus) - 10} more")
+                    print()
+                    created, updated = counts['create'], counts['update']
+                else:
+                    print("Syncing products to WooCommerce...")
+                    # Each applied chunk (SKU -> ID from the batch response) is saved as it
+                    # lands: mapping, pushed payload and checkpoint, so an interrupted run
+                    # keeps its completed work and --resume skips it
+                    applied: Dict[str, int] = {}
                 
-                # Add ID if updating
-                if existing_woo_id:
-                    payload['id'] = existing_woo_id
+                    def on_applied(chunk: Dict[str, int]) -> None:
+                        applied.update(chunk)
+                        pushed_rows = {sku: (woo_id, full_payloads.pop(sku))
+                                       for sku, woo_id in chunk.items() if sku in full_payloads}
+                        # Separate writes: a missing PAYLOAD_* column must not stop checkpoints
+                        if pushed_rows:
+                            try:
+                                save_pushed_payloads(conn, pushed_rows, "woo_products.py")
+                            except Exception as e:
+                                print(f"  WARNING: Could not save pushed payloads for {len(pushed_rows)} product(s): {e}")
+                        try:
+                            save_checkpoint(conn, batch_id, chunk)
+                        except Exception as e:
+                            print(f"  WARNING: Could not checkpoint {len(chunk)} applied product(s): {e}")
                 
-                woo_products.append(payload)
-            
-            # Sync using WooClient batch API
-            if dry_run:
-                print("DRY RUN - Would sync the following products:")
-                for p in woo_products[:10]:  # Show first 10
-                    action = "UPDATE" if 'id' in p else "CREATE"
-                    print(f"  {action}: {p['sku']} - {p['name'][:50]}")
-                if len(woo_products) > 10:
-                    print(f"  ... and {len(woo_products) - 10} more")
-                print()
-                created = sum(1 for p in woo_products if 'id' not in p)
-                updated = sum(1 for p in woo_products if 'id' in p)
-                failed = 0
-            else:
-                print("Syncing products to WooCommerce...")
-                print(f"  Products to sync: {len(woo_products)}")
-                # Use WooClient batch sync
-                try:
-                    created, updated, errors = woo_client.sync_products(woo_products, dry_run=False)
-                    failed = len(errors)
-                    print(f"  Sync complete: {created} created, {updated} updated, {failed} failed")
+                    try:
+                        created, updated, errors = woo_client.sync_products_stream(
+                            build_payloads(), on_applied=on_applied, full_payload=full_payloads.get,
+                        )
+                        print(f"  Sync complete: {created} created, {updated} updated, {len(errors)} batch error(s)")
+                    
+                        if errors:
+                            print(f"\nErrors occurred: {len(errors)}")
+                            for error in errors[:5]:  # Show first 5 errors
+                                print(f"  - {error}")
                     
-                    if errors:
-                        print(f"\nErrors occurred: {len(errors)}")
-                        for error in errors[:5]:  # Show first 5 errors
-                            print(f"  - {error}")
-                        
-                        # Check for 503 errors specifically
-                        if any("503" in str(e) for e in errors):
-                            print("\nWARNING: WooCommerce site returned 503 Service Unavailable")
+                        # Transport counters: 429/503 responses were already retried with backoff
+                        transport = woo_client.transport_stats()
+                        if transport['throttled'] or transport['breaker_opens']:
+                            print(f"\nWARNING: WooCommerce throttled or was unavailable during this run "
+                                  f"({transport['throttled']} x 429/503, {transport['retries']} retries, "
+                                  f"circuit breaker opened {transport['breaker_opens']} time(s))")
                             print("   This is a server-side issue. Please:")
                             print("   1. Check if https://woodyspaper.com is accessible")
                             print("   2. Wait a few minutes and retry")
                             print("   3. Check WooCommerce server status")
-                except Exception as e:
-                    print(f"\nERROR: Fatal error during sync: {e}")
-                    created = updated = 0
-                    failed = len(woo_products)
-                    errors = [str(e)]
+                    except Exception as e:
+                        print(f"\nERROR: Fatal error during sync: {e}")
+                        created = updated = 0
+                        errors = [str(e)]
+                
+                    # Products, not batches: every sent SKU WooCommerce did not apply
+                    failed = len([sku for sku in sent_skus if sku not in applied])
                 
-                # Update product mappings for ALL synced products
-                # Fetch product IDs from WooCommerce for all synced SKUs
-                if created > 0 or updated > 0:
-                    all_skus = [cp_product['SKU'] for cp_product in products]
-                    print(f"  Fetching product IDs from WooCommerce for {len(all_skus)} product(s)...")
+                    # IDs come straight from the batch responses; no store re-scan
+                    if created > 0 or updated > 0:
+                        new_ids = {sku: woo_id for sku, woo_id in applied.items()
+                                   if product_map.get(sku) != woo_id}
+                        for sku, woo_id in new_ids.items():
+                            print(f"  Mapped {sku} -> WooCommerce product ID {woo_id}")
+                        print(f"  {len(applied)} of {len(sent_skus)} product(s) applied ({len(new_ids)} newly mapped)")
                     
-                    # Retry logic for fetching product IDs (site can be slow)
-                    woo_product_ids = {}
-                    max_retries = 3
-                    for attempt in range(1, max_retries + 1):
+                        missing = [sku for sku in sent_skus if sku not in applied]
+                        if missing:
+                            print(f"  WARNING: WooCommerce did not apply: {', '.join(missing[:20])}"
+                                  f"{' ...' if len(missing) > 20 else ''}")
+                
+                    if failed:
+                        print(f"  {failed} product(s) not applied; rerun with --resume {batch_id} to retry only those")
+                    else:
+                        # Nothing left to resume
                         try:
-                            woo_product_ids = woo_client._get_existing_products(all_skus)
-                            break  # Success, exit retry loop
+                            clear_checkpoint(conn, batch_id)
                         except Exception as e:
-                            if attempt < max_retries:
-                                wait_time = attempt * 2  # 2, 4, 6 seconds
-                                print(f"  Attempt {attempt} failed, retrying in {wait_time} seconds... ({e})")
-                                import time
-                                time.sleep(wait_time)
-                            else:
-                                print(f"  WARNING: Could not fetch product IDs after {max_retries} attempts: {e}")
-                                print("  Product sync completed, but mappings may be missing.")
-                    
-                    # Update mappings for all products found
-                    if woo_product_ids:
-                        for sku, woo_id in woo_product_ids.items():
-                            upsert_product_map(conn, sku, woo_id, "woo_products.py")
-                            print(f"  Mapped {sku} -> WooCommerce product ID {woo_id}")
-                        
-                        if len(woo_product_ids) < len(all_skus):
-                            missing = set(all_skus) - set(woo_product_ids.keys())
-                            print(f"  WARNING: Could not find WooCommerce IDs for: {', '.join(missing)}")
-                    
-                    # Fallback: Use existing mappings if available
-                    if not woo_product_ids:
-                        for cp_product in products:
-                            sku = cp_product['SKU']
-                            if sku in product_map:
-                                upsert_product_map(conn, sku, product_map[sku], "woo_products.py")
-                                print(f"  Used existing mapping for {sku}")
+                            print(f"  WARNING: Could not clear checkpoints for {batch_id}: {e}")
+            finally:
+                # Also on errors, so worker processes don't outlive the run
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+            
+            print()
+            print(f"Found {counts['input']} product(s); {counts['skipped']} unchanged since last push, "
+                  f"{counts['resumed']} already applied in this batch, {len(sent_skus)} to sync")
+            if uncategorized:
+                print(f"  WARNING: {len(uncategorized)} new product(s) have no mapped category "
+                      f"(e.g. {', '.join(uncategorized[:5])})")
+            
+            if not counts['input']:
+                print("No products found. Exiting.")
+                return
+            
+            skipped, resumed = counts['skipped'], counts['resumed']
             
             # Log sync
             log_sync(conn, batch_id, "product_sync", dry_run, started, 
-                    len(products), created, updated, failed,
-                    None if failed == 0 else f"{failed} products failed")
+                    counts['input'], created, updated, failed,
+                    None if failed == 0 else f"{failed} products failed",
+                    records_skipped=skipped + resumed,
+                    batch_sizes=woo_client.batcher.describe())
             
             print()
             print("=" * 60)
             print("Sync Summary:")
-            print(f"  Input: {len(products)}")
+            print(f"  Input: {counts['input']}")
             print(f"  Created: {created}")
             print(f"  Updated: {updated}")
+            print(f"  Skipped (unchanged): {skipped}")
+            if args.resume:
+                print(f"  Skipped (already applied in this batch): {resumed}")
             print(f"  Failed: {failed}")
+            if woo_client.batcher.history:
+                print(f"  Batch sizes: {woo_client.batcher.describe(limit=120)}")
             print(f"  Batch ID: {batch_id}")
             print("=" * 60)
             